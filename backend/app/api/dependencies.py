@@ -0,0 +1,98 @@
+"""
+API Dependencies Module
+Services the routers depend on, built on first use instead of at import.
+
+Service modules are imported inside these functions, so importing the app
+doesn't load aiohttp, NumPy or the provider clients and works without API
+keys. Tests can replace any service through app.dependency_overrides.
+"""
+
+from typing import TYPE_CHECKING, Dict
+from functools import lru_cache
+import os
+from app.db.database import SessionLocal
+
+if TYPE_CHECKING:
+    from app.core.admission import AdmissionController
+    from app.services.batch_service import BatchRunner
+    from app.services.events import EventBus
+    from app.services.jobs import JobQueue
+    from app.services.llm_service import LLMService
+    from app.services.rescoring import RescoreManager
+    from app.services.scoring import Scorer
+
+@lru_cache(maxsize=None)
+def get_llm_service() -> "LLMService":
+    """The shared LLM service"""
+    from app.services.llm_service import LLMService
+    return LLMService()
+
+@lru_cache(maxsize=None)
+def get_batch_runner() -> "BatchRunner":
+    """The shared batch runner, on top of the LLM service"""
+    from app.services.batch_service import BatchRunner
+    return BatchRunner(
+        get_llm_service(),
+        session_factory=SessionLocal,
+        max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "16")),
+        chunk_size=int(os.getenv("BATCH_INSERT_CHUNK_SIZE", "100"))
+    )
+
+@lru_cache(maxsize=None)
+def get_rescore_manager() -> "RescoreManager":
+    """The shared re-scoring job manager"""
+    from app.services.rescoring import RescoreManager
+    return RescoreManager(
+        session_factory=SessionLocal,
+        chunk_size=int(os.getenv("RESCORE_CHUNK_SIZE", "500"))
+    )
+
+@lru_cache(maxsize=None)
+def get_event_bus() -> "EventBus":
+    """The shared event bus; its change feed starts with the first subscriber"""
+    from app.services.events import EventBus
+    return EventBus.from_env(session_factory=SessionLocal)
+
+@lru_cache(maxsize=None)
+def get_admission_controller() -> "AdmissionController":
+    """This process's admission control for experiment requests"""
+    from app.core.admission import AdmissionController
+    return AdmissionController.from_env()
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> "JobQueue":
+    """The shared evaluation job queue; its workers start with the first job"""
+    from app.services.jobs import JobQueue
+    return JobQueue.from_env(get_llm_service(), session_factory=SessionLocal, events=get_event_bus())
+
+async def resume_jobs() -> None:
+    """
+    Start the job workers at startup if jobs are waiting, e.g. ones a
+    restart interrupted. Otherwise they start with the first submitted job.
+    """
+    if int(os.getenv("JOB_WORKERS", "4")) <= 0:
+        return
+    from app.services.jobs import has_pending_jobs
+    async with SessionLocal() as db:
+        if await has_pending_jobs(db):
+            get_job_queue().start()
+
+def get_scorers() -> Dict[str, "Scorer"]:
+    """Registered scorers by version"""
+    from app.services.scoring import SCORERS
+    return SCORERS
+
+async def close_services() -> None:
+    """Close whichever services were built (called from the app lifespan)"""
+    if get_job_queue.cache_info().currsize:
+        await get_job_queue().stop()
+    if get_llm_service.cache_info().currsize:
+        await get_llm_service().close()
+    if get_event_bus.cache_info().currsize:
+        await get_event_bus().close()
+    for factory in (get_llm_service, get_batch_runner, get_rescore_manager, get_event_bus, get_job_queue):
+        factory.cache_clear()
+
+# Make the dependencies available for import
+__all__ = ['get_llm_service', 'get_batch_runner', 'get_rescore_manager', 'get_event_bus', 'get_admission_controller',
+           'get_job_queue', 'resume_jobs', 'get_scorers', 'close_services']
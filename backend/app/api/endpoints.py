@@ -2,14 +2,32 @@
 API Endpoints Module
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import Experiment
-from app.services.llm_service import LLMService
-from typing import List, Dict, Any
-import logging
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, WebSocket
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db, SessionLocal
+from app.db import crud, rollups, similarity
+from app.api.dependencies import (
+    get_admission_controller, get_batch_runner, get_event_bus, get_job_queue, get_llm_service, get_rescore_manager,
+    get_scorers
+)
+from app.services.batch_service import DatasetError, parse_dataset
+from app.services import export, jobs
+from typing import TYPE_CHECKING, List, Dict, Any, AsyncIterator, Optional
 from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import orjson
+
+if TYPE_CHECKING:
+    from app.core.admission import AdmissionController
+    from app.services.batch_service import BatchRunner
+    from app.services.events import Event, EventBus
+    from app.services.jobs import JobQueue
+    from app.services.llm_service import LLMService
+    from app.services.rescoring import RescoreManager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,94 +35,492 @@ logger = logging.getLogger(__name__)
 
 # Create router without prefix 
 router = APIRouter()
-llm_service = LLMService()  # Initialize the LLM service
 
-@router.post("/experiments")
-async def create_experiment(request: Dict[str, Any], db: Session = Depends(get_db)):
-    """Create and process a new experiment"""
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+
+@router.post("/experiments", deprecated=True)
+async def create_experiment(
+    request: Dict[str, Any],
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    llm_service: "LLMService" = Depends(get_llm_service),
+    events: "EventBus" = Depends(get_event_bus)
+):
+    """
+    Create and process a new experiment, holding the request open until
+    every model has answered. Deprecated: kept for existing clients; use
+    POST /jobs (or /experiments/stream) instead.
+    """
+    response.headers["Deprecation"] = "true"
+    response.headers["Link"] = '</api/jobs>; rel="successor-version"'
     try:
         logger.info(f"Processing experiment with prompt: {request}")
+        system_prompt = request.get("systemPrompt", "")
         
-        # Create experiment record
-        db_experiment = Experiment(
+        # Get responses from all models concurrently; each one is timed
+        # from its own start and failures are isolated per model. Models
+        # that miss the deadline are saved as timed out
+        responses = await llm_service.run_experiment(
             prompt=request["prompt"],
-            responses=[],  
-            models=request["models"]
+            system_prompt=system_prompt,
+            models=request["models"],
+            use_cache=request.get("useCache", True),
+            refresh_cache=request.get("refreshCache", False),
+            deadline_ms=request.get("deadlineMs"),
+            on_result=lambda entry: events.model_finished(entry, prompt=request["prompt"])
         )
         
-        # Get responses from each model
-        responses = []
-        for model in request["models"]:
-            try:
-                # Start timing for this model
-                model_start_time = datetime.now()
-                
-                # Get response from model
-                if "systemPrompt" in request:
-                    response = await llm_service.get_response(
-                        prompt=request["prompt"],
-                        system_prompt=request["systemPrompt"],
-                        model=model
-                    )
-                else:
-                    response = await llm_service.get_response(
-                        prompt=request["prompt"],
-                        system_prompt="",
-                        model=model
-                    )
-                
-                # Calculate response time in milliseconds
-                response_time = (datetime.now() - model_start_time).total_seconds() * 1000
-                
-                # Evaluate response quality
-                accuracy, relevancy = llm_service._evaluate_response(response)
-                
-                # Add response with metrics 
-                responses.append({
-                    "model": model,
-                    "response": response,
-                    "metrics": {
-                        "accuracy": accuracy,
-                        "relevancy": relevancy,
-                        "responseTime": round(response_time, 2)  # Round to 2 decimal places
-                    }
-                })
-                
-            except Exception as e:
-                logger.error(f"Error getting response from {model}: {str(e)}")
-                responses.append({
-                    "model": model,
-                    "response": f"Error: {str(e)}",
-                    "metrics": {
-                        "accuracy": 0,
-                        "relevancy": 0,
-                        "responseTime": 0  # Zero response time for failed requests
-                    }
-                })
-        
-        # Update experiment with responses
-        db_experiment.responses = responses
-        
-        # Save to database
-        db.add(db_experiment)
-        db.commit()
-        db.refresh(db_experiment)
+        # Save the experiment and its per-model rows
+        db_experiment = await crud.save_experiment(
+            db,
+            prompt=request["prompt"],
+            system_prompt=system_prompt,
+            models=request["models"],
+            responses=responses
+        )
         
         logger.info(f"Created experiment with ID: {db_experiment.id}")
         return db_experiment
 
     except Exception as e:
         logger.error(f"Error creating experiment: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/jobs", status_code=202)
+async def submit_job(
+    request: Dict[str, Any],
+    llm_service: "LLMService" = Depends(get_llm_service),
+    job_queue: "JobQueue" = Depends(get_job_queue)
+):
+    """
+    Queue an experiment for background evaluation and return its job at once.
+    Poll /jobs/{id} for progress; once completed it names the saved experiment.
+    """
+    prompt = request.get("prompt")
+    models = request.get("models") or []
+    unknown = [name for name in models if name not in llm_service.models]
+    if not prompt or not models or unknown:
+        raise HTTPException(status_code=400, detail=f"A prompt and known models are required; unknown: {unknown}")
+    
+    job = await job_queue.submit(
+        prompt=prompt,
+        system_prompt=request.get("systemPrompt", ""),
+        models=models,
+        use_cache=request.get("useCache", True),
+        refresh_cache=request.get("refreshCache", False),
+        deadline_ms=request.get("deadlineMs")
+    )
+    logger.info(f"Queued job {job.id} for {len(models)} models")
+    return jobs.job_to_dict(job)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Get a job's status, the model results finished so far and, once completed, its experiment ID"""
+    job = await jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return jobs.job_to_dict(job)
+
+@router.post("/experiments/batch")
+async def create_batch_experiments(
+    dataset: UploadFile = File(...),
+    models: List[str] = Form(...),
+    useCache: bool = Form(True),
+    llm_service: "LLMService" = Depends(get_llm_service),
+    batch_runner: "BatchRunner" = Depends(get_batch_runner)
+):
+    """
+    Evaluate a JSONL dataset of prompts against a list of models.
+    Streams NDJSON events (result, saved, done) as the batch progresses.
+    """
+    try:
+        items = parse_dataset(await dataset.read())
+    except (DatasetError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Accept both repeated form fields and a comma-separated list
+    model_names = [name.strip() for value in models for name in value.split(",") if name.strip()]
+    unknown = [name for name in model_names if name not in llm_service.models]
+    if not model_names or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown or missing models: {unknown}")
+    
+    logger.info(f"Starting batch of {len(items)} prompts x {len(model_names)} models")
+    
+    async def stream_events() -> AsyncIterator[bytes]:
+        async for event in batch_runner.run(items, model_names, use_cache=useCache):
+            yield (json.dumps(event) + "\n").encode("utf-8")
+    
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson")
+
+@router.post("/experiments/stream")
+async def stream_experiment(
+    request: Dict[str, Any],
+    llm_service: "LLMService" = Depends(get_llm_service),
+    events: "EventBus" = Depends(get_event_bus)
+):
+    """
+    Create an experiment while streaming model output as Server-Sent Events:
+    `token` for each chunk of text, `model_done` with a model's entry and
+    metrics, and a final `experiment` once everything is saved.
+    """
+    prompt = request["prompt"]
+    system_prompt = request.get("systemPrompt", "")
+    models = request["models"]
+    logger.info(f"Streaming experiment with prompt: {request}")
+    
+    async def stream_events() -> AsyncIterator[str]:
+        entries = {}
+        async for event, data in llm_service.stream_experiment(prompt, system_prompt, models):
+            if event == "model_done":
+                entries[data["model"]] = data
+                events.model_finished(data, prompt=prompt)
+            yield _sse(event, data)
+        
+        async with SessionLocal() as db:
+            try:
+                db_experiment = await crud.save_experiment(
+                    db,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    models=models,
+                    responses=[entries[model] for model in models]
+                )
+            except Exception as e:
+                logger.error(f"Error saving streamed experiment: {str(e)}")
+                await db.rollback()
+                yield _sse("error", {"message": str(e)})
+                return
+        
+        logger.info(f"Created streamed experiment with ID: {db_experiment.id}")
+        yield _sse("experiment", {
+            "id": db_experiment.id,
+            "prompt": db_experiment.prompt,
+            "system_prompt": db_experiment.system_prompt,
+            "models": db_experiment.models,
+            "responses": db_experiment.responses,
+            "created_at": db_experiment.created_at.isoformat() if db_experiment.created_at else None
+        })
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _etag(version: int) -> str:
+    return f'W/"{version}"'
+
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match names this ETag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+async def _validators(db: AsyncSession) -> Dict[str, str]:
+    """
+    Caching headers for the experiment list. The ETag is the change counter,
+    read before the data, so a write landing in between only makes the next
+    revalidation fetch again. no-cache makes browsers revalidate every time.
+    """
+    return {"ETag": _etag(await crud.experiments_version(db)), "Cache-Control": "no-cache"}
+
 @router.get("/experiments")
-def get_experiments(db: Session = Depends(get_db)):
-    """Get all experiments"""
+async def get_experiments(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    model: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a page of experiment summaries, newest first.
+    Pass the returned `nextCursor` back as `cursor` for the next page.
+    Response text is left out; fetch it from /experiments/{id}.
+    With `since`, only experiments created or changed at or after it are
+    returned, oldest change first; pass the last item's updated_at as the
+    next `since`. Answers 304 when If-None-Match has the current ETag.
+    """
     try:
-        experiments = db.query(Experiment).all()
-        logger.info(f"Retrieved {len(experiments)} experiments")
-        return experiments
+        headers = await _validators(db)
+        if _not_modified(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        page = await crud.list_experiments(
+            db, limit=limit, cursor=cursor, model=model, start=start, end=end, since=since
+        )
+        logger.info(f"Retrieved {len(page['items'])} experiments")
+        # Returned as a response so FastAPI doesn't walk it with jsonable_encoder;
+        # the pre-encoded metrics are spliced in by orjson as they are
+        return ORJSONResponse(page, headers=headers)
+    except crud.InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving experiments: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/experiments/search")
+async def search_experiments(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    model: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Full-text search over prompts and model responses, best match first.
+    Pass the returned `nextOffset` back as `offset` for the next page.
+    """
+    try:
+        return await crud.search_experiments(db, q, limit=limit, offset=offset, model=model, start=start, end=end)
+    except crud.InvalidSearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/experiments/similar")
+async def find_similar_experiments(
+    prompt: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+    min_similarity: float = Query(0.0, ge=0.0, le=1.0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Past experiments whose prompts are near-duplicates of `prompt`, most
+    similar first, with each model's metrics. `similarity` estimates the
+    Jaccard similarity of the prompts' character 4-grams.
+    """
+    return {"items": await similarity.query(db, prompt, k=k, min_similarity=min_similarity)}
+
+@router.get("/experiments/export")
+async def export_experiments(
+    export_format: str = Query("ndjson", alias="format"),
+    columns: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    Stream the full experiment history as NDJSON, Parquet or Arrow.
+    `columns` is a comma-separated subset; `start`/`end` filter on created_at.
+    """
+    try:
+        export.check_format(export_format)
+        selected = export.resolve_columns(columns)
+    except export.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Exporting experiments as {export_format} ({','.join(selected)})")
+    return StreamingResponse(
+        export.export_experiments(SessionLocal, export_format, selected, start, end, EXPORT_CHUNK_SIZE),
+        media_type=export.EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="experiments.{export_format}"'}
+    )
+
+@router.post("/experiments/import")
+async def import_experiments(file: UploadFile = File(...), import_format: Optional[str] = Form(None, alias="format")):
+    """
+    Load an exported NDJSON, Parquet or Arrow file back in as new experiments.
+    The format defaults to the one the file name's extension implies.
+    """
+    if not import_format:
+        suffix = os.path.splitext(file.filename or "")[1].lower()
+        import_format = export.FORMAT_SUFFIXES.get(suffix, "ndjson")
+    try:
+        return await export.import_experiments(SessionLocal, file.file, import_format, IMPORT_BATCH_SIZE)
+    except export.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/experiments/{experiment_id}")
+async def get_experiment(
+    experiment_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get one experiment with every model's full response; 304 when If-None-Match has its current ETag"""
+    # Per experiment, so changes to others don't invalidate it, and checked
+    # before the response text is loaded
+    version = await crud.experiment_version(db, experiment_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    headers = {"ETag": f'W/"{experiment_id}-{version}"', "Cache-Control": "no-cache"}
+    if _not_modified(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    experiment = await crud.get_experiment_document(db, experiment_id)
+    if experiment is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    return ORJSONResponse(experiment, headers=headers)
+
+@router.get("/experiments/{experiment_id}/similar")
+async def get_similar_experiments(
+    experiment_id: int,
+    k: int = Query(10, ge=1, le=100),
+    min_similarity: float = Query(0.0, ge=0.0, le=1.0),
+    db: AsyncSession = Depends(get_db)
+):
+    """Other experiments whose prompts are near-duplicates of this one's, with each model's metrics"""
+    experiment = await crud.get_experiment(db, experiment_id)
+    if experiment is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    items = await similarity.query(db, experiment.prompt, k=k, min_similarity=min_similarity, exclude_id=experiment_id)
+    return {"items": items}
+
+def _sse_event(event: "Event") -> bytes:
+    event_id = f"id: {event.id}\n" if event.id is not None else ""
+    return f"{event_id}event: {event.name}\ndata: ".encode("utf-8") + event.data + b"\n\n"
+
+@router.get("/events")
+async def stream_events(
+    last_event_id: Optional[int] = Header(None),
+    events: "EventBus" = Depends(get_event_bus)
+):
+    """
+    Server-Sent Events feed of experiment activity: model_finished,
+    experiment_created, experiment_updated, metrics and resync (see
+    app/services/events.py). Browsers reconnect on their own, sending
+    Last-Event-ID so missed events are replayed.
+    """
+    async def stream() -> AsyncIterator[bytes]:
+        with events.subscribe(last_event_id) as subscription:
+            yield b"retry: 3000\n\n"
+            while True:
+                event = await subscription.next(EVENTS_KEEPALIVE)
+                # A comment line now and then keeps proxies from closing an idle stream
+                yield _sse_event(event) if event is not None else b": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/events/ws")
+async def events_websocket(
+    websocket: WebSocket,
+    last_event_id: Optional[int] = None,
+    events: "EventBus" = Depends(get_event_bus)
+):
+    """The same feed as /events over a WebSocket, one {"id", "event", "data"} message per event"""
+    await websocket.accept()
+    with events.subscribe(last_event_id) as subscription:
+        async def send() -> None:
+            while True:
+                event = await subscription.next()
+                await websocket.send_text(orjson.dumps({
+                    "id": event.id, "event": event.name, "data": orjson.Fragment(event.data)
+                }).decode("utf-8"))
+
+        async def receive() -> None:
+            # Nothing is expected from the client; this notices it leaving
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+@router.get("/metrics/models")
+async def get_model_metrics(
+    bucket: str = Query("day", pattern="^(hour|day|week|all)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    model: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get per-model count, error rate, mean/p50/p95/p99 response time and mean
+    accuracy/relevancy per time bucket, served from the hourly rollups.
+    """
+    series = await rollups.query(
+        db,
+        bucket=bucket,
+        start=rollups.hour_bucket(start) if start else None,
+        end=crud.to_db_timestamp(end) if end else None,
+        model=model
+    )
+    return {"bucket": bucket, "series": series}
+
+@router.get("/stats/pool")
+def get_pool_stats(llm_service: "LLMService" = Depends(get_llm_service)):
+    """Get open, idle and waiting connection counts for each provider pool"""
+    return llm_service.pool_stats()
+
+
+@router.get("/stats/rate-limits")
+def get_rate_limit_stats(llm_service: "LLMService" = Depends(get_llm_service)):
+    """Get each provider's rate limits, adaptive rate and throttling counters"""
+    return llm_service.rate_limit_stats()
+
+
+@router.get("/stats/batching")
+def get_batching_stats(llm_service: "LLMService" = Depends(get_llm_service)):
+    """Get each micro-batched model's window, size limit and batch counters"""
+    return llm_service.batch_stats()
+
+
+@router.get("/stats/hedging")
+def get_hedging_stats(llm_service: "LLMService" = Depends(get_llm_service)):
+    """Get each model's hedge threshold and how many hedges were sent and won"""
+    return llm_service.hedge_stats()
+
+
+@router.get("/stats/events")
+async def get_event_stats(events: "EventBus" = Depends(get_event_bus)):
+    """Connected event subscribers and events published by this process"""
+    return events.stats()
+
+@router.get("/stats/admission")
+def get_admission_stats(admission: "AdmissionController" = Depends(get_admission_controller)):
+    """Requests running and waiting, and those turned away with 503, for this worker process"""
+    return admission.snapshot()
+
+@router.get("/stats/cache")
+def get_cache_stats(llm_service: "LLMService" = Depends(get_llm_service)):
+    """Get response cache hit, miss and eviction counters"""
+    if llm_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_service.cache.stats}
+
+@router.get("/scoring/scorers")
+def list_scorers(
+    llm_service: "LLMService" = Depends(get_llm_service),
+    scorers: Dict[str, Any] = Depends(get_scorers)
+):
+    """List the available scorer versions and the one new responses use"""
+    return {"current": llm_service.scorer.version, "versions": sorted(scorers)}
+
+@router.post("/scoring/rescore", status_code=202)
+async def start_rescore(
+    request: Dict[str, Any] = None,
+    rescore_manager: "RescoreManager" = Depends(get_rescore_manager)
+):
+    """
+    Re-score stored responses in the background, by default under the current
+    scorer. Only responses scored by another version are touched.
+    """
+    version = (request or {}).get("version")
+    try:
+        job = rescore_manager.start(version)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    return job.to_dict()
+
+@router.get("/scoring/jobs/{job_id}")
+def get_rescore_job(job_id: str, rescore_manager: "RescoreManager" = Depends(get_rescore_manager)):
+    """Get a re-scoring job's status and progress"""
+    job = rescore_manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
@@ -0,0 +1,190 @@
+"""
+Admission Control Module
+Bounds how many experiment requests a process runs at once. Each one holds
+provider calls and a database session for its whole run, so accepting
+every request in a burst only makes all of them slow and grows memory.
+
+Requests over the limit wait in a short priority queue: interactive ones
+(a single experiment, possibly streamed) go ahead of batch traffic, and
+arrival order decides within a class. Once the queue is full a request is
+turned away at once with 503 and Retry-After, unless it outranks a waiting
+request, which is then shed in its place. A request that can't be admitted
+within the queue timeout gets the same 503.
+"""
+
+from typing import Any, Dict, List, Mapping, Tuple
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.exceptions import OverloadedError
+from app.services.telemetry import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+# Lower ranks are admitted first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Rejection counters by their Prometheus reason label
+_REASONS = {"queueFull": "queue_full", "timedOut": "timeout", "shed": "shed"}
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_queue: int = 128,
+        queue_timeout: float = 5.0,
+        retry_after: float = 1.0
+    ):
+        """
+        Args:
+            max_in_flight: Requests run at once
+            max_queue: Requests waiting for a slot before new ones are rejected
+            queue_timeout: Seconds a request may wait before it's rejected
+            retry_after: Least Retry-After sent with a 503, in seconds; more
+                when the queue is long and requests are slow
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        # (rank, arrival, priority, future), the next to admit first
+        self._waiting: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._hold_seconds = 0.0  # moving average of how long admitted requests run
+        self.stats = {"admitted": 0, "queued": 0, "queueFull": 0, "timedOut": 0, "shed": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+            retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+        )
+
+    def retry_after_seconds(self) -> int:
+        """About how long until the queue ahead of a new request has drained"""
+        drain = self._hold_seconds * (len(self._waiting) + 1) / max(1, self.max_in_flight)
+        return math.ceil(max(self.retry_after, drain))
+
+    def _reject(self, priority: str, reason: str, stat: str) -> OverloadedError:
+        self.stats[stat] += 1
+        ADMISSION_REJECTED.labels(priority, _REASONS[stat]).inc()
+        return OverloadedError(reason, self.retry_after_seconds())
+
+    def _remove(self, entry: Tuple[int, int, str, asyncio.Future]) -> None:
+        self._waiting.remove(entry)
+        heapq.heapify(self._waiting)
+        ADMISSION_QUEUED.labels(entry[2]).dec()
+
+    async def acquire(self, priority: str) -> None:
+        """Wait for a slot; raises OverloadedError if the request is turned away"""
+        if self.in_flight < self.max_in_flight and not self._waiting:
+            self._admit()
+            ADMISSION_WAIT_SECONDS.labels(priority).observe(0.0)
+            return
+
+        rank = PRIORITIES[priority]
+        if len(self._waiting) >= self.max_queue:
+            # The lowest-ranked, most recent waiter is shed if this request outranks it
+            lowest = max(self._waiting, default=None)
+            if lowest is None or lowest[0] <= rank:
+                raise self._reject(priority, "too many requests waiting", "queueFull")
+            self._remove(lowest)
+            lowest[3].set_exception(self._reject(lowest[2], "made room for a higher-priority request", "shed"))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (rank, next(self._arrivals), priority, future)
+        heapq.heappush(self._waiting, entry)
+        self.stats["queued"] += 1
+        ADMISSION_QUEUED.labels(priority).inc()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            if not future.done():
+                future.cancel()
+                self._remove(entry)
+            elif future.exception() is None:
+                # Admitted just as it went away: pass the slot on
+                self.release()
+            raise
+        if not future.done():
+            future.cancel()
+            self._remove(entry)
+            raise self._reject(priority, f"no slot within {self.queue_timeout:g}s", "timedOut")
+        future.result()  # raises if this request was shed
+        ADMISSION_WAIT_SECONDS.labels(priority).observe(time.perf_counter() - started)
+
+    def _admit(self) -> None:
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def release(self, held: float = 0.0) -> None:
+        """Free a slot, handing it straight to the next waiter if there is one"""
+        if held:
+            # Starts from the first request's time rather than from zero
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held if self._hold_seconds else held
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+        while self._waiting:
+            entry = heapq.heappop(self._waiting)
+            ADMISSION_QUEUED.labels(entry[2]).dec()
+            if not entry[3].done():
+                self._admit()
+                entry[3].set_result(None)
+                return
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Limits, current load and counters, for the stats endpoint"""
+        queued = {priority: 0 for priority in PRIORITIES}
+        for entry in self._waiting:
+            queued[entry[2]] += 1
+        return {
+            "maxInFlight": self.max_in_flight,
+            "maxQueue": self.max_queue,
+            "inFlight": self.in_flight,
+            "waiting": queued,
+            "avgHoldSeconds": round(self._hold_seconds, 3),
+            "retryAfter": self.retry_after_seconds(),
+            **self.stats,
+        }
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp, controller: AdmissionController, routes: Mapping[Tuple[str, str], str]):
+        """
+        Args:
+            app: The wrapped application
+            controller: Decides which requests run, wait or are rejected
+            routes: Priority class of each admitted route by (method, path);
+                other requests pass straight through
+        """
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        priority = self.routes.get((scope.get("method"), scope["path"])) if scope["type"] == "http" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(priority)
+        except OverloadedError as e:
+            await JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)(scope, receive, send)
+            return
+        # The slot is held until the response is fully sent, streamed ones included
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - started)
+
+# Make admission control available for import
+__all__ = ['AdmissionController', 'AdmissionMiddleware', 'PRIORITIES']
@@ -69,4 +69,73 @@ class EvaluationError(LLMServiceError):
         super().__init__(
             status_code=500,
             detail=f"Evaluation failed for model {model}: {reason}"
-        ) 
\ No newline at end of file
+        ) 
+
+class RateLimitedError(LLMServiceError):
+    """
+    Rate Limited Exception
+    ---------------------
+    Raised when a provider throttles a call or can't serve it yet.
+    The call is safe to retry after `retry_after` seconds.
+    Returns HTTP 429 status code.
+    
+    Examples:
+        - HTTP 429 Too Many Requests
+        - HTTP 502/503/504 from an overloaded provider
+        - Hugging Face model still loading
+    
+    Args:
+        model: Name of the model that was throttled
+        reason: What the provider said
+        retry_after: Seconds the provider asked us to wait, if it said
+    """
+    def __init__(self, model: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(
+            status_code=429,
+            detail=f"Rate limited for model {model}: {reason}",
+            headers={"Retry-After": str(int(retry_after))} if retry_after is not None else None
+        )
+        self.retry_after = retry_after
+
+class DeadlineExceededError(LLMServiceError):
+    """
+    Deadline Exceeded Exception
+    --------------------------
+    Raised when a model hasn't answered within the experiment's deadline.
+    The call is cancelled; the other models' results are kept.
+    Returns HTTP 504 status code.
+    
+    Args:
+        model: Name of the model that ran out of time
+        budget: The experiment's deadline budget in seconds
+    """
+    def __init__(self, model: str, budget: float):
+        super().__init__(
+            status_code=504,
+            detail=f"Deadline exceeded for model {model} after {budget:.2f}s"
+        )
+
+class OverloadedError(LLMServiceError):
+    """
+    Overloaded Exception
+    -------------------
+    Raised when the server turns an experiment request away instead of
+    queueing it: too many are already running and waiting.
+    Returns HTTP 503 status code with a Retry-After header.
+    
+    Examples:
+        - The admission wait queue is full
+        - The request waited too long for a free slot
+        - A waiting batch request made room for an interactive one
+    
+    Args:
+        reason: Why the request was turned away
+        retry_after: Seconds the client should wait before retrying
+    """
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"Server overloaded: {reason}",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
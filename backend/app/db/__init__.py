@@ -5,14 +5,13 @@ This package handles all database operations and models for the LLM Evaluation P
 Includes database initialization, session management, and models.
 """
 
-import os
+import asyncio
 import logging
-from pathlib import Path
-from typing import Optional
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from .models import Experiment
+from sqlalchemy import text
+from .database import engine, SessionLocal, Base, get_db, DB_FILE
+from .models import Experiment, ModelResponse, EvaluationJob, ModelMetricRollup, RollupLatencyBin, PromptSignature, PromptLshBucket, ResponseDictionary, ResponseArchive, ArchivedExperiment
+from .codec import load_dictionaries
+from .migrations import run_migrations
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,66 +20,54 @@ logger = logging.getLogger(__name__)
 # Version of the database package
 __version__ = '1.0.0'
 
-# Database initialization
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data/app.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
 class DatabaseInitializationError(Exception):
     """Custom exception for database initialization errors"""
     pass
 
-def init_db(force: bool = False) -> None:
+async def init_db(force: bool = False) -> None:
     """
-    Initialize the database and create all tables.
+    Initialize the database: create all tables and apply pending migrations.
     
     Args:
-        force (bool): If True, recreates the database even if it exists
+        force (bool): If True, drops and recreates all tables first
     """
     try:
-        db_path = Path("./data")
-        db_file = db_path / "app.db"
-        
-        # Create data directory if it doesn't exist
-        db_path.mkdir(parents=True, exist_ok=True)
-        
-        # Handle existing database
-        if db_file.exists():
+        async with engine.begin() as conn:
             if force:
-                logger.warning(f"Removing existing database: {db_file}")
-                db_file.unlink()
-            else:
-                logger.info(f"Database already exists at: {db_file}")
-                return
+                logger.warning(f"Dropping all tables in: {DB_FILE}")
+                await conn.run_sync(Base.metadata.drop_all)
+                # Not part of the metadata; dropping them and the recorded
+                # version lets the migrations rebuild them with their triggers
+                await conn.execute(text("DROP TABLE IF EXISTS experiments_fts"))
+                await conn.execute(text("DROP TABLE IF EXISTS change_counters"))
+                await conn.execute(text("PRAGMA user_version = 0"))
+            
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+            await conn.run_sync(load_dictionaries)
         
-        # Create new database and tables
-        logger.info("Creating new database and tables...")
-        Base.metadata.create_all(bind=engine)
         logger.info("✓ Database initialized successfully!")
-        logger.info(f"Database location: {db_file}")
+        logger.info(f"Database location: {DB_FILE}")
         
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}", exc_info=True)
         raise DatabaseInitializationError(f"Database initialization failed: {str(e)}")
 
-def get_db():
-    """
-    Get database session with automatic closing.
-    To be used in FastAPI dependency injection.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Define public exports
 __all__ = [
     'engine',
     'SessionLocal',
     'Base',
     'Experiment',
+    'ModelResponse',
+    'EvaluationJob',
+    'ModelMetricRollup',
+    'RollupLatencyBin',
+    'PromptSignature',
+    'PromptLshBucket',
+    'ResponseDictionary',
+    'ResponseArchive',
+    'ArchivedExperiment',
     'init_db',
     'get_db',
     'DatabaseInitializationError'
@@ -88,4 +75,4 @@ __all__ = [
 
 # Initialize database if this file is run directly
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    asyncio.run(init_db())
@@ -0,0 +1,59 @@
+"""
+Response Archive Module
+Cold storage for old experiments' response text. An archive file is a run
+of zstd frames, one per experiment, each holding the JSON list of that
+experiment's response texts in entry order (concatenated frames are
+themselves a valid .zst file). The database keeps the experiment, its
+metrics and an archived_experiments row giving the frame's file, offset
+and length, so reading one experiment back is one seek and one read.
+
+Files are named relative to ARCHIVE_DIR, so they can be moved to cheaper
+storage as long as ARCHIVE_DIR follows them.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+import os
+import orjson
+from app.db import codec
+from app.db.database import BASE_DIR
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+
+# experiment ID -> (archive file name, offset, length)
+Location = Tuple[str, int, int]
+
+def encode(texts: Sequence[str]) -> bytes:
+    """One experiment's frame"""
+    return codec.compress(orjson.dumps(list(texts)).decode("utf-8"))
+
+def append(name: str, frames: Sequence[bytes]) -> List[Tuple[int, int]]:
+    """
+    Append frames to an archive file and fsync it, returning each frame's
+    (offset, length). Callers record the locations only after this
+    returns, so a crash leaves at most unreferenced frames behind.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    locations = []
+    with open(os.path.join(ARCHIVE_DIR, name), "ab") as f:
+        offset = f.tell()
+        for frame in frames:
+            f.write(frame)
+            locations.append((offset, len(frame)))
+            offset += len(frame)
+        f.flush()
+        os.fsync(f.fileno())
+    return locations
+
+def read(locations: Dict[int, Location]) -> Dict[int, List[str]]:
+    """Response texts of archived experiments; blocking, so run it in a thread"""
+    by_file: Dict[str, List[Tuple[int, int, int]]] = {}
+    for experiment_id, (name, offset, length) in locations.items():
+        by_file.setdefault(name, []).append((offset, length, experiment_id))
+
+    texts = {}
+    for name, frames in by_file.items():
+        with open(os.path.join(ARCHIVE_DIR, name), "rb") as f:
+            for offset, length, experiment_id in sorted(frames):
+                f.seek(offset)
+                texts[experiment_id] = orjson.loads(codec.decompress(f.read(length)))
+    return texts
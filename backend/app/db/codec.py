@@ -0,0 +1,114 @@
+"""
+Response Text Codec Module
+zstd compression for stored response text. Responses are short and much
+alike, so they compress far better against a dictionary trained on earlier
+ones. zstd writes the dictionary's ID into every frame header, and
+dictionaries are kept in the response_dictionaries table, so any frame ever
+written can still be read. Text saved before compression was added is plain
+and is read as it is.
+
+zstandard is only imported once text is actually compressed or expanded.
+"""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+import logging
+import os
+import sqlite3
+from sqlalchemy import LargeBinary, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+LEVEL = int(os.getenv("RESPONSE_ZSTD_LEVEL", "3"))
+DICTIONARY_SIZE = int(os.getenv("RESPONSE_DICTIONARY_SIZE", str(110 * 1024)))
+
+# zstd dictionary ID -> ZstdCompressionDict, and the one new text is compressed with
+_dictionaries: Dict[int, Any] = {}
+_current: Optional[int] = None
+
+def _zstd():
+    import zstandard
+    return zstandard
+
+def register(dict_id: int, data: bytes, current: bool = True) -> None:
+    """Make a dictionary usable for reading, and by default for new writes too"""
+    global _current
+    zstd = _zstd()
+    dictionary = zstd.ZstdCompressionDict(data)
+    # Digested once here instead of on every compressor built from it
+    dictionary.precompute_compress(level=LEVEL)
+    _dictionaries[dict_id] = dictionary
+    if current:
+        _current = dict_id
+
+def current_dictionary() -> Optional[int]:
+    return _current
+
+def load_dictionaries(conn: Connection) -> None:
+    """Register every stored dictionary; the newest becomes current"""
+    rows = conn.execute(text("SELECT id, data FROM response_dictionaries ORDER BY created_at, rowid")).all()
+    for row in rows:
+        register(row.id, row.data)
+    if rows:
+        logger.info(f"Loaded {len(rows)} response dictionaries, current: {_current}")
+
+def _dictionary(dict_id: int) -> Any:
+    """
+    The dictionary with this ID. One trained by another process since this
+    one started is read straight from the database file: result processing
+    is synchronous, and this happens once per new dictionary.
+    """
+    if dict_id not in _dictionaries:
+        from app.db.database import DB_FILE
+        with sqlite3.connect(DB_FILE) as conn:
+            row = conn.execute("SELECT data FROM response_dictionaries WHERE id = ?", (dict_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"Response dictionary {dict_id} not found")
+        register(dict_id, row[0], current=False)
+    return _dictionaries[dict_id]
+
+def dictionary_id(data: bytes) -> int:
+    """ID of the dictionary a frame was compressed with; 0 for none"""
+    return _zstd().get_frame_parameters(data).dict_id
+
+def compress(value: str) -> bytes:
+    zstd = _zstd()
+    if _current is None:
+        return zstd.ZstdCompressor(level=LEVEL).compress(value.encode("utf-8"))
+    return zstd.ZstdCompressor(dict_data=_dictionaries[_current]).compress(value.encode("utf-8"))
+
+def decompress(data: bytes) -> str:
+    zstd = _zstd()
+    dict_id = dictionary_id(data)
+    if dict_id == 0:
+        return zstd.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zstd.ZstdDecompressor(dict_data=_dictionary(dict_id)).decompress(data).decode("utf-8")
+
+def train(samples: Sequence[str], size: int = DICTIONARY_SIZE) -> Tuple[int, bytes]:
+    """
+    Train a dictionary on sample texts, returning its ID and content.
+    zstd needs a few hundred samples (and many times `size` bytes of them)
+    to find anything worth keeping; it raises ZstdError if there are too few.
+    """
+    zstd = _zstd()
+    dictionary = zstd.train_dictionary(size, [sample.encode("utf-8") for sample in samples], level=LEVEL)
+    return dictionary.dict_id(), dictionary.as_bytes()
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored as a zstd frame. Empty text is stored as an empty
+    blob, and plain text left by older versions is returned unchanged.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(value) if value else b""
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress(value) if value else ""
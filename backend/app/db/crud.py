@@ -0,0 +1,497 @@
+"""
+Experiment Queries Module
+Shared read/write helpers for experiments, used by the API routers
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from datetime import datetime, timezone
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import orjson
+from sqlalchemy import JSON, DateTime, String, and_, case, func, insert, or_, literal_column, select, text, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from app.db.models import ArchivedExperiment, Experiment, ModelResponse, ResponseArchive
+from app.db import archive, rollups, similarity
+
+# SQLite stores CURRENT_TIMESTAMP as UTC text in this format; comparisons are
+# done on that text so the (created_at, id) index can be used directly
+SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor can't be decoded"""
+    pass
+
+class InvalidSearchError(ValueError):
+    """Raised when a search query has no searchable terms"""
+    pass
+
+def encode_cursor(created_at: str, experiment_id: int) -> str:
+    """Opaque cursor pointing just past the given row"""
+    raw = json.dumps([created_at, experiment_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, experiment_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), int(experiment_id)
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+
+def to_db_timestamp(value: datetime) -> str:
+    """Render a datetime the way SQLite stores created_at (naive UTC)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(SQLITE_TIMESTAMP_FORMAT)
+
+async def list_experiments(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    model: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    One page of experiment summaries, newest first. With `since`, only
+    experiments created or changed at or after it (updated_at, whole
+    seconds), oldest change first, so a client can fetch just the delta.
+    Summaries carry each model's metrics, extracted inside SQLite; the
+    response text is stored apart from them and isn't read at all. `models`
+    and `metrics` stay the JSON text SQLite produced (orjson.Fragment), so
+    they are neither parsed nor re-encoded on the way out.
+    """
+    created_at_text = type_coerce(Experiment.created_at, String)
+    updated_at_text = type_coerce(Experiment.updated_at, String)
+    metrics = literal_column(
+        "(SELECT json_group_array(json_object("
+        "'model', json_extract(value, '$.model'), "
+        "'metrics', json(json_extract(value, '$.metrics'))"
+        ")) FROM json_each(experiments.responses))"
+    )
+    query = select(
+        Experiment.id,
+        Experiment.prompt,
+        type_coerce(Experiment.models, String).label("models"),
+        Experiment.created_at,
+        created_at_text.label("created_at_text"),
+        Experiment.updated_at,
+        updated_at_text.label("updated_at_text"),
+        metrics.label("metrics")
+    )
+
+    # Keyset over (created_at, id) descending, or (updated_at, id) ascending for deltas
+    order_text = updated_at_text if since else created_at_text
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        if since:
+            query = query.where(or_(
+                order_text > cursor_time,
+                and_(order_text == cursor_time, Experiment.id > cursor_id)
+            ))
+        else:
+            query = query.where(or_(
+                order_text < cursor_time,
+                and_(order_text == cursor_time, Experiment.id < cursor_id)
+            ))
+    if model:
+        query = query.where(
+            select(ModelResponse.id)
+            .where(ModelResponse.experiment_id == Experiment.id, ModelResponse.model == model)
+            .exists()
+        )
+    if start:
+        query = query.where(created_at_text >= to_db_timestamp(start))
+    if end:
+        query = query.where(created_at_text < to_db_timestamp(end))
+    if since:
+        query = query.where(updated_at_text >= to_db_timestamp(since))
+        query = query.order_by(Experiment.updated_at, Experiment.id)
+    else:
+        query = query.order_by(Experiment.created_at.desc(), Experiment.id.desc())
+
+    # Fetch one extra row to learn whether another page exists
+    query = query.limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        {
+            "id": row.id,
+            "prompt": row.prompt,
+            "models": orjson.Fragment(row.models),
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "metrics": orjson.Fragment(row.metrics or "[]")
+        }
+        for row in rows
+    ]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.updated_at_text if since else last.created_at_text, last.id)
+    return {"items": items, "nextCursor": next_cursor}
+
+async def experiments_version(db: AsyncSession) -> int:
+    """
+    Counter bumped by triggers whenever an experiment is inserted or
+    updated, by any process: a cheap validator for cached reads
+    """
+    return (await db.execute(
+        text("SELECT value FROM change_counters WHERE name = 'experiments'")
+    )).scalar() or 0
+
+async def experiment_version(db: AsyncSession, experiment_id: int) -> Optional[str]:
+    """
+    Validator for one experiment, read without loading its response text:
+    its updated_at plus a digest of its stored entries, since updated_at is
+    whole seconds and two changes can share one. None if it doesn't exist.
+    """
+    row = (await db.execute(
+        select(
+            type_coerce(Experiment.updated_at, String).label("updated_at"),
+            type_coerce(Experiment.responses, String).label("responses")
+        ).where(Experiment.id == experiment_id)
+    )).first()
+    if row is None:
+        return None
+    changed = re.sub(r"\D", "", row.updated_at or "")
+    digest = hashlib.blake2b((row.responses or "").encode(), digest_size=6).hexdigest()
+    return f"{changed}-{digest}"
+
+class ChangeWatermark:
+    """
+    How far a reader of `since=` deltas has got: the latest updated_at it
+    saw, the IDs it saw with exactly that updated_at (timestamps are whole
+    seconds, so the next read repeats that second), and the highest ID seen,
+    which tells new experiments from changed ones.
+    """
+    def __init__(self, updated_at: datetime, seen_ids: Set[int], max_id: int):
+        self.updated_at = updated_at
+        self.seen_ids = seen_ids
+        self.max_id = max_id
+
+    def seen(self, item: Dict[str, Any]) -> bool:
+        return item["updated_at"] == self.updated_at and item["id"] in self.seen_ids
+
+    def advance(self, items: List[Dict[str, Any]]) -> "ChangeWatermark":
+        """The watermark after reading `items`, a since= page in order"""
+        if not items:
+            return self
+        latest = items[-1]["updated_at"]
+        seen_ids = {item["id"] for item in items if item["updated_at"] == latest}
+        if latest == self.updated_at:
+            seen_ids |= self.seen_ids
+        return ChangeWatermark(latest, seen_ids, max(self.max_id, max(item["id"] for item in items)))
+
+async def change_watermark(db: AsyncSession) -> ChangeWatermark:
+    """A watermark that has seen everything stored so far"""
+    latest, max_id = (await db.execute(
+        select(func.max(Experiment.updated_at), func.max(Experiment.id))
+    )).one()
+    latest = latest or datetime(1970, 1, 1)
+    seen_ids = set((await db.execute(
+        select(Experiment.id).where(type_coerce(Experiment.updated_at, String) == to_db_timestamp(latest))
+    )).scalars().all())
+    return ChangeWatermark(latest, seen_ids, max_id or 0)
+
+async def metric_totals(db: AsyncSession, experiment_ids: Sequence[int]) -> Dict[str, Dict[str, float]]:
+    """
+    Per-model totals over these experiments' responses, counted the way
+    the rollups count them (sums over successful responses only, and
+    response time over those that weren't cache hits)
+    """
+    ok = ModelResponse.status == "ok"
+    timed = and_(ok, or_(ModelResponse.cache_status.is_(None), ModelResponse.cache_status != "hit"))
+    rows = (await db.execute(
+        select(
+            ModelResponse.model,
+            func.count().label("count"),
+            func.sum(case((ok, 0), else_=1)).label("error_count"),
+            func.sum(case((ok, 1), else_=0)).label("ok_count"),
+            func.sum(case((timed, 1), else_=0)).label("timed_count"),
+            func.sum(case((timed, ModelResponse.response_time_ms), else_=0)).label("response_time_sum"),
+            func.sum(case((ok, ModelResponse.accuracy), else_=0)).label("accuracy_sum"),
+            func.sum(case((ok, ModelResponse.relevancy), else_=0)).label("relevancy_sum")
+        )
+        .where(ModelResponse.experiment_id.in_(experiment_ids))
+        .group_by(ModelResponse.model)
+    )).all()
+    return {
+        row.model: {
+            "count": row.count,
+            "errorCount": row.error_count,
+            "cacheHits": row.ok_count - row.timed_count,
+            "responseTimeSum": row.response_time_sum or 0,
+            "accuracySum": row.accuracy_sum or 0,
+            "relevancySum": row.relevancy_sum or 0,
+        }
+        for row in rows
+    }
+
+_SEARCH_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+def fts_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, "quoted
+    phrases" match as phrases and a trailing * matches a prefix. Terms are
+    always quoted, so operators and punctuation in user input are literal.
+    """
+    terms = []
+    for phrase, word in _SEARCH_TERM.findall(query):
+        if phrase.strip():
+            terms.append(f'"{phrase}"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.replace('"', "").rstrip("*")
+            if word:
+                terms.append(f'"{word}"' + ("*" if prefix else ""))
+    if not terms:
+        raise InvalidSearchError("Search query has no terms")
+    return " ".join(terms)
+
+_SEARCH = text("""
+    SELECT e.id, e.prompt, e.models, e.created_at,
+           snippet(experiments_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet,
+           experiments_fts.rank AS rank
+    FROM experiments_fts JOIN experiments e ON e.id = experiments_fts.rowid
+    WHERE experiments_fts MATCH :query
+      AND (:model IS NULL OR EXISTS (
+          SELECT 1 FROM model_responses m WHERE m.experiment_id = e.id AND m.model = :model))
+      AND (:start IS NULL OR e.created_at >= :start)
+      AND (:end IS NULL OR e.created_at < :end)
+    ORDER BY experiments_fts.rank, e.id DESC
+    LIMIT :limit OFFSET :offset
+""").columns(models=JSON, created_at=DateTime(timezone=True))
+
+async def search_experiments(
+    db: AsyncSession,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    model: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    One page of experiments whose prompt, system prompt or response text
+    matches `query`, best match first (BM25, prompt matches weighted up).
+    Each item has a snippet of the best matching text, with matches in <mark>.
+    """
+    rows = (await db.execute(_SEARCH, {
+        "query": fts_query(query),
+        "model": model,
+        "start": to_db_timestamp(start) if start else None,
+        "end": to_db_timestamp(end) if end else None,
+        "limit": limit + 1,
+        "offset": offset,
+    })).all()
+    has_more = len(rows) > limit
+    items = [
+        {
+            "id": row.id,
+            "prompt": row.prompt,
+            "models": row.models,
+            "created_at": row.created_at,
+            "snippet": row.snippet,
+            "score": round(-row.rank, 4)
+        }
+        for row in rows[:limit]
+    ]
+    return {"items": items, "nextOffset": offset + limit if has_more else None}
+
+async def get_experiment(db: AsyncSession, experiment_id: int) -> Optional[Experiment]:
+    """
+    The experiment row. Its `responses` entries hold metrics only; the
+    response text is in model_responses (see get_experiment_document)
+    """
+    return await db.get(Experiment, experiment_id)
+
+async def response_texts(db: AsyncSession, experiment_ids: Sequence[int]) -> Dict[int, List[str]]:
+    """
+    Each experiment's response texts in entry order, decompressed from
+    model_responses or, for archived experiments, read from their archive file
+    """
+    texts: Dict[int, List[str]] = {}
+    locations: Dict[int, archive.Location] = {}
+    rows = (await db.execute(
+        select(
+            ModelResponse.experiment_id,
+            ModelResponse.response,
+            ResponseArchive.path,
+            ArchivedExperiment.offset,
+            ArchivedExperiment.length
+        )
+        .outerjoin(ArchivedExperiment, ArchivedExperiment.experiment_id == ModelResponse.experiment_id)
+        .outerjoin(ResponseArchive, ResponseArchive.id == ArchivedExperiment.archive_id)
+        .where(ModelResponse.experiment_id.in_(experiment_ids))
+        .order_by(ModelResponse.id)
+    )).all()
+    for row in rows:
+        texts.setdefault(row.experiment_id, []).append(row.response)
+        if row.path is not None:
+            locations[row.experiment_id] = (row.path, row.offset, row.length)
+    if locations:
+        texts.update(await asyncio.to_thread(archive.read, locations))
+    return texts
+
+def with_response_text(responses: List[Dict[str, Any]], texts: Sequence[str]) -> List[Dict[str, Any]]:
+    """Put the response text back into stored entries, right after `model` as the API has always shown it"""
+    if len(texts) != len(responses):
+        # Entries whose per-model rows never matched kept their text in the JSON
+        return responses
+    return [
+        entry if "response" in entry else {"model": entry["model"], "response": text, **entry}
+        for entry, text in zip(responses, texts)
+    ]
+
+def stored_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """A response entry as kept in experiments.responses: everything but the text"""
+    return {key: value for key, value in entry.items() if key != "response"}
+
+async def get_experiment_document(db: AsyncSession, experiment_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Full experiment as the API returns it, with each entry's response text
+    filled in. `models` is left as its stored JSON text (orjson.Fragment)
+    """
+    row = (await db.execute(
+        select(
+            Experiment.id,
+            Experiment.prompt,
+            Experiment.system_prompt,
+            type_coerce(Experiment.responses, String).label("responses"),
+            type_coerce(Experiment.models, String).label("models"),
+            Experiment.created_at,
+            Experiment.updated_at
+        ).where(Experiment.id == experiment_id)
+    )).first()
+    if row is None:
+        return None
+    texts = await response_texts(db, [row.id])
+    return {
+        "id": row.id,
+        "prompt": row.prompt,
+        "system_prompt": row.system_prompt,
+        "responses": with_response_text(orjson.loads(row.responses), texts.get(row.id, [])),
+        "models": orjson.Fragment(row.models),
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
+
+def model_response_rows(experiment_id: int, responses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flatten an experiment's response entries into model_responses rows"""
+    rows = []
+    for entry in responses:
+        metrics = entry.get("metrics", {})
+        rows.append({
+            "experiment_id": experiment_id,
+            "model": entry["model"],
+            "status": "error" if entry.get("error") else "ok",
+            "response": entry.get("response", ""),
+            "accuracy": metrics.get("accuracy"),
+            "relevancy": metrics.get("relevancy"),
+            "scorer_version": metrics.get("scorerVersion"),
+            "response_time_ms": metrics.get("responseTime"),
+            "time_to_first_token_ms": metrics.get("timeToFirstToken"),
+            "inter_token_latency_ms": metrics.get("interTokenLatency"),
+            "tokens_per_second": metrics.get("tokensPerSecond"),
+            "cache_status": (metrics.get("cache") or {}).get("status"),
+        })
+    return rows
+
+# Search indexes the text as it's saved, since SQLite can't read it once compressed
+_INDEX_FOR_SEARCH = text(
+    "INSERT INTO experiments_fts (rowid, prompt, system_prompt, responses) "
+    "VALUES (:id, :prompt, :system_prompt, :responses)"
+)
+
+def _new_experiment(record: Dict[str, Any]) -> Experiment:
+    experiment = Experiment(
+        prompt=record["prompt"],
+        system_prompt=record.get("systemPrompt") or "",
+        models=record["models"],
+        responses=[stored_entry(entry) for entry in record["responses"]]
+    )
+    if record.get("createdAt"):
+        # Imported rows keep their original time, stored in the same text
+        # format as the server default so keyset comparisons still line up
+        experiment.created_at = func.datetime(record["createdAt"])
+    return experiment
+
+async def add_experiments(db: AsyncSession, records: List[Dict[str, Any]]) -> List[Experiment]:
+    """
+    Stage experiments and their per-model rows; the caller commits.
+    Records may carry a createdAt (naive UTC "YYYY-MM-DD HH:MM:SS") to keep
+    an imported experiment's original time; its rows and rollups follow it.
+    """
+    experiments = [_new_experiment(record) for record in records]
+    db.add_all(experiments)
+    await db.flush()
+
+    rows_by_bucket: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for record, experiment in zip(records, experiments):
+        bucket = record["createdAt"][:13] + ":00:00" if record.get("createdAt") else None
+        rows_by_bucket.setdefault(bucket, []).extend(model_response_rows(experiment.id, record["responses"]))
+    for bucket, rows in rows_by_bucket.items():
+        if rows:
+            await db.execute(insert(ModelResponse), rows)
+            await rollups.record(db, rows, bucket_start=bucket)
+    await similarity.record(db, [(experiment.id, record["prompt"]) for record, experiment in zip(records, experiments)])
+    await db.execute(_INDEX_FOR_SEARCH, [
+        {
+            "id": experiment.id,
+            "prompt": experiment.prompt,
+            "system_prompt": experiment.system_prompt,
+            "responses": "\n".join(
+                entry.get("response", "") for entry in record["responses"] if entry.get("error") is None
+            ) or None,
+        }
+        for record, experiment in zip(records, experiments)
+    ])
+
+    backdated = [experiment.id for record, experiment in zip(records, experiments) if record.get("createdAt")]
+    if backdated:
+        await db.execute(
+            update(ModelResponse)
+            .where(ModelResponse.experiment_id.in_(backdated))
+            .values(created_at=select(Experiment.created_at)
+                    .where(Experiment.id == ModelResponse.experiment_id)
+                    .scalar_subquery())
+        )
+    return experiments
+
+async def save_experiments(db: AsyncSession, records: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert experiments and their per-model rows in one transaction.
+    Each record has prompt, systemPrompt, models and responses.
+    Returns the new experiment IDs in record order.
+    """
+    experiments = await add_experiments(db, records)
+    await db.commit()
+    return [experiment.id for experiment in experiments]
+
+async def save_experiment(
+    db: AsyncSession,
+    prompt: str,
+    system_prompt: str,
+    models: List[str],
+    responses: List[Dict[str, Any]]
+) -> Experiment:
+    """Insert one experiment and its per-model rows, returning the refreshed record"""
+    experiment, = await add_experiments(db, [{
+        "prompt": prompt,
+        "systemPrompt": system_prompt,
+        "models": models,
+        "responses": responses
+    }])
+    await db.commit()
+    # Picks up server-side defaults such as created_at
+    await db.refresh(experiment)
+    # Callers return the experiment as saved, so give it back its response text
+    set_committed_value(experiment, "responses", responses)
+    return experiment
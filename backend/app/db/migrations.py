@@ -0,0 +1,198 @@
+"""
+Database Migrations Module
+Ordered, idempotent schema changes for databases created by older versions.
+Progress is tracked in SQLite's PRAGMA user_version.
+"""
+
+from typing import Callable, List, Tuple
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.db import rollups, similarity
+
+logger = logging.getLogger(__name__)
+
+def _column_names(conn: Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+
+def _index_experiments_for_paging(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_experiments_created_at_id ON experiments (created_at, id)"
+    ))
+
+def _normalize_model_responses(conn: Connection) -> None:
+    """Add experiments.system_prompt and backfill model_responses from the JSON column"""
+    if "system_prompt" not in _column_names(conn, "experiments"):
+        conn.execute(text("ALTER TABLE experiments ADD COLUMN system_prompt VARCHAR NOT NULL DEFAULT ''"))
+
+    # The table itself comes from create_all; this fills it from old rows
+    result = conn.execute(text("""
+        INSERT INTO model_responses (
+            experiment_id, model, status, response, accuracy, relevancy,
+            response_time_ms, time_to_first_token_ms, inter_token_latency_ms,
+            tokens_per_second, cache_status, created_at
+        )
+        SELECT
+            e.id,
+            json_extract(r.value, '$.model'),
+            CASE
+                WHEN json_extract(r.value, '$.error') IS NOT NULL
+                  OR json_extract(r.value, '$.response') LIKE 'Error: %' THEN 'error'
+                ELSE 'ok'
+            END,
+            COALESCE(json_extract(r.value, '$.response'), ''),
+            json_extract(r.value, '$.metrics.accuracy'),
+            json_extract(r.value, '$.metrics.relevancy'),
+            json_extract(r.value, '$.metrics.responseTime'),
+            json_extract(r.value, '$.metrics.timeToFirstToken'),
+            json_extract(r.value, '$.metrics.interTokenLatency'),
+            json_extract(r.value, '$.metrics.tokensPerSecond'),
+            json_extract(r.value, '$.metrics.cache.status'),
+            e.created_at
+        FROM experiments e, json_each(e.responses) r
+        WHERE NOT EXISTS (SELECT 1 FROM model_responses m WHERE m.experiment_id = e.id)
+    """))
+    logger.info(f"Backfilled {result.rowcount} model responses")
+
+def _build_metric_rollups(conn: Connection) -> None:
+    """Populate the hourly rollup tables from existing model_responses"""
+    rollups.rebuild(conn)
+
+def _add_scorer_version(conn: Connection) -> None:
+    """Record which scorer produced each score; existing scores came from the original heuristic"""
+    if "scorer_version" not in _column_names(conn, "model_responses"):
+        conn.execute(text("ALTER TABLE model_responses ADD COLUMN scorer_version VARCHAR"))
+    conn.execute(text(
+        "UPDATE model_responses SET scorer_version = 'heuristic-v1' "
+        "WHERE scorer_version IS NULL AND status = 'ok'"
+    ))
+
+# Text of an experiment's successful responses, as indexed for search
+_RESPONSE_TEXT = """(SELECT group_concat(json_extract(r.value, '$.response'), char(10))
+    FROM json_each({row}.responses) r WHERE json_extract(r.value, '$.error') IS NULL)"""
+
+def _add_search_index(conn: Connection) -> None:
+    """
+    Full-text index over prompts and response text (SQLite FTS5), one row per
+    experiment keyed by its ID and kept in sync by triggers. Updates only
+    re-index when the text changed, so re-scoring doesn't touch the index.
+    Prefix indexes keep short prefix queries (e.g. "tra*") from scanning
+    every matching term.
+    """
+    conn.execute(text("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS experiments_fts USING fts5(
+            prompt, system_prompt, responses,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """))
+    # Prompt matches outrank response matches by default
+    conn.execute(text("INSERT INTO experiments_fts (experiments_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0, 1.0)')"))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS experiments_fts_insert AFTER INSERT ON experiments BEGIN
+            INSERT INTO experiments_fts (rowid, prompt, system_prompt, responses)
+            VALUES (new.id, new.prompt, new.system_prompt, {_RESPONSE_TEXT.format(row="new")});
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS experiments_fts_delete AFTER DELETE ON experiments BEGIN
+            DELETE FROM experiments_fts WHERE rowid = old.id;
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS experiments_fts_update AFTER UPDATE OF prompt, system_prompt, responses ON experiments
+        WHEN old.prompt IS NOT new.prompt
+          OR old.system_prompt IS NOT new.system_prompt
+          OR {_RESPONSE_TEXT.format(row="old")} IS NOT {_RESPONSE_TEXT.format(row="new")}
+        BEGIN
+            DELETE FROM experiments_fts WHERE rowid = old.id;
+            INSERT INTO experiments_fts (rowid, prompt, system_prompt, responses)
+            VALUES (new.id, new.prompt, new.system_prompt, {_RESPONSE_TEXT.format(row="new")});
+        END
+    """))
+    result = conn.execute(text(f"""
+        INSERT INTO experiments_fts (rowid, prompt, system_prompt, responses)
+        SELECT e.id, e.prompt, e.system_prompt, {_RESPONSE_TEXT.format(row="e")}
+        FROM experiments e WHERE e.id NOT IN (SELECT rowid FROM experiments_fts)
+    """))
+    logger.info(f"Indexed {result.rowcount} experiments for search")
+
+def _index_prompt_similarity(conn: Connection) -> None:
+    """MinHash/LSH index over prompts; the tables come from create_all, this backfills them"""
+    similarity.rebuild(conn)
+
+def _store_response_text_once(conn: Connection) -> None:
+    """
+    Keep response text only in model_responses, where it's stored compressed
+    (app/db/codec.py), instead of also inside experiments.responses. The
+    search index can't read compressed text, so it's now filled by
+    crud.add_experiments rather than triggers; what it already holds stays.
+    Existing rows stay plain text until `python maintenance.py compress`.
+    """
+    conn.execute(text("DROP TRIGGER IF EXISTS experiments_fts_insert"))
+    conn.execute(text("DROP TRIGGER IF EXISTS experiments_fts_update"))
+    # Only where every entry has its per-model row to read the text from
+    result = conn.execute(text("""
+        UPDATE experiments
+        SET responses = (SELECT json_group_array(json(json_remove(r.value, '$.response'))) FROM json_each(experiments.responses) r)
+        WHERE EXISTS (SELECT 1 FROM json_each(experiments.responses) r WHERE json_type(r.value, '$.response') IS NOT NULL)
+          AND json_array_length(responses) = (SELECT count(*) FROM model_responses m WHERE m.experiment_id = experiments.id)
+    """))
+    logger.info(f"Moved response text out of {result.rowcount} experiments' JSON")
+
+def _track_experiment_changes(conn: Connection) -> None:
+    """
+    Make updated_at mean "last changed" for every experiment, backfilled
+    from created_at, and keep a counter that triggers bump on every insert
+    or update. Reading the counter is how readers (ETags, the event feed)
+    learn cheaply whether anything changed, whichever process wrote it.
+    """
+    result = conn.execute(text("UPDATE experiments SET updated_at = created_at WHERE updated_at IS NULL"))
+    logger.info(f"Backfilled updated_at for {result.rowcount} experiments")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_experiments_updated_at_id ON experiments (updated_at, id)"
+    ))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS change_counters (name VARCHAR PRIMARY KEY, value INTEGER NOT NULL)"
+    ))
+    conn.execute(text("INSERT OR IGNORE INTO change_counters (name, value) VALUES ('experiments', 0)"))
+    for operation in ("INSERT", "UPDATE"):
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS experiments_changed_{operation.lower()} AFTER {operation} ON experiments BEGIN
+                UPDATE change_counters SET value = value + 1 WHERE name = 'experiments';
+            END
+        """))
+
+def _exclude_cache_hits_from_latency(conn: Connection) -> None:
+    """Count cache hits apart, and rebuild the rollups without their lookup times"""
+    if "cache_hit_count" not in _column_names(conn, "model_metric_rollups"):
+        conn.execute(text(
+            "ALTER TABLE model_metric_rollups ADD COLUMN cache_hit_count INTEGER NOT NULL DEFAULT 0"
+        ))
+    rollups.rebuild(conn)
+
+# (version, description, step); append only, never reorder
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Index experiments for keyset pagination", _index_experiments_for_paging),
+    (2, "Normalize per-model responses", _normalize_model_responses),
+    (3, "Build per-model metric rollups", _build_metric_rollups),
+    (4, "Track scorer versions", _add_scorer_version),
+    (5, "Add full-text search index", _add_search_index),
+    (6, "Index prompts for similarity lookups", _index_prompt_similarity),
+    (7, "Store response text once, compressed", _store_response_text_once),
+    (8, "Track experiment changes", _track_experiment_changes),
+    (9, "Exclude cache hits from response-time rollups", _exclude_cache_hits_from_latency),
+]
+
+def run_migrations(conn: Connection) -> None:
+    """
+    Apply every migration newer than the database's user_version.
+    Runs inside the caller's transaction (use AsyncConnection.run_sync).
+    """
+    current = conn.execute(text("PRAGMA user_version")).scalar()
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        step(conn)
+        conn.execute(text(f"PRAGMA user_version = {version}"))
@@ -1,9 +1,10 @@
 """
 Database Models Module
 """
-from sqlalchemy import Column, Integer, String, JSON, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Float, JSON, DateTime, Index, ForeignKey, LargeBinary
 from sqlalchemy.sql import func
 from app.db.database import Base
+from app.db.codec import CompressedText
 
 class Experiment(Base):
     """Experiment table definition"""
@@ -11,10 +12,148 @@ class Experiment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     prompt = Column(String, nullable=False)
+    system_prompt = Column(String, nullable=False, default="")
     responses = Column(JSON, nullable=False, default=list)
     models = Column(JSON, nullable=False, default=list)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set on insert too, so `since=` deltas see new experiments; a column
+    # default rather than a server one, which older tables don't have
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+    # Serve keyset pagination over (created_at, id), and deltas over (updated_at, id)
+    __table_args__ = (
+        Index("ix_experiments_created_at_id", "created_at", "id"),
+        Index("ix_experiments_updated_at_id", "updated_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"<Experiment(id={self.id}, prompt={self.prompt})>"
+
+class ModelResponse(Base):
+    """One model's output and metrics within an experiment"""
+    __tablename__ = "model_responses"
+
+    id = Column(Integer, primary_key=True)
+    experiment_id = Column(Integer, ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False, index=True)
+    model = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="ok")  # "ok" or "error"
+    response = Column(CompressedText, nullable=False, default="")  # zstd frame, see app/db/codec.py; empty once archived
+    accuracy = Column(Float)
+    relevancy = Column(Float)
+    scorer_version = Column(String)  # scorer that produced accuracy/relevancy
+    response_time_ms = Column(Float)
+    time_to_first_token_ms = Column(Float)
+    inter_token_latency_ms = Column(Float)
+    tokens_per_second = Column(Float)
+    cache_status = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Serves per-model queries over a time window
+    __table_args__ = (
+        Index("ix_model_responses_model_created_at", "model", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<ModelResponse(id={self.id}, experiment_id={self.experiment_id}, model={self.model})>"
+
+
+class EvaluationJob(Base):
+    """An experiment submitted for background evaluation, checkpointed per model"""
+    __tablename__ = "evaluation_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="queued")  # queued -> running -> completed | failed
+    prompt = Column(String, nullable=False)
+    system_prompt = Column(String, nullable=False, default="")
+    models = Column(JSON, nullable=False, default=list)
+    options = Column(JSON, nullable=False, default=dict)  # useCache, refreshCache
+    results = Column(JSON, nullable=False, default=dict)  # model -> finished response entry
+    experiment_id = Column(Integer, ForeignKey("experiments.id", ondelete="SET NULL"))
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String)  # worker holding the lease while running
+    lease_expires_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    # Serves the workers' claim query
+    __table_args__ = (
+        Index("ix_evaluation_jobs_status_created_at", "status", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<EvaluationJob(id={self.id}, status={self.status})>"
+
+class ModelMetricRollup(Base):
+    """Per-model counters for one hour, updated as experiments are saved"""
+    __tablename__ = "model_metric_rollups"
+
+    model = Column(String, primary_key=True)
+    bucket_start = Column(String, primary_key=True)  # UTC hour, "YYYY-MM-DD HH:00:00"
+    count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    cache_hit_count = Column(Integer, nullable=False, default=0)  # not in response_time_sum or the sketch
+    response_time_sum = Column(Float, nullable=False, default=0)
+    accuracy_sum = Column(Float, nullable=False, default=0)
+    relevancy_sum = Column(Float, nullable=False, default=0)
 
     def __repr__(self):
-        return f"<Experiment(id={self.id}, prompt={self.prompt})>"
\ No newline at end of file
+        return f"<ModelMetricRollup(model={self.model}, bucket_start={self.bucket_start}, count={self.count})>"
+
+class RollupLatencyBin(Base):
+    """One bin of a rollup's response-time sketch (log-spaced, see app/db/rollups.py)"""
+    __tablename__ = "rollup_latency_bins"
+
+    model = Column(String, primary_key=True)
+    bucket_start = Column(String, primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PromptSignature(Base):
+    """MinHash signature of an experiment's prompt (see app/db/similarity.py)"""
+    __tablename__ = "prompt_signatures"
+
+    experiment_id = Column(Integer, ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # NUM_PERM little-endian uint32 values
+
+
+class PromptLshBucket(Base):
+    """One LSH band bucket an experiment's prompt falls into"""
+    __tablename__ = "prompt_lsh_buckets"
+
+    # Primary key order serves "which experiments share this bucket"
+    bucket = Column(BigInteger, primary_key=True, autoincrement=False)
+    experiment_id = Column(Integer, ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
+class ResponseDictionary(Base):
+    """A zstd dictionary trained on stored responses (see app/db/codec.py)"""
+    __tablename__ = "response_dictionaries"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False)  # the ID zstd writes into each frame
+    data = Column(LargeBinary, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ResponseArchive(Base):
+    """One archive file of experiments' response text (see app/db/archive.py)"""
+    __tablename__ = "response_archives"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)  # file name, relative to ARCHIVE_DIR
+    experiments = Column(Integer, nullable=False, default=0)
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ArchivedExperiment(Base):
+    """Where an archived experiment's response text is: one zstd frame in an archive file"""
+    __tablename__ = "archived_experiments"
+
+    experiment_id = Column(Integer, ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True)
+    archive_id = Column(Integer, ForeignKey("response_archives.id"), nullable=False, index=True)
+    offset = Column(BigInteger, nullable=False)
+    length = Column(Integer, nullable=False)
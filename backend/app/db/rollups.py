@@ -0,0 +1,202 @@
+"""
+Metrics Rollups Module
+Per-model, per-hour aggregates kept up to date as experiments are saved,
+so dashboards never have to scan raw responses.
+
+Response-time quantiles come from a log-bucketed sketch (as in DDSketch):
+each successful call increments one bin whose bounds grow by a constant
+factor, which keeps every quantile within RELATIVE_ACCURACY of the true
+value and lets hours be merged by simply adding bin counts.
+
+Cache hits are counted (and scored) like any response, but their response
+time is the cache lookup, not the model's, so they're kept out of the
+response-time sum and sketch.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+from collections import defaultdict
+from datetime import datetime, timezone
+import math
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_RESPONSE_TIME_MS = 0.001
+
+HOUR_FORMAT = "%Y-%m-%d %H:00:00"
+
+# SQL expression that maps an hourly bucket_start onto each supported bucket
+BUCKET_EXPRESSIONS = {
+    "hour": "bucket_start",
+    "day": "substr(bucket_start, 1, 10) || ' 00:00:00'",
+    "week": "date(bucket_start, '-6 days', 'weekday 1') || ' 00:00:00'",  # weeks start Monday
+    "all": "NULL",
+}
+
+def latency_bin(response_time_ms: float) -> int:
+    return math.ceil(math.log(max(response_time_ms, MIN_RESPONSE_TIME_MS)) / LOG_GAMMA)
+
+def bin_value(index: int) -> float:
+    """Representative value of a bin, within RELATIVE_ACCURACY of anything in it"""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+def quantile(bins: Dict[int, int], q: float) -> Optional[float]:
+    total = sum(bins.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for index in sorted(bins):
+        seen += bins[index]
+        if seen > rank:
+            return round(bin_value(index), 2)
+    return round(bin_value(max(bins)), 2)
+
+def hour_bucket(moment: Optional[datetime] = None) -> str:
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime(HOUR_FORMAT)
+
+def _aggregate(rows: Iterable[Dict[str, Any]], bucket_start: Optional[str]):
+    """Fold model_responses rows into counter and bin increments per (model, hour)"""
+    counters = defaultdict(lambda: {"count": 0, "error_count": 0, "cache_hit_count": 0, "response_time_sum": 0.0,
+                                    "accuracy_sum": 0.0, "relevancy_sum": 0.0})
+    bins = defaultdict(int)
+    for row in rows:
+        bucket = bucket_start or row["bucket_start"]
+        key = (row["model"], bucket)
+        counter = counters[key]
+        counter["count"] += 1
+        if row["status"] == "error":
+            counter["error_count"] += 1
+            continue
+        counter["accuracy_sum"] += row["accuracy"] or 0
+        counter["relevancy_sum"] += row["relevancy"] or 0
+        if row["cache_status"] == "hit":
+            counter["cache_hit_count"] += 1
+            continue
+        counter["response_time_sum"] += row["response_time_ms"] or 0
+        bins[(row["model"], bucket, latency_bin(row["response_time_ms"] or 0))] += 1
+
+    counter_params = [{"model": model, "bucket_start": bucket, **values}
+                      for (model, bucket), values in counters.items()]
+    bin_params = [{"model": model, "bucket_start": bucket, "bin": index, "count": count}
+                  for (model, bucket, index), count in bins.items()]
+    return counter_params, bin_params
+
+# Increments are applied as upserts in SQL, so concurrent writers never
+# overwrite each other's counts
+UPSERT_COUNTERS = text("""
+    INSERT INTO model_metric_rollups
+        (model, bucket_start, count, error_count, cache_hit_count, response_time_sum, accuracy_sum, relevancy_sum)
+    VALUES
+        (:model, :bucket_start, :count, :error_count, :cache_hit_count, :response_time_sum, :accuracy_sum, :relevancy_sum)
+    ON CONFLICT (model, bucket_start) DO UPDATE SET
+        count = count + excluded.count,
+        error_count = error_count + excluded.error_count,
+        cache_hit_count = cache_hit_count + excluded.cache_hit_count,
+        response_time_sum = response_time_sum + excluded.response_time_sum,
+        accuracy_sum = accuracy_sum + excluded.accuracy_sum,
+        relevancy_sum = relevancy_sum + excluded.relevancy_sum
+""")
+
+UPSERT_BINS = text("""
+    INSERT INTO rollup_latency_bins (model, bucket_start, bin, count)
+    VALUES (:model, :bucket_start, :bin, :count)
+    ON CONFLICT (model, bucket_start, bin) DO UPDATE SET count = count + excluded.count
+""")
+
+async def record(db: AsyncSession, rows: List[Dict[str, Any]], bucket_start: Optional[str] = None) -> None:
+    """
+    Add freshly inserted model_responses rows to their hourly rollups,
+    inside the caller's transaction. Rows default to the current hour.
+    """
+    counter_params, bin_params = _aggregate(rows, bucket_start or hour_bucket())
+    if counter_params:
+        await db.execute(UPSERT_COUNTERS, counter_params)
+    if bin_params:
+        await db.execute(UPSERT_BINS, bin_params)
+
+def rebuild(conn: Connection, chunk_size: int = 5000) -> None:
+    """Recompute every rollup from model_responses (for backfills and re-scoring)"""
+    conn.execute(text("DELETE FROM model_metric_rollups"))
+    conn.execute(text("DELETE FROM rollup_latency_bins"))
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, model, status, cache_status, response_time_ms, accuracy, relevancy,
+                   strftime('%Y-%m-%d %H:00:00', created_at) AS bucket_start
+            FROM model_responses WHERE id > :last_id ORDER BY id LIMIT :limit
+        """), {"last_id": last_id, "limit": chunk_size}).mappings().all()
+        if not rows:
+            break
+        counter_params, bin_params = _aggregate(rows, None)
+        conn.execute(UPSERT_COUNTERS, counter_params)
+        if bin_params:
+            conn.execute(UPSERT_BINS, bin_params)
+        last_id = rows[-1]["id"]
+
+async def query(
+    db: AsyncSession,
+    bucket: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    model: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Merge hourly rollups into the requested bucket size and summarize them"""
+    bucket_expr = BUCKET_EXPRESSIONS[bucket]
+    filters = ["1 = 1"]
+    params: Dict[str, Any] = {}
+    if start:
+        filters.append("bucket_start >= :start")
+        params["start"] = start
+    if end:
+        filters.append("bucket_start < :end")
+        params["end"] = end
+    if model:
+        filters.append("model = :model")
+        params["model"] = model
+    where = " AND ".join(filters)
+
+    counters = (await db.execute(text(f"""
+        SELECT model, {bucket_expr} AS bucket, SUM(count) AS count, SUM(error_count) AS error_count,
+               SUM(cache_hit_count) AS cache_hit_count, SUM(response_time_sum) AS response_time_sum, SUM(accuracy_sum) AS accuracy_sum,
+               SUM(relevancy_sum) AS relevancy_sum
+        FROM model_metric_rollups WHERE {where}
+        GROUP BY model, bucket ORDER BY bucket, model
+    """), params)).mappings().all()
+
+    bins: Dict[tuple, Dict[int, int]] = defaultdict(dict)
+    for row in (await db.execute(text(f"""
+        SELECT model, {bucket_expr} AS bucket, bin, SUM(count) AS count
+        FROM rollup_latency_bins WHERE {where}
+        GROUP BY model, bucket, bin
+    """), params)).mappings():
+        bins[(row["model"], row["bucket"])][row["bin"]] = row["count"]
+
+    series = []
+    for row in counters:
+        ok_count = row["count"] - row["error_count"]
+        timed_count = ok_count - row["cache_hit_count"]
+        sketch = bins.get((row["model"], row["bucket"]), {})
+        series.append({
+            "model": row["model"],
+            "bucketStart": row["bucket"],
+            "count": row["count"],
+            "errorRate": round(row["error_count"] / row["count"], 4) if row["count"] else 0,
+            "cacheHits": row["cache_hit_count"],
+            "responseTime": {
+                "mean": round(row["response_time_sum"] / timed_count, 2) if timed_count else None,
+                "p50": quantile(sketch, 0.50),
+                "p95": quantile(sketch, 0.95),
+                "p99": quantile(sketch, 0.99),
+            },
+            "accuracy": round(row["accuracy_sum"] / ok_count, 2) if ok_count else None,
+            "relevancy": round(row["relevancy_sum"] / ok_count, 2) if ok_count else None,
+        })
+    return series
@@ -0,0 +1,176 @@
+"""
+Prompt Similarity Module
+Near-duplicate lookup over stored prompts with MinHash and LSH banding,
+kept up to date as experiments are saved.
+
+Each prompt is normalized (case, whitespace), cut into overlapping
+character shingles and summarized as NUM_PERM MinHash values; the share of
+equal values between two signatures estimates the Jaccard similarity of
+their shingle sets. Signatures are split into BANDS bands of ROWS values,
+and each band is hashed (with its position) into an indexed bucket, so a
+lookup only reads experiments that share a bucket with the query (likely
+for Jaccard above ~0.4) instead of scanning the table.
+
+NumPy is imported on first use so the app can start without loading it.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import re
+import zlib
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+SEED = 1  # fixed, so stored signatures stay comparable across restarts
+
+_WHITESPACE = re.compile(r"\s+")
+_permutations = None
+
+def _hash_parameters():
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+        rng = np.random.default_rng(SEED)
+        _permutations = (
+            rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64),
+            rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64),
+        )
+    return _permutations
+
+def normalize(prompt: str) -> str:
+    return _WHITESPACE.sub(" ", prompt).strip().lower()
+
+def signature(prompt: str):
+    """MinHash signature (NUM_PERM uint32 values) of a prompt's character shingles"""
+    import numpy as np
+    normalized = normalize(prompt)
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    a, b = _hash_parameters()
+    # Universal hashing (a*x + b) in wrapping 64-bit arithmetic, kept to 32 bits
+    permuted = (np.outer(hashes, a) + b) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+# Odd 64-bit multipliers that mix a band's values and position into its bucket
+_MIX = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9)
+
+def buckets(sig) -> List[int]:
+    """One signed 64-bit LSH bucket per band, as stored in prompt_lsh_buckets"""
+    import numpy as np
+    # ROWS uint32 values per band, read as ROWS / 2 uint64 words
+    words = sig.view(np.uint64).reshape(BANDS, ROWS // 2)
+    mixed = np.arange(BANDS, dtype=np.uint64) * np.uint64(_MIX[2])
+    for column in range(ROWS // 2):
+        mixed = (mixed ^ words[:, column]) * np.uint64(_MIX[column % 2])
+        mixed ^= mixed >> np.uint64(29)
+    return mixed.view(np.int64).tolist()
+
+def _rows(experiments: Sequence[Tuple[int, str]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    signatures, bucket_rows = [], []
+    for experiment_id, prompt in experiments:
+        sig = signature(prompt)
+        signatures.append({"experiment_id": experiment_id, "signature": sig.tobytes()})
+        bucket_rows.extend({"bucket": bucket, "experiment_id": experiment_id} for bucket in set(buckets(sig)))
+    return signatures, bucket_rows
+
+INSERT_SIGNATURE = text("INSERT OR REPLACE INTO prompt_signatures (experiment_id, signature) VALUES (:experiment_id, :signature)")
+INSERT_BUCKET = text("INSERT OR IGNORE INTO prompt_lsh_buckets (bucket, experiment_id) VALUES (:bucket, :experiment_id)")
+
+async def record(db: AsyncSession, experiments: Sequence[Tuple[int, str]]) -> None:
+    """Index freshly inserted (experiment ID, prompt) pairs inside the caller's transaction"""
+    signatures, bucket_rows = _rows(experiments)
+    if signatures:
+        await db.execute(INSERT_SIGNATURE, signatures)
+        await db.execute(INSERT_BUCKET, bucket_rows)
+
+def rebuild(conn: Connection, chunk_size: int = 2000) -> None:
+    """Index every experiment that has no signature yet (for backfills)"""
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT e.id, e.prompt FROM experiments e
+            WHERE e.id > :last_id AND NOT EXISTS (SELECT 1 FROM prompt_signatures s WHERE s.experiment_id = e.id)
+            ORDER BY e.id LIMIT :limit
+        """), {"last_id": last_id, "limit": chunk_size}).all()
+        if not rows:
+            break
+        signatures, bucket_rows = _rows([(row.id, row.prompt) for row in rows])
+        conn.execute(INSERT_SIGNATURE, signatures)
+        conn.execute(INSERT_BUCKET, bucket_rows)
+        last_id = rows[-1].id
+
+CANDIDATES = text("""
+    SELECT b.experiment_id, s.signature
+    FROM prompt_lsh_buckets b JOIN prompt_signatures s ON s.experiment_id = b.experiment_id
+    WHERE b.bucket IN :buckets
+    GROUP BY b.experiment_id
+    ORDER BY COUNT(*) DESC, b.experiment_id DESC
+    LIMIT :limit
+""").bindparams(bindparam("buckets", expanding=True))
+
+EXPERIMENTS = text("""
+    SELECT id, prompt, system_prompt, created_at FROM experiments WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True)).columns(created_at=DateTime(timezone=True))
+
+METRICS = text("""
+    SELECT experiment_id, model, status, accuracy, relevancy, response_time_ms
+    FROM model_responses WHERE experiment_id IN :ids ORDER BY id
+""").bindparams(bindparam("ids", expanding=True))
+
+async def query(
+    db: AsyncSession,
+    prompt: str,
+    k: int,
+    min_similarity: float = 0.0,
+    exclude_id: Optional[int] = None,
+    max_candidates: int = 500
+) -> List[Dict[str, Any]]:
+    """
+    The k stored experiments whose prompts are most similar to `prompt`,
+    with the estimated Jaccard similarity and each model's metrics
+    """
+    import numpy as np
+    sig = signature(prompt)
+    # Candidates sharing the most buckets first; one more than needed in
+    # case the excluded experiment is among them
+    candidates = (await db.execute(CANDIDATES, {"buckets": list(set(buckets(sig))), "limit": max_candidates + 1})).all()
+
+    scored = []
+    for row in candidates:
+        if row.experiment_id == exclude_id:
+            continue
+        similarity = float(np.mean(np.frombuffer(row.signature, dtype=np.uint32) == sig))
+        if similarity >= min_similarity:
+            scored.append((similarity, row.experiment_id))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    scored = scored[:k]
+    if not scored:
+        return []
+
+    ids = [experiment_id for _, experiment_id in scored]
+    experiments = {row.id: row for row in (await db.execute(EXPERIMENTS, {"ids": ids})).all()}
+    metrics: Dict[int, List[Dict[str, Any]]] = {experiment_id: [] for experiment_id in ids}
+    for row in (await db.execute(METRICS, {"ids": ids})).all():
+        metrics[row.experiment_id].append({
+            "model": row.model,
+            "status": row.status,
+            "accuracy": row.accuracy,
+            "relevancy": row.relevancy,
+            "responseTime": row.response_time_ms,
+        })
+    return [
+        {
+            "id": experiment_id,
+            "prompt": experiments[experiment_id].prompt,
+            "system_prompt": experiments[experiment_id].system_prompt,
+            "created_at": experiments[experiment_id].created_at,
+            "similarity": round(similarity, 3),
+            "metrics": metrics[experiment_id],
+        }
+        for similarity, experiment_id in scored
+        if experiment_id in experiments
+    ]
@@ -0,0 +1,146 @@
+"""
+Batch Evaluation Service
+Runs a whole dataset of prompts against a set of models, streaming results
+back as they complete and saving experiments in bulk
+"""
+
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List
+import asyncio
+import json
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud
+
+if TYPE_CHECKING:
+    from app.services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+class DatasetError(ValueError):
+    """Raised when an uploaded dataset can't be parsed"""
+    pass
+
+def parse_dataset(content: bytes) -> List[Dict[str, str]]:
+    """
+    Parse a JSONL dataset, one {"prompt": ..., "systemPrompt": ...} object per line.
+    Blank lines are skipped; systemPrompt is optional.
+    """
+    items = []
+    for line_number, line in enumerate(content.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise DatasetError(f"Line {line_number}: invalid JSON ({e.msg})")
+        if not isinstance(record, dict) or not isinstance(record.get("prompt"), str) or not record["prompt"]:
+            raise DatasetError(f"Line {line_number}: expected an object with a non-empty 'prompt'")
+        items.append({
+            "prompt": record["prompt"],
+            "systemPrompt": record.get("systemPrompt") or ""
+        })
+    if not items:
+        raise DatasetError("Dataset contains no prompts")
+    return items
+
+class BatchRunner:
+    def __init__(
+        self,
+        llm_service: "LLMService",
+        session_factory: Callable[[], AsyncSession],
+        max_concurrency: int,
+        chunk_size: int
+    ):
+        """
+        Args:
+            llm_service: Service used for every model call
+            session_factory: Creates the database session experiments are saved with
+            max_concurrency: Model calls in flight at once across the whole batch
+            chunk_size: Experiments inserted per commit
+        """
+        self.llm_service = llm_service
+        self.session_factory = session_factory
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+
+    async def run(
+        self,
+        items: List[Dict[str, str]],
+        models: List[str],
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Evaluate every prompt against every model, yielding events as they happen:
+        - result: one prompt finished on all models (with progress counters)
+        - saved: a chunk of experiments was committed, mapping dataset index to ID
+        - done: the whole batch finished
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def evaluate(prompt: str, system_prompt: str, model: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.llm_service.evaluate_model(prompt, system_prompt, model, use_cache)
+
+        async def run_item(index: int, item: Dict[str, str]):
+            responses = await asyncio.gather(*(
+                evaluate(item["prompt"], item["systemPrompt"], model) for model in models
+            ))
+            return index, item, list(responses)
+
+        tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+        db = self.session_factory()
+        pending: List[tuple] = []
+        completed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, item, responses = await next_done
+                completed += 1
+                pending.append((index, {
+                    "prompt": item["prompt"],
+                    "systemPrompt": item["systemPrompt"],
+                    "models": models,
+                    "responses": responses
+                }))
+                yield {
+                    "type": "result",
+                    "index": index,
+                    "prompt": item["prompt"],
+                    "systemPrompt": item["systemPrompt"],
+                    "responses": responses,
+                    "completed": completed,
+                    "total": len(items)
+                }
+                if len(pending) >= self.chunk_size:
+                    saved, pending = await self._save(db, pending), []
+                    yield saved
+
+            if pending:
+                saved, pending = await self._save(db, pending), []
+                yield saved
+            yield {"type": "done", "completed": completed, "total": len(items)}
+
+        finally:
+            # Client went away or something failed: stop outstanding calls but
+            # keep whatever already finished
+            for task in tasks:
+                task.cancel()
+            if pending:
+                try:
+                    await self._save(db, pending)
+                except Exception as e:
+                    logger.error(f"Failed to save partial batch: {str(e)}")
+            await db.close()
+
+    async def _save(self, db: AsyncSession, pending: List[tuple]) -> Dict[str, Any]:
+        """Insert a chunk of experiments in a single commit"""
+        try:
+            saved_ids = await crud.save_experiments(db, [record for _, record in pending])
+            ids = {index: experiment_id for (index, _), experiment_id in zip(pending, saved_ids)}
+        except Exception:
+            await db.rollback()
+            raise
+        logger.info(f"Saved batch chunk of {len(ids)} experiments")
+        return {"type": "saved", "ids": ids}
+
+# Make the batch helpers available for import
+__all__ = ['BatchRunner', 'DatasetError', 'parse_dataset']
@@ -0,0 +1,153 @@
+"""
+Response Cache Module
+Two-tier cache for model responses: an in-memory LRU in front of a
+persistent SQLite store, so identical calls survive restarts
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl: float, disk_path: Optional[str], disk_ttl: float):
+        """
+        Args:
+            max_entries: Maximum number of responses held in memory
+            ttl: Seconds a response stays valid in memory
+            disk_path: SQLite file for the persistent tier (None disables it)
+            disk_ttl: Seconds a response stays valid on disk
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_ttl = disk_ttl
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "memoryHits": 0,
+            "diskHits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_prompt: str, prompt: str, params: Dict[str, Any]) -> str:
+        """Stable key over everything that determines a model's output"""
+        raw = json.dumps(
+            [provider, model, system_prompt, prompt, params],
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Look up a response; returns (response, tier) or None on a miss"""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            stored_at, response = entry
+            if now - stored_at <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memoryHits"] += 1
+                return response, "memory"
+            # Expired entries are dropped on read
+            del self._memory[key]
+            self.stats["evictions"] += 1
+
+        if self.disk_path:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                stored_at, response = row
+                # Promote to memory, keeping the original age so TTLs line up
+                self._store_memory(key, response, stored_at)
+                self.stats["hits"] += 1
+                self.stats["diskHits"] += 1
+                return response, "disk"
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, response: str) -> int:
+        """Store a response in both tiers; returns how many entries were evicted"""
+        now = time.time()
+        evicted = self._store_memory(key, response, now)
+        if self.disk_path:
+            await asyncio.to_thread(self._disk_set, key, response, now)
+        return evicted
+
+    def close(self) -> None:
+        """Close the persistent tier"""
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def _store_memory(self, key: str, response: str, stored_at: float) -> int:
+        self._memory[key] = (stored_at, response)
+        self._memory.move_to_end(key)
+
+        evicted = 0
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            evicted += 1
+        self.stats["evictions"] += evicted
+        return evicted
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._disk is None:
+            self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS ix_response_cache_stored_at ON response_cache (stored_at)"
+            )
+        return self._disk
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        try:
+            with self._disk_lock:
+                row = self._connect().execute(
+                    "SELECT stored_at, response FROM response_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+        if row is None or now - row[0] > self.disk_ttl:
+            return None
+        return row
+
+    def _disk_set(self, key: str, response: str, now: float) -> None:
+        try:
+            with self._disk_lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO response_cache (key, response, stored_at) VALUES (?, ?, ?)",
+                        (key, response, now)
+                    )
+                    # Expired rows are purged as part of each write
+                    purged = conn.execute(
+                        "DELETE FROM response_cache WHERE stored_at < ?", (now - self.disk_ttl,)
+                    ).rowcount
+            if purged:
+                self.stats["evictions"] += purged
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+# Make the cache class available for import
+__all__ = ['ResponseCache']
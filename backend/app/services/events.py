@@ -0,0 +1,236 @@
+"""
+Event Bus Module
+Pushes experiment activity to connected dashboards (Server-Sent Events or
+WebSocket) so they don't have to re-fetch the experiment list to notice it.
+
+Events:
+    model_finished: one model of an experiment run by this process answered
+        (model, status, metrics, prompt, and jobId for background jobs)
+    experiment_created / experiment_updated: an experiment was saved or
+        re-scored, as the summary GET /api/experiments returns
+    metrics: per-model count, errorCount, cacheHits and responseTime/
+        accuracy/relevancy sums over newly created experiments, to add to
+        running totals (response time excludes cache hits)
+    resync: events were missed (a slow client, a reconnect from too far
+        back, or a burst such as an import); re-fetch with `since=`
+
+Saved experiments are found by one change feed per process, which reads
+the database's change counter on an interval and only queries for changes
+when it moved. That covers every writer, including job workers running in
+other processes, and costs the same however many clients are connected.
+The feed runs while someone is subscribed, and for a while after the last
+client leaves so one that reconnects can still be caught up.
+
+Each event is encoded once and shares its bytes across subscribers. Every
+subscriber has a bounded queue; one that falls behind gets a single resync
+instead of an ever-growing backlog. Recent events are kept so a client
+reconnecting with Last-Event-ID is sent the ones it missed.
+"""
+
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Set
+from collections import deque
+import asyncio
+import logging
+import os
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud
+
+logger = logging.getLogger(__name__)
+
+class Event(NamedTuple):
+    id: Optional[int]  # None for resync, which isn't replayed
+    name: str
+    data: bytes  # JSON
+
+def _resync(reason: str) -> Event:
+    return Event(None, "resync", orjson.dumps({"reason": reason}))
+
+class Subscription:
+    """One client's queue of events; use as a context manager"""
+    def __init__(self, bus: "EventBus", queue_size: int):
+        self.bus = bus
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind to catch up event by event
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_resync("overflow"))
+            self.bus.overflows += 1
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """The next event, or None if there was none within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.bus.unsubscribe(self)
+
+class EventBus:
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        poll_interval: float = 0.5,
+        queue_size: int = 256,
+        replay_size: int = 1000,
+        max_batch: int = 100,
+        linger: float = 60
+    ):
+        """
+        Args:
+            session_factory: Creates the sessions the change feed reads with
+            poll_interval: Seconds between checks of the change counter
+            queue_size: Events buffered per subscriber before it's resynced
+            replay_size: Recent events kept for reconnecting clients
+            max_batch: Most changes the feed sends one by one; more at once
+                (an import, a re-scoring run) are announced as a resync
+            linger: Seconds the feed keeps running without subscribers
+        """
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.linger = linger
+        self._subscribers: Set[Subscription] = set()
+        self._recent: Deque[Event] = deque(maxlen=replay_size)
+        self._next_id = 1
+        self._feed: Optional[asyncio.Task] = None
+        self.published = 0
+        self.overflows = 0
+
+    @classmethod
+    def from_env(cls, session_factory: Callable[[], AsyncSession]) -> "EventBus":
+        return cls(
+            session_factory,
+            poll_interval=float(os.getenv("EVENTS_POLL_INTERVAL", "0.5")),
+            queue_size=int(os.getenv("EVENTS_QUEUE_SIZE", "256")),
+            replay_size=int(os.getenv("EVENTS_REPLAY_SIZE", "1000")),
+            max_batch=int(os.getenv("EVENTS_MAX_BATCH", "100")),
+            linger=float(os.getenv("EVENTS_LINGER", "60"))
+        )
+
+    def publish(self, name: str, data: Any) -> None:
+        """
+        Send an event to every subscriber, and keep it for replay. A no-op
+        once the feed has stopped, since nobody has listened for a while.
+        """
+        if not self._subscribers and (self._feed is None or self._feed.done()):
+            return
+        event = Event(self._next_id, name, orjson.dumps(data))
+        self._next_id += 1
+        self._recent.append(event)
+        self.published += 1
+        for subscriber in self._subscribers:
+            subscriber.put(event)
+
+    def model_finished(self, entry: Dict[str, Any], **context: Any) -> None:
+        """Publish one model's experiment entry, without its response text"""
+        self.publish("model_finished", {
+            "model": entry["model"],
+            "status": "error" if entry.get("error") else "ok",
+            "metrics": entry.get("metrics", {}),
+            **context
+        })
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Start receiving events. With `last_event_id`, events after it are
+        sent first if they're still kept; otherwise the client is resynced.
+        """
+        subscription = Subscription(self, self.queue_size)
+        idle = self._feed is None or self._feed.done()
+        if last_event_id is not None:
+            if last_event_id >= self._next_id:
+                # An ID from before this process started
+                subscription.put(_resync("restarted"))
+            elif idle:
+                # Nobody was listening, so changes since then weren't published
+                subscription.put(_resync("idle"))
+            elif self._recent and self._recent[0].id <= last_event_id + 1:
+                for event in self._recent:
+                    if event.id > last_event_id:
+                        subscription.put(event)
+            elif last_event_id < self._next_id - 1:
+                subscription.put(_resync("expired"))
+        self._subscribers.add(subscription)
+        if idle:
+            self._feed = asyncio.create_task(self._watch())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def _watch(self) -> None:
+        """The change feed: runs until nobody has been subscribed for `linger` seconds"""
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.session_factory() as db:
+                version = await crud.experiments_version(db)
+                watermark = await crud.change_watermark(db)
+            last_subscribed = loop.time()
+            while self._subscribers or loop.time() - last_subscribed < self.linger:
+                if self._subscribers:
+                    last_subscribed = loop.time()
+                await asyncio.sleep(self.poll_interval)
+                async with self.session_factory() as db:
+                    current = await crud.experiments_version(db)
+                    if current == version:
+                        continue
+                    version = current
+                    watermark = await self._publish_changes(db, watermark)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Experiment change feed stopped: {str(e)}", exc_info=True)
+            for subscriber in self._subscribers:
+                subscriber.put(_resync("error"))
+
+    async def _publish_changes(self, db: AsyncSession, watermark: crud.ChangeWatermark) -> crud.ChangeWatermark:
+        """Publish what changed since `watermark` and return the new one"""
+        # The watermark's own second is read again, so leave room for what was already seen there
+        page = await crud.list_experiments(db, limit=self.max_batch + len(watermark.seen_ids), since=watermark.updated_at)
+        changed = [item for item in page["items"] if not watermark.seen(item)]
+        if page["nextCursor"] is not None or len(changed) > self.max_batch:
+            self.publish("resync", {"reason": "burst"})
+            return await crud.change_watermark(db)
+
+        created = []
+        for item in changed:
+            if item["id"] > watermark.max_id:
+                created.append(item["id"])
+                self.publish("experiment_created", item)
+            else:
+                self.publish("experiment_updated", item)
+        if created:
+            self.publish("metrics", {"models": await crud.metric_totals(db, created)})
+        return watermark.advance(page["items"])
+
+    async def close(self) -> None:
+        if self._feed is not None:
+            self._feed.cancel()
+            try:
+                await self._feed
+            except asyncio.CancelledError:
+                pass
+        self._subscribers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "overflows": self.overflows,
+            "lastEventId": self._next_id - 1,
+            "feedRunning": self._feed is not None and not self._feed.done(),
+        }
+
+# Make the event bus available for import
+__all__ = ['Event', 'EventBus', 'Subscription']
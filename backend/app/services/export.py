@@ -0,0 +1,312 @@
+"""
+Experiment Export Module
+Streams the experiments table out as NDJSON, Parquet or Arrow, and loads
+such files back in, a chunk at a time so memory stays flat however large
+the history is.
+
+Columns keep the names used by the API: id, prompt, system_prompt, models,
+responses, created_at and updated_at (naive UTC). In the columnar formats
+`models` is a list of strings and `responses` is JSON text, since each
+response entry carries free-form metrics.
+
+pyarrow is only imported when a columnar format is used.
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+from datetime import datetime
+import asyncio
+import importlib.util
+import json
+import logging
+import orjson
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud
+from app.db.models import Experiment
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXPORT_COLUMNS = ("id", "prompt", "system_prompt", "models", "responses", "created_at", "updated_at")
+
+# JSON columns are read as their stored text: NDJSON splices it into each
+# line as is, and Parquet keeps `responses` as text. `responses` is the one
+# that gets parsed, to put back the response text stored in model_responses
+_SELECTABLE = {
+    "id": Experiment.id,
+    "prompt": Experiment.prompt,
+    "system_prompt": Experiment.system_prompt,
+    "models": type_coerce(Experiment.models, String),
+    "responses": type_coerce(Experiment.responses, String),
+    "created_at": Experiment.created_at,
+    "updated_at": Experiment.updated_at,
+}
+_RAW_JSON = ("models", "responses")
+
+class ExportError(ValueError):
+    """Raised for a bad export request or an import file that can't be loaded"""
+    pass
+
+# File extensions recognized when an import doesn't name its format
+FORMAT_SUFFIXES = {".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet", ".arrow": "arrow", ".arrows": "arrow"}
+
+def check_format(name: str) -> str:
+    """Validate a format name, and that pyarrow is installed if it needs it"""
+    if name not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format: {name}; choose from {list(EXPORT_FORMATS)}")
+    if name != "ndjson" and importlib.util.find_spec("pyarrow") is None:
+        raise ExportError(f"The {name} format needs pyarrow, which isn't installed")
+    return name
+
+def resolve_columns(columns: Optional[str]) -> List[str]:
+    """Validate a comma-separated column list; all columns when empty"""
+    if not columns:
+        return list(EXPORT_COLUMNS)
+    selected = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise ExportError(f"Unknown columns: {unknown}; choose from {list(EXPORT_COLUMNS)}")
+    return selected
+
+async def iter_rows(
+    session_factory: Callable[[], AsyncSession],
+    columns: Sequence[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = 1000
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield experiments in ID order, `chunk_size` rows at a time.
+    Each chunk is a keyset query in its own short session, so a slow client
+    never holds a read transaction open. Response text, stored compressed or
+    archived, is filled back into `responses`.
+    """
+    created_at_text = type_coerce(Experiment.created_at, String)
+    query = select(*(_SELECTABLE[name].label(name) for name in columns), Experiment.id.label("_id"))
+    if start:
+        query = query.where(created_at_text >= crud.to_db_timestamp(start))
+    if end:
+        query = query.where(created_at_text < crud.to_db_timestamp(end))
+
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(
+                query.where(Experiment.id > last_id).order_by(Experiment.id).limit(chunk_size)
+            )).mappings().all()
+            if rows and "responses" in columns:
+                texts = await crud.response_texts(db, [row["_id"] for row in rows])
+        if not rows:
+            return
+        last_id = rows[-1]["_id"]
+        chunk = [{name: row[name] for name in columns} for row in rows]
+        if "responses" in columns:
+            for row, record in zip(rows, chunk):
+                entries = crud.with_response_text(orjson.loads(row["responses"]), texts.get(row["_id"], []))
+                record["responses"] = orjson.dumps(entries).decode("utf-8")
+        yield chunk
+
+def _ndjson_line(row: Dict[str, Any]) -> str:
+    fields = []
+    for name, value in row.items():
+        if name in _RAW_JSON:
+            encoded = value if value is not None else "null"
+        elif isinstance(value, datetime):
+            encoded = json.dumps(value.isoformat())
+        else:
+            encoded = json.dumps(value)
+        fields.append(f"{json.dumps(name)}: {encoded}")
+    return "{" + ", ".join(fields) + "}\n"
+
+def _arrow_schema(columns: Sequence[str]):
+    import pyarrow as pa
+    types = {
+        "id": pa.int64(),
+        "prompt": pa.string(),
+        "system_prompt": pa.string(),
+        "models": pa.list_(pa.string()),
+        "responses": pa.string(),
+        "created_at": pa.timestamp("us"),
+        "updated_at": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[name]) for name in columns])
+
+def _record_batch(rows: List[Dict[str, Any]], schema):
+    import pyarrow as pa
+    data = {name: [row[name] for row in rows] for name in schema.names}
+    if "models" in data:
+        data["models"] = [json.loads(value) if value is not None else None for value in data["models"]]
+    return pa.RecordBatch.from_pydict(data, schema=schema)
+
+class _ChunkSink:
+    """Write-only file object that collects what pyarrow writes until it's taken"""
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+async def export_experiments(
+    session_factory: Callable[[], AsyncSession],
+    export_format: str,
+    columns: Sequence[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = 1000
+) -> AsyncIterator[bytes]:
+    """
+    Encode experiments in `export_format`, yielding bytes as each chunk is
+    ready. Parquet gets one row group per chunk and Arrow one record batch.
+    """
+    chunks = iter_rows(session_factory, columns, start, end, chunk_size)
+    if export_format == "ndjson":
+        async for rows in chunks:
+            yield "".join(_ndjson_line(row) for row in rows).encode("utf-8")
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch]))
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    try:
+        async for rows in chunks:
+            write(_record_batch(rows, schema))
+            yield sink.take()
+    finally:
+        # Closing writes the Parquet footer / Arrow end-of-stream marker
+        writer.close()
+    yield sink.take()
+
+def _to_record(row: Dict[str, Any], position: str) -> Dict[str, Any]:
+    """Turn one imported row into a crud.save_experiments record"""
+    prompt = row.get("prompt")
+    responses = row.get("responses")
+    if isinstance(responses, str):
+        try:
+            responses = json.loads(responses)
+        except json.JSONDecodeError as e:
+            raise ExportError(f"{position}: 'responses' is not valid JSON ({e.msg})")
+    if not isinstance(prompt, str) or not prompt:
+        raise ExportError(f"{position}: expected a non-empty 'prompt'")
+    if not isinstance(responses, list) or not all(isinstance(entry, dict) and "model" in entry for entry in responses):
+        raise ExportError(f"{position}: expected 'responses' to be a list of objects with a 'model'")
+
+    created_at = row.get("created_at")
+    if isinstance(created_at, str):
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            raise ExportError(f"{position}: invalid created_at {created_at!r}")
+    return {
+        "prompt": prompt,
+        "systemPrompt": row.get("system_prompt") or "",
+        "models": list(row.get("models") or [entry["model"] for entry in responses]),
+        "responses": responses,
+        "createdAt": crud.to_db_timestamp(created_at) if created_at else None,
+    }
+
+def _ndjson_batches(file, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        position = f"Line {line_number}"
+        try:
+            row = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ExportError(f"{position}: invalid JSON ({e})")
+        if not isinstance(row, dict):
+            raise ExportError(f"{position}: expected an object")
+        batch.append(_to_record(row, position))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _columnar_batches(file, import_format: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    try:
+        if import_format == "parquet":
+            source = pq.ParquetFile(file)
+            names = [name for name in source.schema_arrow.names if name in EXPORT_COLUMNS]
+            batches = source.iter_batches(batch_size=batch_size, columns=names)
+        else:
+            batches = pa.ipc.open_stream(file)
+        row_number = 0
+        for batch in batches:
+            records = []
+            for row in batch.to_pylist():
+                row_number += 1
+                records.append(_to_record(row, f"Row {row_number}"))
+            yield records
+    except pa.ArrowException as e:
+        raise ExportError(f"Invalid {import_format} file: {e}")
+
+def read_batches(file, import_format: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Parse an exported file into lists of crud.save_experiments records"""
+    if check_format(import_format) == "ndjson":
+        return _ndjson_batches(file, batch_size)
+    return _columnar_batches(file, import_format, batch_size)
+
+async def import_experiments(
+    session_factory: Callable[[], AsyncSession],
+    file,
+    import_format: str,
+    batch_size: int = 500
+) -> Dict[str, int]:
+    """
+    Insert every experiment in `file`, one transaction per batch.
+    Experiments get new IDs; their created_at, per-model rows and rollups
+    keep the original times. Parsing runs in a worker thread so large files
+    don't stall the event loop. On a bad row the import stops with an
+    ExportError; batches before it stay committed.
+    """
+    batches = read_batches(file, import_format, batch_size)
+    imported = 0
+    while True:
+        try:
+            records = await asyncio.to_thread(next, batches, None)
+        except ExportError as e:
+            raise ExportError(f"{e} ({imported} experiments were imported before it)")
+        if records is None:
+            break
+        async with session_factory() as db:
+            await crud.save_experiments(db, records)
+        imported += len(records)
+    logger.info(f"Imported {imported} experiments from {import_format}")
+    return {"imported": imported}
+
+# Make the export helpers available for import
+__all__ = ['EXPORT_FORMATS', 'EXPORT_COLUMNS', 'FORMAT_SUFFIXES', 'ExportError', 'check_format', 'resolve_columns', 'iter_rows',
+           'export_experiments', 'read_batches', 'import_experiments']
@@ -0,0 +1,101 @@
+"""
+Request Hedging Module
+Decides when a slow provider call gets a duplicate ("hedge"), as in The
+Tail at Scale: once a call has run longer than the model's recent p95
+latency, a second identical call is sent and whichever answers first wins.
+Hedges are capped at a fraction of calls so a slow provider isn't flooded
+with duplicates exactly when it is struggling.
+"""
+
+from typing import Any, Deque, Dict, Optional
+from collections import deque
+
+class LatencyWindow:
+    """The most recent successful call latencies of one model"""
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class HedgePolicy:
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        max_ratio: float = 0.1,
+        min_delay: float = 0.05
+    ):
+        """
+        Args:
+            quantile: Latency quantile a call must pass before it is hedged
+            min_samples: Calls a model needs before its quantile is trusted
+            window: Recent calls per model the quantile is computed over
+            max_ratio: Most hedges allowed, as a fraction of calls
+            min_delay: Shortest wait (seconds) before hedging, whatever the quantile
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _model_stats(self, model: str) -> Dict[str, int]:
+        return self.stats.setdefault(model, {"calls": 0, "hedged": 0, "hedgeWon": 0})
+
+    def observe(self, model: str, seconds: float) -> None:
+        """Record a successful call's latency"""
+        window = self._latencies.get(model)
+        if window is None:
+            window = self._latencies[model] = LatencyWindow(self.window)
+        window.observe(seconds)
+
+    def delay(self, model: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a new call to `model`, or None while
+        there are too few samples to know its tail. Counts the call.
+        """
+        self._model_stats(model)["calls"] += 1
+        window = self._latencies.get(model)
+        if window is None or len(window.samples) < self.min_samples:
+            return None
+        return max(self.min_delay, window.quantile(self.quantile))
+
+    def allow(self, model: str) -> bool:
+        """Take a hedge from the budget if it isn't spent; True if one may be sent"""
+        stats = self._model_stats(model)
+        if stats["hedged"] + 1 > self.max_ratio * stats["calls"]:
+            return False
+        stats["hedged"] += 1
+        return True
+
+    def won(self, model: str) -> None:
+        """Note that a hedge answered before the call it duplicated"""
+        self._model_stats(model)["hedgeWon"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current hedge delay and counters per model"""
+        snapshot = {}
+        for model in sorted(set(self.stats) | set(self._latencies)):
+            window = self._latencies.get(model)
+            samples = len(window.samples) if window else 0
+            threshold = window.quantile(self.quantile) if window else None
+            snapshot[model] = {
+                "samples": samples,
+                "hedgeAfterMs": round(max(self.min_delay, threshold) * 1000, 2)
+                if threshold is not None and samples >= self.min_samples else None,
+                **self._model_stats(model),
+            }
+        return snapshot
+
+# Make the hedging policy available for import
+__all__ = ['HedgePolicy', 'LatencyWindow']
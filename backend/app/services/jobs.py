@@ -0,0 +1,357 @@
+"""
+Evaluation Job Queue
+Runs experiments in the background instead of inside the HTTP request.
+Jobs live in the evaluation_jobs table. A worker claims one with a lease,
+checkpoints each model's entry as soon as it finishes and saves the
+experiment when all are done. If a worker dies, its job is claimed again
+once the lease runs out, and only models without a checkpoint are re-run.
+Workers can run inside the API process or on their own (see worker.py);
+they coordinate only through the database.
+"""
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud
+from app.db.models import EvaluationJob
+
+if TYPE_CHECKING:
+    from app.services.events import EventBus
+    from app.services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+class LeaseLostError(Exception):
+    """Raised when another worker has taken over the job being run"""
+    pass
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def job_to_dict(job: EvaluationJob) -> Dict[str, Any]:
+    """Status view of a job; results hold the entries finished so far, in model order"""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "prompt": job.prompt,
+        "models": job.models,
+        "completed": len(job.results),
+        "total": len(job.models),
+        "results": [job.results[model] for model in job.models if model in job.results],
+        "experiment_id": job.experiment_id,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[EvaluationJob]:
+    return await db.get(EvaluationJob, job_id)
+
+async def has_pending_jobs(db: AsyncSession) -> bool:
+    """Whether any job is waiting or was left running (e.g. by a restart)"""
+    query = select(EvaluationJob.id).where(EvaluationJob.status.in_(("queued", "running"))).limit(1)
+    return (await db.execute(query)).first() is not None
+
+class JobQueue:
+    def __init__(
+        self,
+        llm_service: "LLMService",
+        session_factory: Callable[[], AsyncSession],
+        workers: int,
+        poll_interval: float,
+        lease_seconds: float,
+        max_attempts: int,
+        events: Optional["EventBus"] = None
+    ):
+        """
+        Args:
+            llm_service: Service used for every model call
+            session_factory: Creates the sessions jobs are claimed and saved with
+            workers: Jobs run at once by this process (0: only submit jobs)
+            poll_interval: Seconds between checks for new jobs when idle
+            lease_seconds: How long a claim lasts without a heartbeat
+            max_attempts: Claims a job gets before it's marked failed
+            events: Where each finished model is announced, if anywhere
+        """
+        self.llm_service = llm_service
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.events = events
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._runs: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    @classmethod
+    def from_env(
+        cls,
+        llm_service: "LLMService",
+        session_factory: Callable[[], AsyncSession],
+        workers: Optional[int] = None,
+        events: Optional["EventBus"] = None
+    ) -> "JobQueue":
+        """Build a queue from the JOB_* environment variables"""
+        return cls(
+            llm_service,
+            session_factory,
+            workers=workers if workers is not None else int(os.getenv("JOB_WORKERS", "4")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            events=events,
+        )
+
+    def start(self) -> None:
+        """Start this process's workers (no-op if running or disabled)"""
+        if self._tasks or self.workers <= 0:
+            return
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers as {self.worker_id}")
+
+    async def stop(self) -> None:
+        """
+        Stop the workers and put their unfinished jobs straight back in the
+        queue, so another worker doesn't have to wait out the lease
+        """
+        if not self._tasks:
+            return
+        # Idle workers exit on their own; only jobs in progress are cancelled
+        self._stopping = True
+        self._wakeup.set()
+        for run in self._runs:
+            run.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        async with self.session_factory() as db:
+            await db.execute(
+                update(EvaluationJob)
+                .where(EvaluationJob.worker_id == self.worker_id, EvaluationJob.status == "running")
+                .values(status="queued", worker_id=None, lease_expires_at=None)
+            )
+            await db.commit()
+
+    async def submit(
+        self,
+        prompt: str,
+        system_prompt: str,
+        models: List[str],
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        deadline_ms: Optional[float] = None
+    ) -> EvaluationJob:
+        """
+        Queue an experiment and return its job right away. `deadline_ms`
+        bounds each attempt at the job (default EXPERIMENT_DEADLINE_MS).
+        """
+        # Results are checkpointed per model, so each model runs once
+        models = list(dict.fromkeys(models))
+        job = EvaluationJob(
+            id=uuid.uuid4().hex,
+            status="queued",
+            prompt=prompt,
+            system_prompt=system_prompt,
+            models=models,
+            options={"useCache": use_cache, "refreshCache": refresh_cache, "deadlineMs": deadline_ms},
+            results={},
+            attempts=0
+        )
+        async with self.session_factory() as db:
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+        self.start()
+        self._wakeup.set()
+        return job
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Error claiming a job: {str(e)}")
+                job = None
+            if job is None:
+                if not self._stopping:
+                    self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if self._stopping:
+                # stop() puts the job back in the queue
+                return
+            run = asyncio.create_task(self._run(job))
+            self._runs.add(run)
+            try:
+                await run
+            except asyncio.CancelledError:
+                if self._stopping:
+                    return
+                raise
+            except LeaseLostError:
+                logger.warning(f"Lost the lease on job {job.id}; another worker took it over")
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+                await self._finish(job.id, status="failed", error=str(e))
+            finally:
+                self._runs.discard(run)
+
+    async def _claim(self) -> Optional[EvaluationJob]:
+        """
+        Atomically take the oldest queued job, or a running one whose lease
+        has expired. SQLite runs the whole UPDATE under its write lock, so
+        two workers (or processes) can never claim the same job.
+        """
+        now = _now()
+        claimable = (
+            select(EvaluationJob.id)
+            .where(or_(
+                EvaluationJob.status == "queued",
+                and_(EvaluationJob.status == "running", EvaluationJob.lease_expires_at < now)
+            ))
+            .order_by(EvaluationJob.created_at, EvaluationJob.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        async with self.session_factory() as db:
+            job = (await db.execute(
+                update(EvaluationJob)
+                .where(EvaluationJob.id == claimable)
+                .values(
+                    status="running",
+                    worker_id=self.worker_id,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    attempts=EvaluationJob.attempts + 1,
+                    started_at=func.coalesce(EvaluationJob.started_at, now)
+                )
+                .returning(EvaluationJob)
+                .execution_options(synchronize_session=False)
+            )).scalar_one_or_none()
+            await db.commit()
+
+        if job is not None and job.attempts > self.max_attempts:
+            await self._finish(job.id, status="failed", error=f"Gave up after {self.max_attempts} attempts")
+            return None
+        return job
+
+    async def _run(self, job: EvaluationJob) -> None:
+        """Call the models still missing a result, checkpointing each, then save the experiment"""
+        results = dict(job.results)
+        pending = [model for model in job.models if model not in results]
+        if results:
+            logger.info(f"Resuming job {job.id}: {len(results)}/{len(job.models)} models already done")
+
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, asyncio.current_task(), lost))
+        # Models that miss the deadline are checkpointed as timed out
+        deadline = self.llm_service.deadline_after(job.options.get("deadlineMs"))
+        calls = [
+            asyncio.create_task(self.llm_service.evaluate_model(
+                job.prompt,
+                job.system_prompt,
+                model,
+                job.options.get("useCache", True),
+                job.options.get("refreshCache", False),
+                deadline
+            ))
+            for model in pending
+        ]
+        try:
+            for call in asyncio.as_completed(calls):
+                entry = await call
+                results[entry["model"]] = entry
+                await self._update(job.id, results=results)
+                if self.events is not None:
+                    self.events.model_finished(entry, jobId=job.id, prompt=job.prompt)
+            await self._complete(job, results)
+        except asyncio.CancelledError:
+            if lost.is_set():
+                raise LeaseLostError()
+            raise
+        finally:
+            heartbeat.cancel()
+            for call in calls:
+                call.cancel()
+
+    async def _heartbeat(self, job_id: str, runner: asyncio.Task, lost: asyncio.Event) -> None:
+        """Renew the lease while the job runs; cancel the run if the lease was lost"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._update(job_id)
+            except LeaseLostError:
+                lost.set()
+                runner.cancel()
+                return
+
+    async def _update(self, job_id: str, **values: Any) -> None:
+        """Write to a job this worker holds, renewing its lease"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(EvaluationJob)
+                .where(
+                    EvaluationJob.id == job_id,
+                    EvaluationJob.worker_id == self.worker_id,
+                    EvaluationJob.status == "running"
+                )
+                .values(lease_expires_at=_now() + timedelta(seconds=self.lease_seconds), **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            raise LeaseLostError()
+
+    async def _complete(self, job: EvaluationJob, results: Dict[str, Any]) -> None:
+        """Save the experiment and mark the job completed in one transaction"""
+        async with self.session_factory() as db:
+            experiment, = await crud.add_experiments(db, [{
+                "prompt": job.prompt,
+                "systemPrompt": job.system_prompt,
+                "models": job.models,
+                "responses": [results[model] for model in job.models]
+            }])
+            result = await db.execute(
+                update(EvaluationJob)
+                .where(EvaluationJob.id == job.id, EvaluationJob.worker_id == self.worker_id)
+                .values(
+                    status="completed",
+                    results=results,
+                    experiment_id=experiment.id,
+                    worker_id=None,
+                    lease_expires_at=None,
+                    finished_at=_now()
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                await db.rollback()
+                raise LeaseLostError()
+            await db.commit()
+        logger.info(f"Job {job.id} completed as experiment {experiment.id}")
+
+    async def _finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(EvaluationJob)
+                .where(EvaluationJob.id == job_id)
+                .values(status=status, error=error, worker_id=None, lease_expires_at=None, finished_at=_now())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+# Make the job queue available for import
+__all__ = ['JobQueue', 'LeaseLostError', 'job_to_dict', 'get_job', 'has_pending_jobs']
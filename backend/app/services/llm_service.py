@@ -3,26 +3,58 @@ LLM Service Module
 Handles interactions with different language models
 """
 
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from functools import partial
 import os
 import time
 import logging
 import aiohttp
 import asyncio
-from dotenv import load_dotenv
-from app.core.exceptions import ModelNotFoundError, EvaluationError
+import json
+from app.core.exceptions import DeadlineExceededError, ModelNotFoundError, EvaluationError, RateLimitedError
+from app.services.cache import ResponseCache
+from app.services.hedging import HedgePolicy
+from app.services.micro_batch import MicroBatcher, parse_batch_settings
+from app.services.rate_limit import RateLimiter, parse_retry_after
+from app.services.simulator import SimulatedProvider
+from app.services.scoring import get_scorer
+from app.services.telemetry import BATCH_SIZE, HEDGES, RETRIES, CallTrace, trace_config
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Providers reached over HTTP, each with its own connection pool, and the
+# environment variable holding each one's API key
+HTTP_PROVIDERS = ("groq", "huggingface")
+API_KEY_VARS = {
+    "groq": "GROQ_API_KEY",
+    "huggingface": "HUGGING_FACE_API_KEY",
+}
+
+# Provider responses that mean "not now" rather than "never": retried with backoff
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+class _InflightCall:
+    """One upstream call shared by every concurrent identical request"""
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.store = False  # some waiter wants the result cached
+
 class LLMService:
     def __init__(self):
-        """Initialize API clients"""
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
-        self.hf_api_key = os.getenv("HUGGING_FACE_API_KEY")
+        """
+        Initialize API clients. A missing API key only disables its provider:
+        calls to that provider's models fail with an EvaluationError.
+        """
+        self.groq_api_key = os.getenv(API_KEY_VARS["groq"])
+        self.hf_api_key = os.getenv(API_KEY_VARS["huggingface"])
+        self.api_keys = {"groq": self.groq_api_key, "huggingface": self.hf_api_key}
         
-        if not self.groq_api_key or not self.hf_api_key:
-            raise ValueError("Missing API keys. Both GROQ_API_KEY and HUGGING_FACE_API_KEY are required.")
+        missing = [API_KEY_VARS[provider] for provider, key in self.api_keys.items() if not key]
+        if missing:
+            logger.warning(f"Missing API keys: {', '.join(missing)}; those providers are disabled")
             
         self.groq_url = "https://api.groq.com/openai/v1/chat/completions"
         self.hf_url = "https://api-inference.huggingface.co/models/"
@@ -37,31 +69,845 @@ class LLMService:
                 "model": "gpt2"
             },
         }
+        
+        # Sampling parameters sent with every request, per provider
+        self.sampling_params = {
+            "groq": {
+                "temperature": 0.7
+            },
+            "huggingface": {
+                "max_new_tokens": 100,
+                "temperature": 0.7,
+                "return_full_text": False
+            },
+        }
+
+        # Cap on simultaneous in-flight calls per provider, so a wide experiment
+        # can't flood one API while the other models wait their turn
+        self.provider_limits = {
+            "groq": int(os.getenv("GROQ_MAX_CONCURRENCY", "4")),
+            "huggingface": int(os.getenv("HUGGING_FACE_MAX_CONCURRENCY", "2")),
+        }
+        self._semaphores = {
+            provider: asyncio.Semaphore(limit)
+            for provider, limit in self.provider_limits.items()
+        }
+        
+        # Client-side rate limits per provider. 0 (the default) leaves a limit
+        # to the provider's x-ratelimit-* headers, which size the buckets once
+        # a response arrives. Calls wait for room in the buckets, and
+        # throttled calls are retried with backoff
+        backoff_base = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "0.5"))
+        backoff_max = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "30"))
+        self.rate_limiters = {
+            "groq": RateLimiter(
+                requests_per_minute=float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "0")),
+                tokens_per_minute=float(os.getenv("GROQ_TOKENS_PER_MINUTE", "0")),
+                backoff_base=backoff_base,
+                backoff_max=backoff_max
+            ),
+            "huggingface": RateLimiter(
+                requests_per_minute=float(os.getenv("HUGGING_FACE_REQUESTS_PER_MINUTE", "0")),
+                tokens_per_minute=float(os.getenv("HUGGING_FACE_TOKENS_PER_MINUTE", "0")),
+                backoff_base=backoff_base,
+                backoff_max=backoff_max
+            ),
+        }
+        
+        # Built-in simulated provider for load tests and benchmarks; it answers
+        # in-process, so it costs no API quota
+        self.simulator: Optional[SimulatedProvider] = None
+        if os.getenv("SIMULATED_PROVIDER_ENABLED", "false").lower() == "true":
+            self.simulator = SimulatedProvider.from_env()
+            self.models["simulated"] = {
+                "provider": "simulated",
+                "model": "simulated-v1"
+            }
+            self.sampling_params["simulated"] = {
+                "max_new_tokens": self.simulator.response_words
+            }
+            self.provider_limits["simulated"] = int(os.getenv("SIMULATED_MAX_CONCURRENCY", "64"))
+            self._semaphores["simulated"] = asyncio.Semaphore(self.provider_limits["simulated"])
+            self.rate_limiters["simulated"] = RateLimiter(
+                requests_per_minute=float(os.getenv("SIMULATED_REQUESTS_PER_MINUTE", "0")),
+                tokens_per_minute=float(os.getenv("SIMULATED_TOKENS_PER_MINUTE", "0")),
+                backoff_base=backoff_base,
+                backoff_max=backoff_max
+            )
+        
+        # Micro-batching for Hugging Face models: concurrent calls with the same
+        # parameters go out as one request with a list of inputs, taking one
+        # provider slot and one request from the rate limit. MODEL_BATCH_SETTINGS
+        # overrides the window and size per model; a size of 1 disables it
+        batch_window_ms = float(os.getenv("HUGGING_FACE_BATCH_WINDOW_MS", "10"))
+        max_batch_size = int(os.getenv("HUGGING_FACE_MAX_BATCH_SIZE", "8"))
+        batch_settings = parse_batch_settings(os.getenv("MODEL_BATCH_SETTINGS", ""))
+        self._batchers: Dict[str, MicroBatcher] = {}
+        for name, config in self.models.items():
+            if config["provider"] != "huggingface":
+                continue
+            window_ms, size = batch_settings.get(name, (batch_window_ms, max_batch_size))
+            if size > 1:
+                self._batchers[name] = MicroBatcher(partial(self._send_batch, name), window_ms / 1000, size)
+        
+        # Per-attempt HTTP timeout, and the default time an experiment gives
+        # its models before unfinished calls are cancelled (0: no deadline)
+        self.request_timeout = float(os.getenv("PROVIDER_REQUEST_TIMEOUT", "30"))
+        self.experiment_deadline_ms = float(os.getenv("EXPERIMENT_DEADLINE_MS", "0"))
+        
+        # Hedged requests: a call still running past its model's recent p95
+        # latency gets a duplicate, and the first answer wins. Micro-batched
+        # models aren't hedged; their calls already share requests
+        self.hedging: Optional[HedgePolicy] = None
+        if os.getenv("HEDGE_REQUESTS_ENABLED", "false").lower() == "true":
+            self.hedging = HedgePolicy(
+                quantile=float(os.getenv("HEDGE_QUANTILE", "0.95")),
+                min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+                window=int(os.getenv("HEDGE_WINDOW", "200")),
+                max_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.1")),
+                min_delay=float(os.getenv("HEDGE_MIN_DELAY_MS", "50")) / 1000
+            )
+        
+        self.max_retries = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+        # Completion size assumed for token budgeting when a provider has no max_new_tokens
+        self.completion_token_estimate = int(os.getenv("COMPLETION_TOKEN_ESTIMATE", "256"))
+        
+        # Connection pool settings; every provider gets its own long-lived
+        # session so TCP/TLS connections and DNS lookups are reused
+        self.pool_size = int(os.getenv("HTTP_POOL_SIZE", "100"))
+        self.pool_size_per_host = int(os.getenv("HTTP_POOL_SIZE_PER_HOST", "20"))
+        self.keepalive_timeout = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+        self.dns_cache_ttl = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        # Streams can legitimately run long, so only bound connecting and gaps
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+        
+        # Scorer used for new responses (SCORER_VERSION picks a registered one)
+        self.scorer = get_scorer()
+        
+        # Concurrent identical calls share one upstream request, keyed like the cache
+        self.coalesce_requests = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+        self._inflight: Dict[str, _InflightCall] = {}
+        
+        # Response cache: in-memory LRU backed by a SQLite file on disk
+        self.cache: Optional[ResponseCache] = None
+        if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true":
+            self.cache = ResponseCache(
+                max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+                disk_path=os.getenv("RESPONSE_CACHE_PATH", os.path.join(BASE_DIR, "response_cache.db")) or None,
+                disk_ttl=float(os.getenv("RESPONSE_CACHE_DISK_TTL", "604800")),
+            )
+
+    async def start(self) -> None:
+        """Open the per-provider connection pools (called from the app lifespan)"""
+        for provider in HTTP_PROVIDERS:
+            self._get_session(provider)
+        logger.info(f"Opened HTTP pools for: {', '.join(self._sessions)}")
+
+    async def close(self) -> None:
+        """Close all connection pools (called from the app lifespan)"""
+        for batcher in self._batchers.values():
+            await batcher.close()
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _get_session(self, provider: str) -> aiohttp.ClientSession:
+        """Return the provider's pooled session, creating it on first use"""
+        session = self._sessions.get(provider)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+            )
+            session = aiohttp.ClientSession(connector=connector, trace_configs=[trace_config()])
+            self._sessions[provider] = session
+        return session
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Connection pool usage per provider, for capacity planning"""
+        stats = {}
+        for provider, session in self._sessions.items():
+            connector = session.connector
+            if connector is None or connector.closed:
+                continue
+            # aiohttp has no public API for these counts, so read the
+            # connector's bookkeeping directly
+            idle = sum(len(conns) for conns in connector._conns.values())
+            in_use = len(connector._acquired)
+            stats[provider] = {
+                "open": idle + in_use,
+                "idle": idle,
+                "inUse": in_use,
+                "waiting": sum(len(waiters) for waiters in connector._waiters.values()),
+                "limit": connector.limit,
+                "limitPerHost": connector.limit_per_host,
+            }
+        return stats
+
+    def rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Rate limits, current adaptive rate and throttling counters per provider"""
+        return {provider: limiter.snapshot() for provider, limiter in self.rate_limiters.items()}
+
+    def batch_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Micro-batching settings and batch size counters per model"""
+        return {model: batcher.snapshot() for model, batcher in self._batchers.items()}
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        """Hedging thresholds and counters per model"""
+        if self.hedging is None:
+            return {"enabled": False}
+        return {"enabled": True, "quantile": self.hedging.quantile, "models": self.hedging.snapshot()}
+
+    def deadline_after(self, deadline_ms: Optional[float] = None) -> Optional[float]:
+        """
+        Absolute deadline (time.monotonic) `deadline_ms` from now, defaulting
+        to EXPERIMENT_DEADLINE_MS; None when there is no deadline
+        """
+        if deadline_ms is None:
+            deadline_ms = self.experiment_deadline_ms
+        return time.monotonic() + deadline_ms / 1000 if deadline_ms and deadline_ms > 0 else None
+
+    async def get_response(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        deadline: Optional[float] = None
+    ) -> str:
+        """
+        Get response from specified model
+        
+        Args:
+            use_cache: Serve and store the response through the response cache
+            refresh_cache: Skip the cache lookup but store the fresh response
+            deadline: time.monotonic() by which the model must answer (see
+                deadline_after); past it the call is cancelled and a
+                DeadlineExceededError raised
+        """
+        response, _ = await self._fetch(prompt, system_prompt, model, use_cache, refresh_cache, deadline)
+        return response
 
-    async def get_response(self, prompt: str, system_prompt: str, model: str) -> str:
-        """Get response from specified model"""
+    async def _fetch(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        use_cache: bool,
+        refresh_cache: bool,
+        deadline: Optional[float] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Get a response plus call info: its response time (ms), cache outcome,
+        whether the upstream call was shared with a concurrent identical
+        request, and the CallTrace with its phase timings and token usage
+        """
         if model not in self.models:
             raise ModelNotFoundError(model)
             
         model_config = self.models[model]
         provider = model_config["provider"]
-        actual_model = model_config["model"]
+        trace = CallTrace(provider, model)
+        
+        key = ResponseCache.make_key(
+            provider,
+            model_config["model"],
+            system_prompt,
+            prompt,
+            self.sampling_params[provider]
+        )
+        cache_key = None
+        cache_info = {"status": "bypass", "tier": None, "evictions": 0}
+        if use_cache and self.cache is not None:
+            cache_key = key
+            if refresh_cache:
+                cache_info["status"] = "refresh"
+            else:
+                start_time = time.perf_counter()
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    response, tier = cached
+                    cache_info.update(status="hit", tier=tier)
+                    elapsed = time.perf_counter() - start_time
+                    trace.finish("cache_hit", elapsed)
+                    return response, {
+                        "responseTime": elapsed * 1000,
+                        "cache": cache_info,
+                        "shared": False,
+                        "trace": trace
+                    }
+                cache_info["status"] = "miss"
         
-        start_time = time.time()
+        call = self._inflight.get(key) if self.coalesce_requests else None
+        shared = call is not None
+        if call is None:
+            call = _InflightCall()
+            call.task = asyncio.create_task(self._call_upstream(call, key, prompt, system_prompt, model, trace))
+            if self.coalesce_requests:
+                self._inflight[key] = call
+                call.task.add_done_callback(lambda _: self._forget_call(key, call))
+        call.store = call.store or cache_key is not None
         
+        # The call runs in its own task and is shielded, so a caller that goes
+        # away (or runs out of time) doesn't cancel it for the others; it is
+        # only cancelled once every caller waiting on it has gone
+        call.waiters += 1
+        wait_start = time.perf_counter()
+        remaining = deadline - time.monotonic() if deadline is not None else None
         try:
-            if provider == "groq":
-                response = await self._query_groq(prompt, system_prompt, actual_model)
-            else:  # huggingface
-                response = await self._query_huggingface(prompt, system_prompt, actual_model)
-                
-            return response
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError()
+            response, elapsed, evictions, owner = await asyncio.wait_for(asyncio.shield(call.task), remaining)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            call.waiters -= 1
+            if call.waiters == 0:
+                self._forget_call(key, call)
+                call.task.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceededError(model, time.perf_counter() - wait_start)
+            raise
+        
+        if shared:
+            # Phases come from the call that did the work; its token usage
+            # is only counted there
+            trace.phases = dict(owner.phases)
+            trace.retries = owner.retries
+            trace.hedged = owner.hedged
+            trace.finish("shared", time.perf_counter() - wait_start)
+        else:
+            cache_info["evictions"] = evictions
+        
+        return response, {"responseTime": elapsed * 1000, "cache": cache_info, "shared": shared, "trace": trace}
+
+    def _forget_call(self, key: str, call: _InflightCall) -> None:
+        """Stop routing new requests to `call`"""
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    async def _call_upstream(
+        self,
+        call: _InflightCall,
+        key: str,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        trace: CallTrace
+    ) -> Tuple[str, float, int, CallTrace]:
+        """
+        Make the upstream call behind `call` under the provider slot and cache
+        the result if any waiter asked for it. Returns the response, its time
+        in seconds, cache evictions and the trace of the call.
+        """
+        if model in self._batchers:
+            response, elapsed = await self._join_batch(prompt, system_prompt, model, trace)
+        else:
+            hedge_after = self.hedging.delay(model) if self.hedging is not None else None
+            if hedge_after is None:
+                response, elapsed = await self._attempt(prompt, system_prompt, model, trace)
+            else:
+                response, elapsed = await self._hedged(prompt, system_prompt, model, trace, hedge_after)
+            if self.hedging is not None:
+                self.hedging.observe(model, elapsed)
+        trace.finish("ok", elapsed)
+        
+        evictions = 0
+        if call.store and self.cache is not None:
+            evictions = await self.cache.set(key, response)
+        return response, elapsed, evictions, trace
+
+    async def _attempt(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        trace: CallTrace,
+        sending: Optional[asyncio.Event] = None
+    ) -> Tuple[str, float]:
+        """
+        Make one call (see _with_retries for `sending`). Returns the response
+        and its time in seconds; a failed or cancelled call is finished on
+        its trace.
+        """
+        try:
+            response = await self._dispatch(prompt, system_prompt, model, trace, sending)
+        except asyncio.CancelledError:
+            trace.finish("cancelled", trace.since("attempt") or 0.0)
+            raise
+        except Exception:
+            trace.finish("error", trace.since("attempt") or 0.0)
+            raise
+        # Only the final attempt is timed, so waiting for a slot, for the
+        # rate limiter or between retries isn't counted as model latency
+        return response, trace.since("attempt")
+
+    async def _hedged(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        trace: CallTrace,
+        hedge_after: float
+    ) -> Tuple[str, float]:
+        """
+        Make the call, and if an attempt has been sending for `hedge_after`
+        seconds without an answer, send a duplicate. Time spent waiting for
+        the provider slot, the rate limiter or a retry doesn't count, so a
+        busy provider isn't sent more requests. The first success wins and
+        the other call is cancelled; an error only counts once both have
+        failed. Each call has its own trace: the loser's is finished as
+        cancelled, and the winner's phases and usage are merged into `trace`.
+        """
+        provider = self.models[model]["provider"]
+        primary_trace = CallTrace(provider, model)
+        sending = asyncio.Event()
+        primary = asyncio.create_task(self._attempt(prompt, system_prompt, model, primary_trace, sending))
+        hedge = None
+        hedge_trace = None
+        try:
+            if not await self._wait_to_hedge(primary, primary_trace, sending, hedge_after) or not self.hedging.allow(model):
+                winner = primary
+            else:
+                HEDGES.labels(provider, model, "sent").inc()
+                hedge_trace = CallTrace(provider, model)
+                hedge = asyncio.create_task(self._attempt(prompt, system_prompt, model, hedge_trace))
+                pending = {primary, hedge}
+                winner = None
+                while winner is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((task for task in done if task.exception() is None), None)
+                    if winner is None and not pending:
+                        # Both failed; report the original call's error
+                        winner = primary
+            
+            response, elapsed = await winner
+            winner_trace = primary_trace
+            if hedge is not None:
+                trace.hedged = "hedge" if winner is hedge else "primary"
+            if winner is hedge:
+                self.hedging.won(model)
+                HEDGES.labels(provider, model, "won").inc()
+                winner_trace = hedge_trace
+            trace.phases = dict(winner_trace.phases)
+            trace.usage = winner_trace.usage
+            trace.retries = winner_trace.retries
+            return response, elapsed
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _wait_to_hedge(
+        self,
+        primary: asyncio.Task,
+        trace: CallTrace,
+        sending: asyncio.Event,
+        hedge_after: float
+    ) -> bool:
+        """
+        Wait until `primary` finishes (False) or one of its attempts has
+        been sending for `hedge_after` seconds (True). A retry starts the
+        clock again.
+        """
+        while not primary.done():
+            if not sending.is_set():
+                started = asyncio.create_task(sending.wait())
+                try:
+                    await asyncio.wait({primary, started}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    started.cancel()
+                continue
+            remaining = hedge_after - trace.since("attempt")
+            if remaining <= 0:
+                return True
+            await asyncio.wait({primary}, timeout=remaining)
+        return False
+
+    async def _dispatch(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        trace: CallTrace,
+        sending: Optional[asyncio.Event] = None
+    ) -> str:
+        """
+        Send the prompt to the model's provider under its slot. Waits for
+        the provider's rate limiter and retries throttled calls.
+        """
+        model_config = self.models[model]
+        provider = model_config["provider"]
+        actual_model = model_config["model"]
+        if provider == "groq":
+            query = self._query_groq
+        elif provider == "simulated":
+            query = self._query_simulated
+        else:  # huggingface
+            query = self._query_huggingface
+        return await self._with_retries(
+            model,
+            trace,
+            self._estimate_tokens(provider, prompt, system_prompt),
+            lambda: query(prompt, system_prompt, actual_model, trace),
+            sending
+        )
+
+    async def _join_batch(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> Tuple[str, float]:
+        """
+        Make the call as part of the model's next micro-batch. The caller's
+        trace gets the batch's phases plus its own wait for the batch to go
+        out, and its own token usage. Returns the response and its time in
+        seconds.
+        """
+        provider = self.models[model]["provider"]
+        params_key = json.dumps(self.sampling_params[provider], sort_keys=True)
+        trace.mark("batch")
+        try:
+            response, generated_tokens, elapsed, batch_trace = await self._batchers[model].submit(
+                params_key, (prompt, system_prompt)
+            )
+        except asyncio.CancelledError:
+            trace.finish("cancelled", trace.since("batch"))
+            raise
+        except Exception:
+            trace.finish("error", trace.since("batch"))
+            raise
+        trace.add("batch_wait", batch_trace.marks["batch_sent"] - trace.marks["batch"])
+        trace.phases.update(batch_trace.phases)
+        trace.retries = batch_trace.retries
+        trace.set_usage(None, generated_tokens)
+        return response, elapsed
+
+    async def _send_batch(
+        self,
+        model: str,
+        params_key: str,
+        items: List[Tuple[str, str]]
+    ) -> List[Tuple[str, Optional[int], float, CallTrace]]:
+        """
+        Send a micro-batch of (prompt, system prompt) items as one request,
+        under one provider slot and one rate limiter reservation. Returns
+        (response, generated tokens, seconds, batch trace) for each item.
+        """
+        model_config = self.models[model]
+        provider = model_config["provider"]
+        trace = CallTrace(provider, model)
+        BATCH_SIZE.labels(provider, model).observe(len(items))
+        trace.mark("batch_sent")
+        results = await self._with_retries(
+            model,
+            trace,
+            sum(self._estimate_tokens(provider, prompt, system_prompt) for prompt, system_prompt in items),
+            lambda: self._query_huggingface_batch(items, model_config["model"], trace)
+        )
+        elapsed = trace.since("attempt")
+        return [(text, generated_tokens, elapsed, trace) for text, generated_tokens in results]
+
+    async def _with_retries(
+        self,
+        model: str,
+        trace: CallTrace,
+        estimated_tokens: int,
+        send: Callable[[], Awaitable[Any]],
+        sending: Optional[asyncio.Event] = None
+    ) -> Any:
+        """
+        Make one provider call through `send` under the provider slot,
+        waiting for the provider's rate limiter first and retrying throttled
+        attempts with backoff. The slot is only held while a request is out,
+        not while waiting for the rate limiter or backing off, so a
+        throttled call doesn't keep other calls to the provider waiting.
+        `sending`, if given, is set while an attempt is out.
+        """
+        provider = self.models[model]["provider"]
+        self._check_api_key(provider, model)
+        limiter = self.rate_limiters[provider]
+        
+        attempt = 0
+        while True:
+            trace.add("rate_limit_wait", await limiter.acquire(estimated_tokens))
+            trace.mark("slot")
+            async with self._semaphores[provider]:
+                trace.add("slot_wait", trace.since("slot"))
+                trace.mark("attempt")
+                if sending is not None:
+                    sending.set()
+                try:
+                    response = await send()
+                    throttled = None
+                except RateLimitedError as e:
+                    throttled = e
+                except Exception as e:
+                    logger.error(f"Error getting response from {model}: {str(e)}")
+                    raise EvaluationError(model, str(e))
+                finally:
+                    if sending is not None:
+                        sending.clear()
             
+            if throttled is None:
+                limiter.succeeded(estimated_tokens, trace.usage["totalTokens"] if trace.usage else None)
+                return response
+            if attempt >= self.max_retries:
+                limiter.throttled(attempt, throttled.retry_after)
+                logger.error(f"Giving up on {model} after {attempt + 1} throttled attempts: {throttled.detail}")
+                raise EvaluationError(model, throttled.detail)
+            await self._back_off(limiter, trace, attempt, throttled)
+            attempt += 1
+
+    def _check_api_key(self, provider: str, model: str) -> None:
+        """Fail calls to a provider whose API key isn't configured"""
+        if provider in API_KEY_VARS and not self.api_keys[provider]:
+            raise EvaluationError(model, f"{API_KEY_VARS[provider]} is not set")
+
+    def _estimate_tokens(self, provider: str, prompt: str, system_prompt: str) -> int:
+        """Tokens a call will use, for the token bucket: ~4 characters per prompt token plus the completion budget"""
+        completion = self.sampling_params[provider].get("max_new_tokens", self.completion_token_estimate)
+        return (len(prompt) + len(system_prompt)) // 4 + completion
+
+    async def _back_off(self, limiter: RateLimiter, trace: CallTrace, attempt: int, error: RateLimitedError) -> None:
+        """Sleep before retrying a throttled call; the limiter pauses the whole provider meanwhile"""
+        delay = limiter.throttled(attempt, error.retry_after)
+        limiter.stats["retries"] += 1
+        trace.retries += 1
+        RETRIES.labels(trace.provider, trace.model).inc()
+        logger.warning(f"{error.detail}; retry {attempt + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        trace.add("retry_wait", delay)
+
+    async def evaluate_model(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Query one model and build its experiment entry.
+        Failures are recorded in the entry instead of raised, so one model
+        can never cancel the others in a fan-out. A model that misses the
+        deadline gets an error entry marked timedOut.
+        """
+        try:
+            response, call_info = await self._fetch(prompt, system_prompt, model, use_cache, refresh_cache, deadline)
+            trace = call_info["trace"]
+            
+            with trace.phase("scoring"):
+                accuracy, relevancy = self._evaluate_response(response)
+            metrics = {
+                "accuracy": accuracy,
+                "relevancy": relevancy,
+                "responseTime": round(call_info["responseTime"], 2),  # Round to 2 decimal places
+                "scorerVersion": self.scorer.version,
+                "cache": call_info["cache"],
+                "shared": call_info["shared"],
+                "phases": trace.to_dict()
+            }
+            if trace.usage:
+                metrics["usage"] = trace.usage
+            if trace.retries:
+                metrics["retries"] = trace.retries
+            if trace.hedged:
+                metrics["hedged"] = trace.hedged
+            return {"model": model, "response": response, "metrics": metrics}
+            
+        except DeadlineExceededError as e:
+            logger.warning(str(e.detail))
+            return {**self._error_entry(model, e), "timedOut": True}
         except Exception as e:
             logger.error(f"Error getting response from {model}: {str(e)}")
-            raise EvaluationError(model, str(e))
+            return self._error_entry(model, e)
+
+    def _error_entry(self, model: str, error: Exception) -> Dict[str, Any]:
+        """Experiment entry recorded for a model call that failed"""
+        return {
+            "model": model,
+            "response": f"Error: {str(error)}",
+            "error": True,
+            "metrics": {
+                "accuracy": 0,
+                "relevancy": 0,
+                "responseTime": 0  # Zero response time for failed requests
+            }
+        }
+
+    async def run_experiment(
+        self,
+        prompt: str,
+        system_prompt: str,
+        models: List[str],
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        deadline_ms: Optional[float] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Query all models concurrently; results keep the order of `models`.
+        Every model shares one deadline, `deadline_ms` from now (default
+        EXPERIMENT_DEADLINE_MS); models still running then are cancelled
+        and recorded as timed out, and the rest are returned as usual.
+        `on_result` is called with each model's entry as soon as it's ready.
+        """
+        deadline = self.deadline_after(deadline_ms)
+
+        async def evaluate(model: str) -> Dict[str, Any]:
+            entry = await self.evaluate_model(prompt, system_prompt, model, use_cache, refresh_cache, deadline)
+            if on_result is not None:
+                on_result(entry)
+            return entry
+
+        return list(await asyncio.gather(*(evaluate(model) for model in models)))
+
+    async def stream_model(self, prompt: str, system_prompt: str, model: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream one model's output, yielding ("token", {...}) for each chunk of
+        text and finally ("model_done", entry) with the full experiment entry.
+        Failures end the stream with an error entry instead of raising.
+        
+        Besides the usual metrics the entry records, in milliseconds/seconds:
+            timeToFirstToken: from starting the final attempt to the first chunk
+            interTokenLatency: mean gap between consecutive chunks
+            tokensPerSecond: chunks generated per second after the first one
+        Streaming always goes to the provider; the response cache is not used.
+        """
+        try:
+            if model not in self.models:
+                raise ModelNotFoundError(model)
+            provider = self.models[model]["provider"]
+            trace = CallTrace(provider, model)
+            
+            chunks = []
+            token_times = []
+            try:
+                async for text in self._stream(prompt, system_prompt, model, trace):
+                    token_times.append(time.perf_counter())
+                    chunks.append(text)
+                    yield "token", {"model": model, "text": text}
+            except Exception:
+                trace.finish("error", trace.since("attempt") or 0.0)
+                raise
+            end_time = time.perf_counter()
+            # As in _fetch, time only the attempt that produced the stream
+            start_time = trace.marks["attempt"]
+            trace.finish("ok", end_time - start_time)
+            
+        except Exception as e:
+            logger.error(f"Error streaming response from {model}: {str(e)}")
+            yield "model_done", self._error_entry(model, e)
+            return
+        
+        response = "".join(chunks).strip()
+        with trace.phase("scoring"):
+            accuracy, relevancy = self._evaluate_response(response)
+        
+        first_token = (token_times[0] - start_time) * 1000 if token_times else 0
+        gaps = [later - earlier for earlier, later in zip(token_times, token_times[1:])]
+        inter_token = sum(gaps) / len(gaps) * 1000 if gaps else 0
+        generation_time = token_times[-1] - token_times[0] if len(token_times) > 1 else 0
+        tokens_per_second = (len(token_times) - 1) / generation_time if generation_time > 0 else 0
+        
+        metrics = {
+            "accuracy": accuracy,
+            "relevancy": relevancy,
+            "scorerVersion": self.scorer.version,
+            "responseTime": round((end_time - start_time) * 1000, 2),
+            "timeToFirstToken": round(first_token, 2),
+            "interTokenLatency": round(inter_token, 2),
+            "tokensPerSecond": round(tokens_per_second, 2),
+            "phases": trace.to_dict()
+        }
+        if trace.usage:
+            metrics["usage"] = trace.usage
+        if trace.retries:
+            metrics["retries"] = trace.retries
+        yield "model_done", {"model": model, "response": response, "metrics": metrics}
+
+    async def stream_experiment(
+        self,
+        prompt: str,
+        system_prompt: str,
+        models: List[str]
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream all models concurrently, interleaving their events as they arrive"""
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def pump(model: str):
+            async for event in self.stream_model(prompt, system_prompt, model):
+                await queue.put(event)
+        
+        tasks = [asyncio.create_task(pump(model)) for model in models]
+        try:
+            remaining = len(models)
+            while remaining:
+                event, data = await queue.get()
+                if event == "model_done":
+                    remaining -= 1
+                yield event, data
+        finally:
+            # Stop any model still streaming if the consumer goes away
+            for task in tasks:
+                task.cancel()
+
+    async def _stream(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> AsyncIterator[str]:
+        """
+        Stream text chunks from the model's provider under its slot.
+        Throttled calls are retried like in _with_retries (backing off
+        without the slot), as long as nothing has been streamed yet.
+        """
+        model_config = self.models[model]
+        provider = model_config["provider"]
+        actual_model = model_config["model"]
+        self._check_api_key(provider, model)
+        limiter = self.rate_limiters[provider]
+        estimated_tokens = self._estimate_tokens(provider, prompt, system_prompt)
+        
+        attempt = 0
+        while True:
+            trace.add("rate_limit_wait", await limiter.acquire(estimated_tokens))
+            trace.mark("slot")
+            streamed = False
+            throttled = None
+            async with self._semaphores[provider]:
+                trace.add("slot_wait", trace.since("slot"))
+                trace.mark("attempt")
+                try:
+                    if provider == "groq":
+                        stream = self._stream_groq(prompt, system_prompt, actual_model, trace)
+                    elif provider == "simulated":
+                        stream = self._stream_simulated(prompt, system_prompt, actual_model, trace)
+                    else:  # huggingface
+                        stream = self._stream_huggingface(prompt, system_prompt, actual_model, trace)
+                    async for text in stream:
+                        streamed = True
+                        yield text
+                        
+                except RateLimitedError as e:
+                    if streamed or attempt >= self.max_retries:
+                        limiter.throttled(attempt, e.retry_after)
+                        raise EvaluationError(model, e.detail)
+                    throttled = e
+                except asyncio.TimeoutError:
+                    raise EvaluationError(model, "Request timed out")
+                except EvaluationError:
+                    raise
+                except Exception as e:
+                    raise EvaluationError(model, str(e))
+            
+            if throttled is None:
+                limiter.succeeded(estimated_tokens, trace.usage["totalTokens"] if trace.usage else None)
+                return
+            await self._back_off(limiter, trace, attempt, throttled)
+            attempt += 1
 
-    async def _query_groq(self, prompt: str, system_prompt: str, model: str) -> str:
+    async def _query_groq(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> str:
         """Send request to Groq API"""
         headers = {
             "Authorization": f"Bearer {self.groq_api_key}",
@@ -76,96 +922,282 @@ class LLMService:
         payload = {
             "model": model,
             "messages": messages,
-            "temperature": 0.7
+            **self.sampling_params["groq"]
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.groq_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                ) as response:
-                    response_json = await response.json()
-                    
-                    if response.status != 200:
-                        error_msg = response_json.get('error', {}).get('message', 'Unknown error')
-                        raise EvaluationError(model, f"Groq API Error: {error_msg}")
-                    
-                    return response_json["choices"][0]["message"]["content"]
-                    
+            session = self._get_session("groq")
+            async with session.post(
+                self.groq_url,
+                headers=headers,
+                json=payload,
+                timeout=self.request_timeout,
+                trace_request_ctx=trace
+            ) as response:
+                self.rate_limiters["groq"].observe_headers(response.headers)
+                with trace.phase("body_read"):
+                    body = await response.read()
+                throttled = self._throttled_error(model, response, body)
+                if throttled:
+                    raise throttled
+                with trace.phase("json_decode"):
+                    response_json = json.loads(body)
+                
+                if response.status != 200:
+                    error_msg = response_json.get('error', {}).get('message', 'Unknown error')
+                    raise EvaluationError(model, f"Groq API Error: {error_msg}")
+                
+                usage = response_json.get("usage") or {}
+                trace.set_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                return response_json["choices"][0]["message"]["content"]
+                
+        except RateLimitedError:
+            raise
         except asyncio.TimeoutError:
             raise EvaluationError(model, "Request timed out")
         except Exception as e:
             raise EvaluationError(model, str(e))
 
-    async def _query_huggingface(self, prompt: str, system_prompt: str, model: str) -> str:
+    async def _query_huggingface(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> str:
         """Send request to Hugging Face API"""
         full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-        
+        result = await self._post_huggingface(full_prompt, model, trace)
+        if isinstance(result, list) and len(result) > 0:
+            text, generated_tokens = self._hf_generation(result[0])
+            # The Inference API doesn't report prompt tokens; text-generation
+            # models include the generated count when details are returned
+            trace.set_usage(None, generated_tokens)
+            return text
+        return str(result).strip()
+
+    async def _query_huggingface_batch(self, items: List[Tuple[str, str]], model: str, trace: CallTrace) -> List[Tuple[str, Optional[int]]]:
+        """Send several (prompt, system prompt) items as one Hugging Face request with a list of inputs"""
+        inputs = [f"{system_prompt}\n\n{prompt}" if system_prompt else prompt for prompt, system_prompt in items]
+        result = await self._post_huggingface(inputs, model, trace)
+        if not isinstance(result, list) or len(result) != len(inputs):
+            raise EvaluationError(model, f"HuggingFace API Error: expected {len(inputs)} results, got {str(result)[:200]}")
+        results = [self._hf_generation(generation) for generation in result]
+        generated = [tokens for _, tokens in results if tokens is not None]
+        trace.set_usage(None, sum(generated) if generated else None)
+        return results
+
+    @staticmethod
+    def _hf_generation(generation: Any) -> Tuple[str, Optional[int]]:
+        """Text and generated token count of one input's result; batched results may wrap it in a list"""
+        if isinstance(generation, list):
+            generation = generation[0] if generation else {}
+        if not isinstance(generation, dict):
+            return str(generation).strip(), None
+        return generation.get("generated_text", "").strip(), (generation.get("details") or {}).get("generated_tokens")
+
+    async def _post_huggingface(self, inputs: Any, model: str, trace: CallTrace) -> Any:
+        """POST one text-generation request and return the decoded JSON"""
         headers = {
             "Authorization": f"Bearer {self.hf_api_key}",
             "Content-Type": "application/json"
         }
         
         payload = {
-            "inputs": full_prompt,
-            "parameters": {
-                "max_new_tokens": 100,
-                "temperature": 0.7,
-                "return_full_text": False
-            }
+            "inputs": inputs,
+            "parameters": self.sampling_params["huggingface"]
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.hf_url}{model}",
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise EvaluationError(model, f"HuggingFace API Error: {error_text}")
-                    
-                    result = await response.json()
-                    if isinstance(result, list) and len(result) > 0:
-                        return result[0].get("generated_text", "").strip()
-                    return str(result).strip()
-                    
+            session = self._get_session("huggingface")
+            async with session.post(
+                f"{self.hf_url}{model}",
+                headers=headers,
+                json=payload,
+                timeout=self.request_timeout,
+                trace_request_ctx=trace
+            ) as response:
+                self.rate_limiters["huggingface"].observe_headers(response.headers)
+                if response.status != 200:
+                    error_text = await response.text()
+                    throttled = self._throttled_error(model, response, error_text)
+                    if throttled:
+                        raise throttled
+                    raise EvaluationError(model, f"HuggingFace API Error: {error_text}")
+                
+                with trace.phase("body_read"):
+                    body = await response.read()
+                with trace.phase("json_decode"):
+                    return json.loads(body)
+                
+        except RateLimitedError:
+            raise
         except asyncio.TimeoutError:
             raise EvaluationError(model, "Request timed out")
         except Exception as e:
             raise EvaluationError(model, str(e))
 
-    def _evaluate_response(self, response: str) -> Tuple[int, int]:
-        """Evaluate response quality"""
-        accuracy = 0
-        relevancy = 0
-        
-        # Length points (30)
-        if len(response) > 50:
-            accuracy += 30
-            relevancy += 30
-            
-        # Structure points (20)
-        if response.strip().endswith(('.', '!', '?')):
-            accuracy += 20
-            relevancy += 20
-            
-        # Content points (20)
-        if any(word in response.lower() for word in ['because', 'therefore', 'however', 'example']):
-            accuracy += 20
-            relevancy += 20
+    async def _stream_groq(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> AsyncIterator[str]:
+        """Stream a chat completion from Groq"""
+        headers = {
+            "Authorization": f"Bearer {self.groq_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            **self.sampling_params["groq"]
+        }
+        
+        session = self._get_session("groq")
+        async with session.post(
+            self.groq_url,
+            headers=headers,
+            json=payload,
+            timeout=self.stream_timeout,
+            trace_request_ctx=trace
+        ) as response:
+            self.rate_limiters["groq"].observe_headers(response.headers)
+            if response.status != 200:
+                body = await response.read()
+                throttled = self._throttled_error(model, response, body)
+                if throttled:
+                    raise throttled
+                response_json = json.loads(body)
+                error_msg = response_json.get('error', {}).get('message', 'Unknown error')
+                raise EvaluationError(model, f"Groq API Error: {error_msg}")
             
-        # Format points (20)
-        if response.strip() and not response.strip().isupper():
-            accuracy += 20
-            relevancy += 20
+            async for event in self._read_sse(response, trace):
+                # Groq reports usage on the final chunk under x_groq
+                usage = event.get("usage") or (event.get("x_groq") or {}).get("usage")
+                if usage:
+                    trace.set_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                if not event.get("choices"):
+                    continue
+                delta = event["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+    async def _stream_huggingface(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> AsyncIterator[str]:
+        """
+        Stream generated text from Hugging Face. Models served by
+        text-generation-inference stream tokens over SSE; the rest answer with
+        one JSON body, which is passed through as a single chunk.
+        """
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        
+        headers = {
+            "Authorization": f"Bearer {self.hf_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "inputs": full_prompt,
+            "parameters": self.sampling_params["huggingface"],
+            "stream": True
+        }
+        
+        session = self._get_session("huggingface")
+        async with session.post(
+            f"{self.hf_url}{model}",
+            headers=headers,
+            json=payload,
+            timeout=self.stream_timeout,
+            trace_request_ctx=trace
+        ) as response:
+            self.rate_limiters["huggingface"].observe_headers(response.headers)
+            if response.status != 200:
+                error_text = await response.text()
+                throttled = self._throttled_error(model, response, error_text)
+                if throttled:
+                    raise throttled
+                raise EvaluationError(model, f"HuggingFace API Error: {error_text}")
             
-        return accuracy, relevancy
+            if response.content_type == "text/event-stream":
+                async for event in self._read_sse(response, trace):
+                    # The final event carries generation details
+                    details = event.get("details") or {}
+                    if details.get("generated_tokens") is not None:
+                        trace.set_usage(None, details["generated_tokens"])
+                    token = event.get("token", {})
+                    if token.get("text") and not token.get("special"):
+                        yield token["text"]
+            else:
+                with trace.phase("body_read"):
+                    body = await response.read()
+                with trace.phase("json_decode"):
+                    result = json.loads(body)
+                if isinstance(result, list) and len(result) > 0:
+                    yield result[0].get("generated_text", "")
+                else:
+                    yield str(result)
+
+    async def _query_simulated(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> str:
+        """Get a response from the simulated provider"""
+        response, usage, first_byte = await self.simulator.complete(prompt, system_prompt, model)
+        trace.add("ttfb", first_byte)
+        trace.set_usage(usage["prompt_tokens"], usage["completion_tokens"])
+        return response
+
+    async def _stream_simulated(self, prompt: str, system_prompt: str, model: str, trace: CallTrace) -> AsyncIterator[str]:
+        """Stream a response from the simulated provider"""
+        usage: Dict[str, int] = {}
+        async for text in self.simulator.stream(prompt, system_prompt, model, usage):
+            yield text
+        trace.set_usage(usage["prompt_tokens"], usage["completion_tokens"])
+
+    def _throttled_error(self, model: str, response: aiohttp.ClientResponse, body) -> Optional[RateLimitedError]:
+        """
+        RateLimitedError for a response worth retrying, or None. The wait comes
+        from Retry-After or, for a Hugging Face model that is still loading,
+        the estimated_time in the body.
+        """
+        if response.status not in RETRYABLE_STATUSES:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        reason = f"HTTP {response.status}"
+        try:
+            detail = json.loads(body)
+        except ValueError:
+            detail = None
+        if isinstance(detail, dict):
+            error = detail.get("error")
+            message = error.get("message") if isinstance(error, dict) else error
+            if message:
+                reason += f": {message}"
+            if retry_after is None and detail.get("estimated_time") is not None:
+                retry_after = float(detail["estimated_time"])
+        return RateLimitedError(model, reason, retry_after)
+
+    async def _read_sse(self, response: aiohttp.ClientResponse, trace: CallTrace) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse the JSON payloads of a Server-Sent Events response body.
+        The whole stream counts as the body_read phase and the time spent
+        parsing events as json_decode.
+        """
+        decode_time = 0.0
+        try:
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                decode_start = time.perf_counter()
+                event = json.loads(data)
+                decode_time += time.perf_counter() - decode_start
+                yield event
+        finally:
+            read_time = trace.since("headers")
+            if read_time is not None:
+                trace.add("body_read", read_time)
+            trace.add("json_decode", decode_time)
+
+    def _evaluate_response(self, response: str) -> Tuple[int, int]:
+        """Evaluate response quality with the current scorer"""
+        return self.scorer.score(response)
 
 # Make the service class available for import
 __all__ = ['LLMService']
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Micro-batching Module
+Groups concurrent calls that can share one provider request. The first call
+for a key opens a batch; calls arriving within the window join it, and the
+batch is sent when the window closes or it reaches its maximum size. Each
+caller gets back its own item's result.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+import asyncio
+
+def parse_batch_settings(value: str) -> Dict[str, Tuple[float, int]]:
+    """
+    Parse per-model overrides written as "model=window_ms:max_batch_size,...",
+    e.g. "gpt-2=20:16". Returns {model: (window_ms, max_batch_size)}.
+    """
+    settings = {}
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            model, limits = part.split("=", 1)
+            window_ms, max_batch_size = limits.split(":", 1)
+            settings[model.strip()] = (float(window_ms), int(max_batch_size))
+        except ValueError:
+            raise ValueError(f"Invalid batch setting {part!r}; expected model=window_ms:max_batch_size")
+    return settings
+
+class _OpenBatch:
+    def __init__(self):
+        self.entries: List[Tuple[Any, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class MicroBatcher:
+    def __init__(
+        self,
+        send: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+        window: float,
+        max_batch_size: int
+    ):
+        """
+        Args:
+            send: Sends one batch: called with the key and the items, returns
+                one result per item in the same order. A result that is an
+                exception is raised to that item's caller only; if `send`
+                raises, every caller in the batch gets the error.
+            window: Seconds a batch stays open for more calls
+            max_batch_size: Items that make a batch send immediately
+        """
+        self.send = send
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._open: Dict[Hashable, _OpenBatch] = {}
+        self._sending: Set[asyncio.Task] = set()
+        self.stats = {"batches": 0, "items": 0, "largestBatch": 0}
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Add `item` to the open batch for `key` and wait for its result"""
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = _OpenBatch()
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        future = asyncio.get_running_loop().create_future()
+        batch.entries.append((item, future))
+        if len(batch.entries) >= self.max_batch_size:
+            self._flush(key)
+        # A caller that goes away just cancels its future; the batch skips
+        # it if it hasn't been sent yet
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        batch = self._open.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        entries = [(item, future) for item, future in batch.entries if not future.done()]
+        if not entries:
+            return
+        self.stats["batches"] += 1
+        self.stats["items"] += len(entries)
+        self.stats["largestBatch"] = max(self.stats["largestBatch"], len(entries))
+        task = asyncio.create_task(self._send(key, entries))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, key: Hashable, entries: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.send(key, [item for item, _ in entries])
+        except asyncio.CancelledError:
+            for _, future in entries:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(entries, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Batching settings and counters"""
+        return {
+            "windowMs": self.window * 1000,
+            "maxBatchSize": self.max_batch_size,
+            **self.stats,
+            "meanBatchSize": round(self.stats["items"] / self.stats["batches"], 2) if self.stats["batches"] else None,
+            "open": sum(len(batch.entries) for batch in self._open.values()),
+        }
+
+    async def close(self) -> None:
+        """Cancel open and in-flight batches"""
+        for key in list(self._open):
+            batch = self._open.pop(key)
+            batch.timer.cancel()
+            for _, future in batch.entries:
+                future.cancel()
+        for task in list(self._sending):
+            task.cancel()
+        await asyncio.gather(*self._sending, return_exceptions=True)
+
+# Make the micro-batcher available for import
+__all__ = ['MicroBatcher', 'parse_batch_settings']
@@ -0,0 +1,214 @@
+"""
+Rate Limit Module
+Client-side token buckets that keep each provider at, not over, its
+requests-per-minute and tokens-per-minute limits, sized by the rate-limit
+headers the provider returns and backed off adaptively when a call is
+throttled anyway.
+"""
+
+from typing import Any, Dict, Mapping, Optional
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio
+import random
+import re
+import time
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a reset header such as '7.66s', '2m59.56s', '120ms' or '12'"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+class TokenBucket:
+    """
+    Bucket refilled continuously at `per_minute / 60` per second.
+    Reservations may take the level below zero; the deficit is how long
+    the caller has to wait, which keeps waiters in arrival order.
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return the seconds until it is actually available"""
+        now = time.monotonic()
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def credit(self, amount: float) -> None:
+        """Give back part of an over-estimated reservation"""
+        self._refill(time.monotonic())
+        self.level = min(self.capacity, self.level + amount)
+
+    def resize(self, per_minute: float) -> None:
+        """Change the limit, keeping any adaptive slow-down of the rate"""
+        fraction = self.rate / self.base_rate
+        self.capacity = float(per_minute)
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate * fraction
+        self.level = min(self.level, self.capacity)
+
+    def clamp(self, remaining: float) -> None:
+        """Never believe we have more left than the provider says we do"""
+        self._refill(time.monotonic())
+        self.level = min(self.level, remaining)
+
+class RateLimiter:
+    """
+    Per-provider limiter: a request bucket and a token bucket, a shared
+    pause set by Retry-After and exhausted rate-limit headers, and an
+    adaptive rate that is halved on every throttled call and recovers
+    gradually on success. A limit of 0 starts without a bucket; the
+    provider's x-ratelimit-limit-* headers create or resize the buckets,
+    so the key's actual tier sets the pace in either direction.
+    """
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        min_rate_fraction: float = 0.1
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_rate_fraction = min_rate_fraction
+        self.rate_fraction = 1.0
+        self.paused_until = 0.0
+        self.stats = {"waits": 0, "waitSeconds": 0.0, "throttled": 0, "retries": 0}
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until one request of about `tokens` tokens fits; returns seconds waited"""
+        wait = max(0.0, self.paused_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            self.stats["waits"] += 1
+            self.stats["waitSeconds"] += wait
+            await asyncio.sleep(wait)
+        return wait
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Apply x-ratelimit-limit-*/-remaining-*/-reset-* headers: size our
+        buckets to the provider's limits, clamp them to what it says is left,
+        and pause until the reset when a limit is used up
+        """
+        for kind in ("requests", "tokens"):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            if limit:
+                self._set_limit(kind, limit)
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            bucket = getattr(self, kind)
+            if bucket is not None:
+                bucket.clamp(remaining)
+            if remaining <= 0:
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self.pause(reset)
+
+    def _set_limit(self, kind: str, per_minute: float) -> None:
+        """Create or resize the requests or tokens bucket"""
+        bucket = getattr(self, kind)
+        if bucket is None:
+            bucket = TokenBucket(per_minute)
+            bucket.rate = bucket.base_rate * self.rate_fraction
+            setattr(self, kind, bucket)
+        elif bucket.capacity != per_minute:
+            bucket.resize(per_minute)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every call to this provider for `seconds`"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def throttled(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Record a throttled call and return how long to wait before retry
+        `attempt` (0-based): Retry-After plus a little jitter when the
+        provider gave one, otherwise exponential backoff with full jitter.
+        The whole provider pauses for that long and its rate is halved.
+        """
+        self.stats["throttled"] += 1
+        if retry_after is not None:
+            delay = min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        self.pause(delay)
+        self._set_rate_fraction(max(self.min_rate_fraction, self.rate_fraction / 2))
+        return delay
+
+    def succeeded(self, estimated_tokens: int = 0, used_tokens: Optional[int] = None) -> None:
+        """Recover some rate after a successful call and settle its token estimate"""
+        if self.rate_fraction < 1.0:
+            self._set_rate_fraction(min(1.0, self.rate_fraction + 0.05))
+        if self.tokens is not None and used_tokens is not None and used_tokens < estimated_tokens:
+            self.tokens.credit(estimated_tokens - used_tokens)
+
+    def _set_rate_fraction(self, fraction: float) -> None:
+        self.rate_fraction = fraction
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.rate = bucket.base_rate * fraction
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current limits and counters, for the stats endpoint"""
+        return {
+            "requestsPerMinute": self.requests.capacity if self.requests else None,
+            "tokensPerMinute": self.tokens.capacity if self.tokens else None,
+            "rateFraction": round(self.rate_fraction, 3),
+            "pausedFor": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            **self.stats,
+            "waitSeconds": round(self.stats["waitSeconds"], 3),
+        }
+
+# Make the rate limit helpers available for import
+__all__ = ['RateLimiter', 'TokenBucket', 'parse_duration', 'parse_retry_after']
@@ -0,0 +1,178 @@
+"""
+Re-scoring Service
+Background job that re-scores every stored response under a given scorer
+version, a chunk of experiments at a time
+"""
+
+from typing import Any, Callable, Dict, Optional
+from datetime import datetime, timezone
+import asyncio
+import logging
+import uuid
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import crud, rollups
+from app.db.models import Experiment, ModelResponse
+from app.services.scoring import Scorer, get_scorer
+
+logger = logging.getLogger(__name__)
+
+class RescoreJob:
+    """Progress of one re-scoring run"""
+    def __init__(self, version: str):
+        self.id = uuid.uuid4().hex
+        self.version = version
+        self.status = "pending"  # pending -> running -> completed | failed
+        self.total = 0
+        self.processed = 0
+        self.rescored = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "version": self.version,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "rescored": self.rescored,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class RescoreManager:
+    def __init__(self, session_factory: Callable[[], AsyncSession], chunk_size: int):
+        """
+        Args:
+            session_factory: Creates the database session each job runs in
+            chunk_size: Experiments re-scored per commit
+        """
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.jobs: Dict[str, RescoreJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, version: Optional[str] = None) -> RescoreJob:
+        """
+        Start re-scoring under `version` (default: the current scorer).
+        Only rows scored by a different version are touched, so a job that
+        was interrupted picks up where it stopped when started again.
+        """
+        scorer = get_scorer(version)
+        for job in self.jobs.values():
+            if job.version == scorer.version and job.status in ("pending", "running"):
+                return job
+
+        job = RescoreJob(scorer.version)
+        self.jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, scorer))
+        return job
+
+    async def _run(self, job: RescoreJob, scorer: Scorer) -> None:
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        logger.info(f"Re-scoring job {job.id} started for scorer {scorer.version}")
+        try:
+            async with self.session_factory() as db:
+                stale = (
+                    select(ModelResponse.id)
+                    .where(
+                        ModelResponse.experiment_id == Experiment.id,
+                        ModelResponse.status == "ok",
+                        func.coalesce(ModelResponse.scorer_version, "") != scorer.version
+                    )
+                    .exists()
+                )
+                job.total = (await db.execute(select(func.count(Experiment.id)).where(stale))).scalar()
+
+                last_id = 0
+                while True:
+                    experiment_ids = (await db.execute(
+                        select(Experiment.id)
+                        .where(Experiment.id > last_id, stale)
+                        .order_by(Experiment.id)
+                        .limit(self.chunk_size)
+                    )).scalars().all()
+                    if not experiment_ids:
+                        break
+
+                    job.rescored += await self._rescore_chunk(db, scorer, experiment_ids)
+                    await db.commit()
+                    job.processed += len(experiment_ids)
+                    last_id = experiment_ids[-1]
+
+                # Rollups hold accuracy/relevancy sums, so rebuild them from the new scores
+                await db.run_sync(lambda session: rollups.rebuild(session.connection()))
+                await db.commit()
+
+            job.status = "completed"
+            logger.info(f"Re-scoring job {job.id} finished: {job.rescored} responses re-scored")
+        except Exception as e:
+            logger.error(f"Re-scoring job {job.id} failed: {str(e)}", exc_info=True)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._tasks.pop(job.id, None)
+
+    async def _rescore_chunk(self, db: AsyncSession, scorer: Scorer, experiment_ids) -> int:
+        """Re-score one chunk of experiments in a single vectorized pass"""
+        rows = (await db.execute(
+            select(ModelResponse.id, ModelResponse.experiment_id, ModelResponse.status)
+            .where(ModelResponse.experiment_id.in_(experiment_ids))
+            .order_by(ModelResponse.id)
+        )).all()
+        if not any(row.status == "ok" for row in rows):
+            return 0
+
+        # Text comes decompressed, or from the archive for archived experiments
+        texts = await crud.response_texts(db, experiment_ids)
+        ok_rows, ok_texts, position = [], [], {}
+        for row in rows:
+            index = position[row.experiment_id] = position.get(row.experiment_id, -1) + 1
+            if row.status == "ok":
+                ok_rows.append(row)
+                ok_texts.append(texts[row.experiment_id][index])
+        accuracy, relevancy = scorer.score_batch(ok_texts)
+        scores = {
+            row.id: (int(a), int(r))
+            for row, a, r in zip(ok_rows, accuracy.tolist(), relevancy.tolist())
+        }
+        await db.execute(update(ModelResponse), [
+            {"id": row_id, "accuracy": a, "relevancy": r, "scorer_version": scorer.version}
+            for row_id, (a, r) in scores.items()
+        ])
+
+        # Keep the JSON copy on each experiment in step. model_responses rows
+        # were inserted in response order, so row order gives the entry index.
+        rows_by_experiment: Dict[int, list] = {}
+        for row in rows:
+            rows_by_experiment.setdefault(row.experiment_id, []).append(row)
+        experiments = (await db.execute(
+            select(Experiment).where(Experiment.id.in_(experiment_ids))
+        )).scalars().all()
+        for experiment in experiments:
+            experiment_rows = rows_by_experiment.get(experiment.id, [])
+            if len(experiment_rows) != len(experiment.responses):
+                logger.warning(f"Experiment {experiment.id}: response rows don't match its JSON, skipping JSON update")
+                continue
+            responses = []
+            for entry, row in zip(experiment.responses, experiment_rows):
+                if row.id in scores:
+                    a, r = scores[row.id]
+                    entry = {**entry, "metrics": {
+                        **entry.get("metrics", {}),
+                        "accuracy": a,
+                        "relevancy": r,
+                        "scorerVersion": scorer.version
+                    }}
+                responses.append(entry)
+            experiment.responses = responses
+
+        return len(scores)
+
+# Make the re-scoring helpers available for import
+__all__ = ['RescoreJob', 'RescoreManager']
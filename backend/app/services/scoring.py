@@ -0,0 +1,100 @@
+"""
+Scoring Module
+Pluggable, versioned scorers that rate whole batches of responses at once.
+
+Every scorer works on precomputed NumPy feature arrays, so scoring thousands
+of stored responses is a handful of vectorized operations instead of a
+Python loop per string. Each score is stored with the version of the scorer
+that produced it, which lets old results be re-scored when the rules change.
+"""
+
+from typing import Dict, Sequence, Tuple
+from itertools import repeat
+from operator import methodcaller
+import os
+import numpy as np
+
+KEYWORDS = ("because", "therefore", "however", "example")
+
+def extract_features(responses: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Compute per-response feature arrays:
+        length: character count
+        terminal_punctuation: stripped text ends with '.', '!' or '?'
+        keyword_hits: how many of KEYWORDS appear (case-insensitive)
+        has_mixed_case: stripped text is non-empty and not all upper case
+    
+    String work is done once per batch with C-level str methods mapped over
+    it, so scorers only ever combine ready-made arrays.
+    """
+    count = len(responses)
+    stripped = list(map(str.strip, responses))
+    lowered = list(map(str.lower, responses))
+
+    keyword_hits = np.zeros(count, dtype=np.int64)
+    for keyword in KEYWORDS:
+        keyword_hits += np.fromiter(map(str.__contains__, lowered, repeat(keyword)), dtype=bool, count=count)
+
+    return {
+        "length": np.fromiter(map(len, responses), dtype=np.int64, count=count),
+        "terminal_punctuation": np.fromiter(
+            map(methodcaller("endswith", (".", "!", "?")), stripped), dtype=bool, count=count
+        ),
+        "keyword_hits": keyword_hits,
+        "has_mixed_case": (
+            (np.fromiter(map(len, stripped), dtype=np.int64, count=count) > 0)
+            & ~np.fromiter(map(str.isupper, stripped), dtype=bool, count=count)
+        ),
+    }
+
+class Scorer:
+    """Base class; subclasses set `version` and implement `score_features`"""
+    version: str = ""
+
+    def score_features(self, features: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (accuracy, relevancy) arrays for a batch of feature arrays"""
+        raise NotImplementedError
+
+    def score_batch(self, responses: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Score many responses in one vectorized pass"""
+        return self.score_features(extract_features(responses))
+
+    def score(self, response: str) -> Tuple[int, int]:
+        """Score a single response"""
+        accuracy, relevancy = self.score_batch([response])
+        return int(accuracy[0]), int(relevancy[0])
+
+class HeuristicScorer(Scorer):
+    """
+    The original heuristic: up to 90 points for length, structure,
+    reasoning keywords and formatting. Accuracy and relevancy are equal.
+    """
+    version = "heuristic-v1"
+
+    def score_features(self, features: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        score = (
+            30 * (features["length"] > 50)                # Length points (30)
+            + 20 * features["terminal_punctuation"]       # Structure points (20)
+            + 20 * (features["keyword_hits"] > 0)         # Content points (20)
+            + 20 * features["has_mixed_case"]             # Format points (20)
+        ).astype(np.int64)
+        return score, score.copy()
+
+# Registry of available scorers by version
+SCORERS: Dict[str, Scorer] = {
+    scorer.version: scorer for scorer in (HeuristicScorer(),)
+}
+
+def register_scorer(scorer: Scorer) -> None:
+    """Make a scorer available for scoring and re-scoring"""
+    SCORERS[scorer.version] = scorer
+
+def get_scorer(version: str = None) -> Scorer:
+    """Return the scorer for `version`, or the configured current one"""
+    version = version or os.getenv("SCORER_VERSION", HeuristicScorer.version)
+    if version not in SCORERS:
+        raise KeyError(f"Unknown scorer version: {version}")
+    return SCORERS[version]
+
+# Make the scoring API available for import
+__all__ = ['Scorer', 'HeuristicScorer', 'SCORERS', 'extract_features', 'register_scorer', 'get_scorer']
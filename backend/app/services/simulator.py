@@ -0,0 +1,132 @@
+"""
+Simulated Provider Module
+An in-process stand-in for a model API, for load tests and benchmarks that
+must not spend real API quota. Latency, failures, throttling, response size
+and streaming pace are all configurable through environment variables.
+"""
+
+from typing import AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import os
+import random
+from app.core.exceptions import EvaluationError, RateLimitedError
+
+# Vocabulary for generated text; includes the scorer's reasoning keywords so
+# simulated responses score like plausible answers
+WORDS = (
+    "the", "model", "answer", "because", "therefore", "however", "example",
+    "data", "result", "shows", "which", "means", "this", "that", "value",
+    "first", "then", "finally", "each", "case", "input", "output", "step",
+)
+
+class SimulatedProvider:
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        latency_distribution: str = "lognormal",
+        latency_spread: float = 0.5,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        response_words: int = 60,
+        token_interval_ms: float = 20.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            latency_ms: Time to the first token: the fixed value, the mean
+                (exponential, uniform) or the median (lognormal)
+            latency_distribution: fixed, uniform, exponential or lognormal
+            latency_spread: Lognormal sigma, or the +/- fraction for uniform
+            error_rate: Fraction of calls that fail outright
+            throttle_rate: Fraction of calls answered like an HTTP 429
+            retry_after: Retry-After (seconds) sent with simulated 429s
+            response_words: Words per response (one streamed token each)
+            token_interval_ms: Gap between streamed tokens
+            seed: Seed for reproducible runs
+        """
+        if latency_distribution not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.response_words = response_words
+        self.token_interval_ms = token_interval_ms
+        self.random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "SimulatedProvider":
+        """Build a provider from the SIMULATED_* environment variables"""
+        seed = os.getenv("SIMULATED_SEED")
+        return cls(
+            latency_ms=float(os.getenv("SIMULATED_LATENCY_MS", "200")),
+            latency_distribution=os.getenv("SIMULATED_LATENCY_DISTRIBUTION", "lognormal"),
+            latency_spread=float(os.getenv("SIMULATED_LATENCY_SPREAD", "0.5")),
+            error_rate=float(os.getenv("SIMULATED_ERROR_RATE", "0")),
+            throttle_rate=float(os.getenv("SIMULATED_THROTTLE_RATE", "0")),
+            retry_after=float(os.getenv("SIMULATED_RETRY_AFTER", "1")),
+            response_words=int(os.getenv("SIMULATED_RESPONSE_WORDS", "60")),
+            token_interval_ms=float(os.getenv("SIMULATED_TOKEN_INTERVAL_MS", "20")),
+            seed=int(seed) if seed else None,
+        )
+
+    def sample_latency(self) -> float:
+        """Seconds until the first token, drawn from the configured distribution"""
+        mean = self.latency_ms / 1000
+        if self.latency_distribution == "fixed":
+            return mean
+        if self.latency_distribution == "uniform":
+            return self.random.uniform(mean * (1 - self.latency_spread), mean * (1 + self.latency_spread))
+        if self.latency_distribution == "exponential":
+            return self.random.expovariate(1 / mean) if mean > 0 else 0.0
+        return self.random.lognormvariate(0, self.latency_spread) * mean
+
+    def _check_failure(self, model: str) -> None:
+        """Fail the call as configured: throttled first, then a hard error"""
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            raise RateLimitedError(model, "HTTP 429: simulated rate limit", self.retry_after)
+        if roll < self.throttle_rate + self.error_rate:
+            raise EvaluationError(model, "Simulated provider error")
+
+    def _words(self) -> list:
+        words = [self.random.choice(WORDS) for _ in range(max(1, self.response_words))]
+        words[0] = words[0].capitalize()
+        words[-1] += "."
+        return words
+
+    def _usage(self, prompt: str, system_prompt: str, completion_tokens: int) -> Dict[str, int]:
+        return {
+            "prompt_tokens": (len(prompt) + len(system_prompt)) // 4,
+            "completion_tokens": completion_tokens,
+        }
+
+    async def complete(self, prompt: str, system_prompt: str, model: str) -> Tuple[str, Dict[str, int], float]:
+        """
+        Answer in one piece after the latency plus the time streaming would
+        have taken. Returns the text, OpenAI-style token usage and the
+        sampled time to first byte in seconds.
+        """
+        first_byte = self.sample_latency()
+        await asyncio.sleep(first_byte)
+        self._check_failure(model)
+        words = self._words()
+        await asyncio.sleep(len(words) * self.token_interval_ms / 1000)
+        return " ".join(words), self._usage(prompt, system_prompt, len(words)), first_byte
+
+    async def stream(self, prompt: str, system_prompt: str, model: str, usage: Dict[str, int]) -> AsyncIterator[str]:
+        """Yield one word at a time; fills `usage` once the stream ends"""
+        await asyncio.sleep(self.sample_latency())
+        self._check_failure(model)
+        words = self._words()
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(self.token_interval_ms / 1000)
+            yield word if index == 0 else f" {word}"
+        usage.update(self._usage(prompt, system_prompt, len(words)))
+
+# Make the simulated provider available for import
+__all__ = ['SimulatedProvider']
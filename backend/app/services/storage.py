@@ -0,0 +1,150 @@
+"""
+Response Storage Service
+Maintenance of stored response text: training zstd dictionaries on it,
+re-compressing rows written before the current dictionary, and moving old
+experiments' text into archive files (app/db/archive.py). Archived
+experiments keep their row, metrics and prompt search; their detail, export
+and re-scoring read the text back from the archive.
+"""
+
+from typing import Any, Callable, Dict
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+from sqlalchemy import String, func, insert, select, text, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import archive, codec, crud
+from app.db.models import ArchivedExperiment, Experiment, ModelResponse, ResponseArchive, ResponseDictionary
+
+logger = logging.getLogger(__name__)
+
+async def train_dictionary(session_factory: Callable[[], AsyncSession], samples: int = 5000) -> Dict[str, Any]:
+    """
+    Train a dictionary on the most recent stored responses and make it the
+    one new text is compressed with. Processes that are already running
+    keep writing with their dictionary until restarted, but read frames
+    written with the new one.
+    """
+    async with session_factory() as db:
+        texts = (await db.execute(
+            select(ModelResponse.response)
+            .where(ModelResponse.status == "ok", func.length(ModelResponse.response) > 0)
+            .order_by(ModelResponse.id.desc())
+            .limit(samples)
+        )).scalars().all()
+        dict_id, data = await asyncio.to_thread(codec.train, texts)
+        await db.execute(insert(ResponseDictionary).values(id=dict_id, data=data, samples=len(texts)))
+        await db.commit()
+    codec.register(dict_id, data)
+    logger.info(f"Trained response dictionary {dict_id} ({len(data)} bytes) on {len(texts)} responses")
+    return {"id": dict_id, "bytes": len(data), "samples": len(texts)}
+
+_RAW_RESPONSES = text(
+    "SELECT id, response FROM model_responses WHERE id > :last_id ORDER BY id LIMIT :limit"
+)
+
+async def recompress(session_factory: Callable[[], AsyncSession], chunk_size: int = 1000) -> int:
+    """
+    Compress every stored response that's still plain text or was
+    compressed with another dictionary than the current one, a chunk per
+    commit. Safe to interrupt and run again.
+    """
+    current = codec.current_dictionary() or 0
+    rewritten = 0
+    last_id = 0
+    async with session_factory() as db:
+        while True:
+            rows = (await db.execute(_RAW_RESPONSES, {"last_id": last_id, "limit": chunk_size})).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            stale = [
+                row for row in rows
+                if isinstance(row.response, str) or (row.response and codec.dictionary_id(row.response) != current)
+            ]
+            if stale:
+                # Bound through CompressedText, which compresses with the current dictionary
+                await db.execute(update(ModelResponse), [
+                    {
+                        "id": row.id,
+                        "response": row.response if isinstance(row.response, str) else codec.decompress(row.response)
+                    }
+                    for row in stale
+                ])
+                await db.commit()
+                rewritten += len(stale)
+    logger.info(f"Re-compressed {rewritten} responses with dictionary {current}")
+    return rewritten
+
+async def archive_experiments(
+    session_factory: Callable[[], AsyncSession],
+    older_than: datetime,
+    chunk_size: int = 500
+) -> Dict[str, Any]:
+    """
+    Move the response text of experiments created before `older_than` into
+    a new archive file. Each chunk's frames are appended and fsynced before
+    the chunk's stubs are committed, so an interrupted run loses nothing.
+    """
+    created_at_text = type_coerce(Experiment.created_at, String)
+    unarchived = ~select(ArchivedExperiment.experiment_id).where(ArchivedExperiment.experiment_id == Experiment.id).exists()
+    name = f"experiments-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.zst"
+    archive_id = None
+    archived = 0
+    size = 0
+    last_id = 0
+    async with session_factory() as db:
+        while True:
+            experiment_ids = (await db.execute(
+                select(Experiment.id)
+                .where(Experiment.id > last_id, created_at_text < crud.to_db_timestamp(older_than), unarchived)
+                .order_by(Experiment.id)
+                .limit(chunk_size)
+            )).scalars().all()
+            if not experiment_ids:
+                break
+            last_id = experiment_ids[-1]
+
+            texts = await crud.response_texts(db, experiment_ids)
+            frames = await asyncio.to_thread(lambda: [archive.encode(texts.get(i, [])) for i in experiment_ids])
+            locations = await asyncio.to_thread(archive.append, name, frames)
+
+            if archive_id is None:
+                archive_id = (await db.execute(
+                    insert(ResponseArchive).values(path=name).returning(ResponseArchive.id)
+                )).scalar()
+            await db.execute(insert(ArchivedExperiment), [
+                {"experiment_id": experiment_id, "archive_id": archive_id, "offset": offset, "length": length}
+                for experiment_id, (offset, length) in zip(experiment_ids, locations)
+            ])
+            await db.execute(
+                update(ModelResponse).where(ModelResponse.experiment_id.in_(experiment_ids)).values(response="")
+            )
+            # Archived experiments stay searchable by prompt, not by response text
+            await db.execute(
+                text("UPDATE experiments_fts SET responses = NULL WHERE rowid = :id"),
+                [{"id": experiment_id} for experiment_id in experiment_ids]
+            )
+            archived += len(experiment_ids)
+            size += sum(length for _, length in locations)
+            await db.execute(
+                update(ResponseArchive).where(ResponseArchive.id == archive_id)
+                .values(experiments=archived, size_bytes=size)
+            )
+            await db.commit()
+
+    if archived:
+        logger.info(f"Archived {archived} experiments to {name} ({size} bytes)")
+    return {"archive": name if archived else None, "experiments": archived, "bytes": size}
+
+async def enforce_retention(session_factory: Callable[[], AsyncSession], days: int, interval: float) -> None:
+    """Archive experiments older than `days`, every `interval` seconds, until cancelled"""
+    while True:
+        try:
+            await archive_experiments(session_factory, datetime.now(timezone.utc) - timedelta(days=days))
+        except Exception as e:
+            logger.error(f"Archiving old experiments failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(interval)
+
+# Make the storage maintenance helpers available for import
+__all__ = ['train_dictionary', 'recompress', 'archive_experiments', 'enforce_retention']
@@ -0,0 +1,229 @@
+"""
+Telemetry Module
+Monotonic per-call timing broken into phases, provider token usage, and the
+Prometheus metrics they feed.
+
+Phases of a model call (all from time.perf_counter):
+    batch_wait: waiting for a micro-batch to be sent
+    slot_wait: waiting for the provider's concurrency slot
+    rate_limit_wait: waiting for room in the provider's rate limits
+    retry_wait: backing off before retrying a throttled call
+    connection_wait: waiting for a free connection in the aiohttp pool
+    connect: DNS, TCP and TLS setup for a new connection
+    ttfb: request sent until response headers arrive
+    body_read: response headers until the whole body (or stream) is read
+    json_decode: parsing the provider's JSON
+    scoring: scoring the response text
+"""
+
+from typing import Dict, Iterator, Optional
+from contextlib import contextmanager
+from types import SimpleNamespace
+import asyncio
+import time
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+REQUESTS = Counter(
+    "llm_requests_total",
+    "Model calls by outcome (ok, error, cancelled, cache_hit or shared)",
+    ["provider", "model", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "Model call time once the provider slot is held",
+    ["provider", "model", "status"],
+    buckets=LATENCY_BUCKETS
+)
+PHASE_SECONDS = Histogram(
+    "llm_request_phase_seconds",
+    "Time spent in each phase of a model call",
+    ["provider", "model", "phase"],
+    buckets=LATENCY_BUCKETS
+)
+RETRIES = Counter(
+    "llm_retries_total",
+    "Throttled model calls that were retried",
+    ["provider", "model"]
+)
+TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the provider",
+    ["provider", "model", "kind"]
+)
+BATCH_SIZE = Histogram(
+    "llm_batch_size",
+    "Calls sent together in one micro-batched provider request",
+    ["provider", "model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+HEDGES = Counter(
+    "llm_hedged_requests_total",
+    "Duplicate calls sent for slow model calls (sent), and those that answered first (won)",
+    ["provider", "model", "outcome"]
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer, sampled periodically",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Admitted experiment requests running in this process"
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queued",
+    "Experiment requests waiting to be admitted",
+    ["priority"]
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Experiment requests turned away with 503 (queue_full, timeout or shed)",
+    ["priority", "reason"]
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds",
+    "Time admitted experiment requests spent in the wait queue",
+    ["priority"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+# Phase names as they appear in experiment metrics (milliseconds)
+PHASE_KEYS = {
+    "batch_wait": "batchWait",
+    "slot_wait": "slotWait",
+    "rate_limit_wait": "rateLimitWait",
+    "retry_wait": "retryWait",
+    "connection_wait": "connectionWait",
+    "connect": "connect",
+    "ttfb": "timeToFirstByte",
+    "body_read": "bodyRead",
+    "json_decode": "jsonDecode",
+    "scoring": "scoring",
+}
+
+class CallTrace:
+    """Phase timings and token usage for one provider call"""
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.phases: Dict[str, float] = {}  # seconds
+        self.usage: Optional[Dict[str, int]] = None
+        self.retries = 0
+        self.hedged: Optional[str] = None  # "primary" or "hedge": which call answered, if one was hedged
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        """Remember when `name` happened, for a phase that ends later"""
+        self.marks[name] = time.perf_counter()
+
+    def since(self, name: str) -> Optional[float]:
+        """Seconds since mark `name`, or None if it was never set"""
+        started = self.marks.get(name)
+        return time.perf_counter() - started if started is not None else None
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Count time against a phase and export it"""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        PHASE_SECONDS.labels(self.provider, self.model, phase).observe(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as phase `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def set_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        """Record the token counts the provider reported, if any"""
+        if prompt_tokens is None and completion_tokens is None:
+            return
+        self.usage = {
+            "promptTokens": prompt_tokens or 0,
+            "completionTokens": completion_tokens or 0,
+            "totalTokens": (prompt_tokens or 0) + (completion_tokens or 0),
+        }
+
+    def finish(self, status: str, seconds: float) -> None:
+        """Export the call's outcome, duration and token usage"""
+        REQUESTS.labels(self.provider, self.model, status).inc()
+        REQUEST_SECONDS.labels(self.provider, self.model, status).observe(seconds)
+        if self.usage:
+            TOKENS.labels(self.provider, self.model, "prompt").inc(self.usage["promptTokens"])
+            TOKENS.labels(self.provider, self.model, "completion").inc(self.usage["completionTokens"])
+
+    def to_dict(self) -> Dict[str, float]:
+        """Phase timings in milliseconds, keyed as in experiment metrics"""
+        return {
+            PHASE_KEYS.get(phase, phase): round(seconds * 1000, 2)
+            for phase, seconds in self.phases.items()
+        }
+
+def _trace(ctx: SimpleNamespace) -> Optional[CallTrace]:
+    """The CallTrace passed as trace_request_ctx, if the request has one"""
+    trace = ctx.trace_request_ctx
+    return trace if isinstance(trace, CallTrace) else None
+
+async def _on_queued_start(session, ctx, params) -> None:
+    if trace := _trace(ctx):
+        trace.mark("queued")
+
+async def _on_queued_end(session, ctx, params) -> None:
+    if (trace := _trace(ctx)) and (seconds := trace.since("queued")) is not None:
+        trace.add("connection_wait", seconds)
+
+async def _on_connect_start(session, ctx, params) -> None:
+    if trace := _trace(ctx):
+        trace.mark("connecting")
+
+async def _on_connect_end(session, ctx, params) -> None:
+    if (trace := _trace(ctx)) and (seconds := trace.since("connecting")) is not None:
+        trace.add("connect", seconds)
+
+async def _on_headers_sent(session, ctx, params) -> None:
+    if trace := _trace(ctx):
+        trace.mark("sent")
+
+async def _on_request_end(session, ctx, params) -> None:
+    # Fires once the response status line and headers have been read
+    if (trace := _trace(ctx)) and (seconds := trace.since("sent")) is not None:
+        trace.add("ttfb", seconds)
+        trace.mark("headers")
+
+async def monitor_event_loop(interval: float) -> None:
+    """
+    Sample event loop lag until cancelled: sleep `interval` and record how
+    much later than that the loop got back to us. Lag means something is
+    blocking the loop (CPU work, sync I/O) and every request waits on it.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+def trace_config() -> "aiohttp.TraceConfig":
+    """
+    aiohttp hooks that fill in the connection and TTFB phases of the
+    CallTrace passed to a request as `trace_request_ctx`
+    """
+    # Imported here so the app can load this module (for /metrics) without
+    # paying for aiohttp until a provider session is opened
+    import aiohttp
+    config = aiohttp.TraceConfig()
+    config.on_connection_queued_start.append(_on_queued_start)
+    config.on_connection_queued_end.append(_on_queued_end)
+    config.on_connection_create_start.append(_on_connect_start)
+    config.on_connection_create_end.append(_on_connect_end)
+    config.on_request_headers_sent.append(_on_headers_sent)
+    config.on_request_end.append(_on_request_end)
+    return config
+
+# Make the telemetry helpers available for import
+__all__ = ['CallTrace', 'trace_config', 'monitor_event_loop', 'EVENT_LOOP_LAG', 'REQUESTS', 'REQUEST_SECONDS', 'PHASE_SECONDS', 'RETRIES', 'TOKENS', 'BATCH_SIZE', 'HEDGES',
+           'ADMISSION_IN_FLIGHT', 'ADMISSION_QUEUED', 'ADMISSION_REJECTED', 'ADMISSION_WAIT_SECONDS']
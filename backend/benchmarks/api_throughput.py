@@ -0,0 +1,276 @@
+"""
+API Throughput Benchmark
+Starts one uvicorn worker against a scratch database and the simulated
+provider, then drives POST /api/experiments and GET /api/experiments at
+increasing concurrency. For every level it reports throughput, latency
+percentiles, errors, requests shed with 503 by admission control, event
+loop lag and server memory.
+
+Usage (from the backend directory):
+    python -m benchmarks.api_throughput
+    python -m benchmarks.api_throughput --concurrency 1,8,32 --duration 5
+    python -m benchmarks.api_throughput --output run.json
+    python -m benchmarks.api_throughput --baseline run.json --max-regression 0.2
+
+With --baseline, the run exits non-zero when any level's throughput drops,
+or its p99 latency rises, by more than --max-regression compared to the
+baseline file.
+
+The simulated provider is configured with the usual SIMULATED_* variables,
+which are passed through to the server.
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of `values`"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$')
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Flatten Prometheus text output into {name{labels}: value}"""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return samples
+
+def loop_lag(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """Mean and p99 (bucket upper bound) of the event loop lag observed between two scrapes"""
+    count = after.get("event_loop_lag_seconds_count", 0) - before.get("event_loop_lag_seconds_count", 0)
+    if count <= 0:
+        return {"mean": None, "p99": None}
+    total = after.get("event_loop_lag_seconds_sum", 0) - before.get("event_loop_lag_seconds_sum", 0)
+    buckets = sorted(
+        (float(re.search(r'le="([^"]+)"', key).group(1)), after[key] - before.get(key, 0))
+        for key in after if key.startswith("event_loop_lag_seconds_bucket")
+    )
+    p99 = next((bound for bound, cumulative in buckets if cumulative >= 0.99 * count), None)
+    return {"mean": total / count * 1000, "p99": p99 * 1000 if p99 is not None else None}
+
+class Server:
+    """One uvicorn worker serving the app from a scratch directory"""
+    def __init__(self, workdir: str, port: int, env: Dict[str, str]):
+        self.url = f"http://127.0.0.1:{port}"
+        server_env = {
+            **os.environ,
+            "DATABASE_FILE": os.path.join(workdir, "bench.db"),
+            "RESPONSE_CACHE_PATH": os.path.join(workdir, "response_cache.db"),
+            "SIMULATED_PROVIDER_ENABLED": "true",
+            **env,
+        }
+        # Request logging would swamp the report, so the server logs to a file
+        self.log_path = os.path.join(workdir, "server.log")
+        self.log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=server_env,
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+
+    def log_tail(self, lines: int = 20) -> str:
+        with open(self.log_path) as f:
+            return "".join(f.readlines()[-lines:])
+
+    async def wait_ready(self, session: aiohttp.ClientSession, timeout: float = 30) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}:\n{self.log_tail()}")
+            try:
+                async with session.get(f"{self.url}/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("Server did not start in time")
+
+    async def metrics(self, session: aiohttp.ClientSession) -> Dict[str, float]:
+        async with session.get(f"{self.url}/metrics") as response:
+            return parse_metrics(await response.text())
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+async def run_level(
+    server: Server,
+    session: aiohttp.ClientSession,
+    scenario: str,
+    concurrency: int,
+    duration: float,
+    models: List[str]
+) -> Dict[str, Any]:
+    """Keep `concurrency` requests in flight for `duration` seconds"""
+    latencies: List[float] = []
+    errors = 0
+    shed = 0
+    peak_rss = 0.0
+    deadline = time.monotonic() + duration
+
+    async def worker(worker_id: int) -> None:
+        nonlocal errors, shed
+        sequence = 0
+        while time.monotonic() < deadline:
+            sequence += 1
+            start = time.perf_counter()
+            try:
+                if scenario == "create":
+                    # Unique prompts, so neither the cache nor coalescing helps
+                    body = {
+                        "prompt": f"Benchmark prompt {concurrency}-{worker_id}-{sequence}: explain the result.",
+                        "models": models,
+                    }
+                    request = session.post(f"{server.url}/api/experiments", json=body)
+                else:
+                    request = session.get(f"{server.url}/api/experiments", params={"limit": "20"})
+                async with request as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            elif status == 503:
+                shed += 1
+            else:
+                errors += 1
+
+    async def watch_memory() -> None:
+        nonlocal peak_rss
+        while True:
+            samples = await server.metrics(session)
+            peak_rss = max(peak_rss, samples.get("process_resident_memory_bytes", 0))
+            await asyncio.sleep(0.5)
+
+    before = await server.metrics(session)
+    watcher = asyncio.create_task(watch_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    watcher.cancel()
+    after = await server.metrics(session)
+
+    lag = loop_lag(before, after)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "shed": shed,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "loopLagMean": lag["mean"],
+        "loopLagP99": lag["p99"],
+        "peakRssMb": peak_rss / 2 ** 20 if peak_rss else None,
+    }
+
+def _fmt(value: Optional[float], digits: int = 1) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<8} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'shed':>6} {'lag ms':>7} {'lag p99':>7} {'rss MB':>7}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['scenario']:<8} {result['concurrency']:>5} {_fmt(result['throughput']):>8} "
+            f"{_fmt(result['p50']):>8} {_fmt(result['p95']):>8} {_fmt(result['p99']):>8} "
+            f"{result['errors']:>6} {result.get('shed', 0):>6} {_fmt(result['loopLagMean'], 2):>7} {_fmt(result['loopLagP99'], 1):>7} "
+            f"{_fmt(result['peakRssMb']):>7}"
+        )
+
+def find_regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Levels whose throughput fell, or p99 rose, by more than `tolerance`"""
+    previous = {(item["scenario"], item["concurrency"]): item for item in baseline}
+    problems = []
+    for result in results:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        label = f"{result['scenario']} @ {result['concurrency']}"
+        if old["throughput"] and result["throughput"] < old["throughput"] * (1 - tolerance):
+            problems.append(f"{label}: throughput {old['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+        if old["p99"] and result["p99"] and result["p99"] > old["p99"] * (1 + tolerance):
+            problems.append(f"{label}: p99 {old['p99']:.1f} -> {result['p99']:.1f} ms")
+    return problems
+
+async def main(args: argparse.Namespace) -> int:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    models = args.models.split(",")
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {"SIMULATED_LATENCY_MS": str(args.latency_ms)} if args.latency_ms is not None else {}
+        server = Server(workdir, args.port or free_port(), env)
+        try:
+            connector = aiohttp.TCPConnector(limit=0)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                await server.wait_ready(session)
+                # Create first so the listing runs against a populated table
+                for scenario in ("create", "list"):
+                    for concurrency in levels:
+                        result = await run_level(server, session, scenario, concurrency, args.duration, models)
+                        results.append(result)
+                        print(f"  {scenario} @ {concurrency}: {result['throughput']:.1f} req/s", file=sys.stderr)
+        finally:
+            server.stop()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = find_regressions(results, json.load(f), args.max_regression)
+        if problems:
+            print("\nRegressions against baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--models", default="simulated", help="Comma-separated models per experiment")
+    parser.add_argument("--latency-ms", type=float, help="Simulated provider latency (default: SIMULATED_LATENCY_MS)")
+    parser.add_argument("--port", type=int, default=0, help="Server port (default: any free port)")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="Compare against results from an earlier --output")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed fractional slowdown")
+    sys.exit(asyncio.run(main(parser.parse_args())))
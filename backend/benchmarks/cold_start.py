@@ -0,0 +1,111 @@
+"""
+Cold Start Benchmark
+Measures how quickly a fresh worker can serve traffic:
+    import: time to import main (run in a fresh interpreter each time)
+    ready: process start until GET / answers
+    first experiment: process start until the first POST /api/experiments
+        against the simulated provider completes, which includes building
+        the services on first use
+
+Provider API keys are removed from the environment, so every run also checks
+that the app starts without credentials.
+
+Usage (from the backend directory):
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 10 --output cold.json
+"""
+
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+from benchmarks.api_throughput import BACKEND_DIR, Server, free_port
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+def _clean_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    for name in ("GROQ_API_KEY", "HUGGING_FACE_API_KEY"):
+        env.pop(name, None)
+    return env
+
+def measure_import(workdir: str) -> float:
+    """Seconds to import main in a fresh interpreter"""
+    env = {**_clean_env(), "DATABASE_FILE": os.path.join(workdir, "import.db")}
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+async def measure_startup(workdir: str) -> Dict[str, float]:
+    """Seconds from spawning uvicorn to ready, and to the first served experiment"""
+    # Server() copies os.environ, so drop the keys for the duration of the spawn
+    saved = {name: os.environ.pop(name) for name in ("GROQ_API_KEY", "HUGGING_FACE_API_KEY") if name in os.environ}
+    try:
+        started = time.perf_counter()
+        server = Server(workdir, free_port(), {"SIMULATED_LATENCY_MS": "0", "SIMULATED_TOKEN_INTERVAL_MS": "0"})
+    finally:
+        os.environ.update(saved)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await server.wait_ready(session)
+            ready = time.perf_counter() - started
+            body = {"prompt": "Cold start check: explain the result.", "models": ["simulated"]}
+            async with session.post(f"{server.url}/api/experiments", json=body) as response:
+                await response.read()
+                if response.status != 200:
+                    raise RuntimeError(f"First experiment failed with HTTP {response.status}:\n{server.log_tail()}")
+            first_experiment = time.perf_counter() - started
+    finally:
+        server.stop()
+    return {"ready": ready, "firstExperiment": first_experiment}
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(values) * 1000,
+        "median": statistics.median(values) * 1000,
+        "max": max(values) * 1000,
+    }
+
+async def main(args: argparse.Namespace) -> int:
+    imports, readies, firsts = [], [], []
+    for run in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            imports.append(measure_import(workdir))
+            startup = await measure_startup(workdir)
+        readies.append(startup["ready"])
+        firsts.append(startup["firstExperiment"])
+        print(f"  run {run + 1}: import {imports[-1] * 1000:.0f} ms, ready {readies[-1] * 1000:.0f} ms, "
+              f"first experiment {firsts[-1] * 1000:.0f} ms", file=sys.stderr)
+
+    results: Dict[str, Any] = {
+        "import": summarize(imports),
+        "ready": summarize(readies),
+        "firstExperiment": summarize(firsts),
+    }
+    print(f"{'stage':<18} {'min ms':>8} {'median ms':>10} {'max ms':>8}")
+    for stage, stats in results.items():
+        print(f"{stage:<18} {stats['min']:>8.0f} {stats['median']:>10.0f} {stats['max']:>8.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument("--output", help="Write results as JSON")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,159 @@
+"""
+Serialization Benchmark
+Measures server CPU time per request for the experiment read endpoints,
+where response encoding dominates:
+    list: GET /api/experiments?limit=100
+    detail: GET /api/experiments/{id}
+each with no compression, gzip and brotli. The server is seeded through
+the import endpoint with experiments carrying several models and long
+responses, and requests are sent one at a time so the CPU counter
+(process_cpu_seconds_total) divides cleanly by the request count.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --experiments 2000 --requests 300 --output after.json
+    python -m benchmarks.serialization --baseline before.json
+
+Run it against two checkouts with --output and --baseline to compare CPU
+per request before and after a change.
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+import aiohttp
+from benchmarks.api_throughput import Server, free_port, percentile
+
+ENCODINGS = ("identity", "gzip", "br")
+WORDS = ("the", "model", "answer", "because", "therefore", "example", "data", "result", "shows", "value")
+
+def _experiment(index: int, models: int, response_words: int) -> Dict[str, Any]:
+    rng = random.Random(index)
+    names = [f"model-{number}" for number in range(models)]
+    return {
+        "prompt": f"Benchmark prompt {index}: explain the result in detail.",
+        "system_prompt": "You are a careful assistant.",
+        "models": names,
+        "responses": json.dumps([
+            {
+                "model": name,
+                "response": " ".join(rng.choice(WORDS) for _ in range(response_words)),
+                "metrics": {
+                    "accuracy": rng.randint(50, 100),
+                    "relevancy": rng.randint(50, 100),
+                    "responseTime": round(rng.uniform(100, 2000), 2),
+                    "phases": {"slotWait": 0.01, "timeToFirstByte": round(rng.uniform(50, 500), 2), "bodyRead": 1.2, "scoring": 0.3},
+                    "usage": {"promptTokens": 40, "completionTokens": response_words, "totalTokens": 40 + response_words},
+                },
+            }
+            for name in names
+        ]),
+    }
+
+async def seed(server: Server, session: aiohttp.ClientSession, experiments: int, models: int, response_words: int) -> None:
+    body = "".join(json.dumps(_experiment(index, models, response_words)) + "\n" for index in range(experiments))
+    form = aiohttp.FormData()
+    form.add_field("file", body.encode("utf-8"), filename="seed.ndjson", content_type="application/x-ndjson")
+    async with session.post(f"{server.url}/api/experiments/import", data=form) as response:
+        if response.status != 200:
+            raise RuntimeError(f"Seeding failed: {response.status} {await response.text()}")
+
+async def cpu_seconds(server: Server) -> float:
+    # Its own session: the benchmark's doesn't decompress, and /metrics may be compressed
+    async with aiohttp.ClientSession() as session:
+        return (await server.metrics(session))["process_cpu_seconds_total"]
+
+async def run_scenario(
+    server: Server,
+    session: aiohttp.ClientSession,
+    scenario: str,
+    encoding: str,
+    requests: int,
+    experiments: int
+) -> Dict[str, Any]:
+    """Send `requests` requests one after another and report CPU and wire size per request"""
+    rng = random.Random(0)
+    latencies: List[float] = []
+    sizes: List[int] = []
+    before = await cpu_seconds(server)
+    for _ in range(requests):
+        if scenario == "list":
+            url, params = f"{server.url}/api/experiments", {"limit": "100"}
+        else:
+            url, params = f"{server.url}/api/experiments/{rng.randint(1, experiments)}", None
+        start = time.perf_counter()
+        async with session.get(url, params=params, headers={"Accept-Encoding": encoding}) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"{scenario} failed: {response.status}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(body))
+    after = await cpu_seconds(server)
+    return {
+        "scenario": scenario,
+        "encoding": encoding,
+        "requests": requests,
+        "cpuMsPerRequest": (after - before) / requests * 1000,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "kbPerResponse": sum(sizes) / len(sizes) / 1024,
+    }
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[List[Dict[str, Any]]] = None) -> None:
+    previous = {(result["scenario"], result["encoding"]): result for result in baseline or []}
+    header = f"{'scenario':<8} {'encoding':<9} {'cpu ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'KB':>8}"
+    if baseline:
+        header += f" {'cpu before':>10} {'change':>8}"
+    print(header)
+    for result in results:
+        line = (
+            f"{result['scenario']:<8} {result['encoding']:<9} {result['cpuMsPerRequest']:>8.2f} "
+            f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['kbPerResponse']:>8.1f}"
+        )
+        before = previous.get((result["scenario"], result["encoding"]))
+        if before:
+            change = result["cpuMsPerRequest"] / before["cpuMsPerRequest"] - 1
+            line += f" {before['cpuMsPerRequest']:>10.2f} {change:>+8.0%}"
+        print(line)
+
+async def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        server = Server(workdir, free_port(), {})
+        try:
+            # Read raw bytes, so the client measures what went over the wire
+            async with aiohttp.ClientSession(auto_decompress=False, timeout=aiohttp.ClientTimeout(total=300)) as session:
+                await server.wait_ready(session)
+                await seed(server, session, args.experiments, args.models, args.response_words)
+                for scenario in ("list", "detail"):
+                    for encoding in ENCODINGS:
+                        # Warm up (imports, caches) before measuring
+                        await run_scenario(server, session, scenario, encoding, 5, args.experiments)
+                        results.append(await run_scenario(server, session, scenario, encoding, args.requests, args.experiments))
+        finally:
+            server.stop()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure server CPU per request for experiment reads")
+    parser.add_argument("--experiments", type=int, default=1000, help="Experiments to seed")
+    parser.add_argument("--models", type=int, default=4, help="Models per experiment")
+    parser.add_argument("--response-words", type=int, default=200, help="Words per model response")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and encoding")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare CPU per request with an earlier --output file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -2,46 +2,86 @@
 Main Application Entry Point
 """
 
+from dotenv import load_dotenv
+
+# Read .env before any app module reads its settings from the environment
+load_dotenv()
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.api.endpoints import router
-from app.db import init_db 
-from app.db.database import engine
-from app.db.models import Base, Experiment 
+from app.api.dependencies import close_services, get_admission_controller, resume_jobs
+from app.core.admission import AdmissionMiddleware
+from app.core.compression import CompressionMiddleware
+from app.db import init_db, engine, SessionLocal
+from app.services import storage
+from app.services.telemetry import monitor_event_loop
 import uvicorn
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import Dict, Any
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create FastAPI app
-app = FastAPI(title="LLM Evaluation Platform")
-
-# Ensure database directory exists
-db_dir = os.path.dirname(os.path.abspath(__file__))
-logger.info(f"Database directory: {db_dir}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: create/migrate the database, start sampling event loop lag,
+    start archiving old experiments if ARCHIVE_AFTER_DAYS is set, and resume
+    any evaluation jobs left unfinished. Services (LLM clients, connection
+    pools, caches, job workers) are otherwise built on first use.
+    Shutdown: stop those tasks, close whichever services were built
+    (requeuing running jobs) and the database engine.
+    """
+    try:
+        await init_db()
+    except Exception as e:
+        error_details = {
+            "error_type": type(e).__name__,
+            "error_message": str(e),
+            "suggestion": "Check database connection and permissions"
+        }
+        logger.error(f"Database initialization details: {error_details}")
+        raise RuntimeError(f"Failed to initialize database: {str(e)}") from e
+    
+    loop_monitor = asyncio.create_task(
+        monitor_event_loop(float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.1")))
+    )
+    background = [loop_monitor]
+    archive_after_days = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+    if archive_after_days > 0:
+        background.append(asyncio.create_task(storage.enforce_retention(
+            SessionLocal, archive_after_days, float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24")) * 3600
+        )))
+    await resume_jobs()
+    yield
+    for task in background:
+        task.cancel()
+    await close_services()
+    await engine.dispose()
 
-# Initialize database during startup
-init_db()
+# Create FastAPI app; responses are encoded with orjson
+app = FastAPI(title="LLM Evaluation Platform", lifespan=lifespan, default_response_class=ORJSONResponse)
 
-# Create database tables
-logger.info("Creating database tables...")
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("✓ Database tables created successfully")
-except Exception as e:
-    logger.error(f"Database initialization error: {str(e)}", exc_info=True)
-    error_details = {
-        "error_type": type(e).__name__,
-        "error_message": str(e),
-        "suggestion": "Check database connection and permissions"
-    }
-    logger.error(f"Database initialization details: {error_details}")
-    raise RuntimeError(f"Failed to initialize database: {str(e)}") from e
+# Bound the experiment requests running at once; the rest wait briefly, by
+# priority, or are turned away with 503. Added before CORS so browsers can
+# read the 503
+if int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")) > 0:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=get_admission_controller(),
+        routes={
+            ("POST", "/api/experiments"): "interactive",
+            ("POST", "/api/experiments/stream"): "interactive",
+            ("POST", "/api/experiments/batch"): "batch",
+        }
+    )
 
 # Configure CORS
 app.add_middleware(
@@ -52,6 +92,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON and NDJSON responses (brotli or gzip)
+if os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true":
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024")),
+        gzip_level=int(os.getenv("GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("BROTLI_QUALITY", "4"))
+    )
+
 # Add root endpoint
 @app.get("/")
 async def root():
@@ -60,6 +109,11 @@ async def root():
         "message": "LLM Evaluation Platform API is running",
     })
 
+# Prometheus scrape endpoint: model call counts, phase latencies and token usage
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
 # Include router with /api prefix
 app.include_router(router, prefix="/api")
 
@@ -0,0 +1,59 @@
+"""
+Storage Maintenance Entry Point
+Manages how response text is stored, against the same database as the API:
+    python maintenance.py train-dictionary --samples 5000
+    python maintenance.py compress --vacuum
+    python maintenance.py archive --older-than-days 90
+train-dictionary trains a zstd dictionary on recent responses and makes it
+current; compress rewrites responses that are plain text or use an older
+dictionary; archive moves old experiments' response text to archive files.
+--vacuum returns the space freed to the filesystem afterwards.
+"""
+
+from dotenv import load_dotenv
+
+# Read .env before any app module reads its settings from the environment
+load_dotenv()
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from app.db import SessionLocal, engine, init_db
+from app.services import storage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(args: argparse.Namespace) -> None:
+    await init_db()
+    if args.command == "train-dictionary":
+        result = await storage.train_dictionary(SessionLocal, samples=args.samples)
+        logger.info(f"Dictionary {result['id']}: {result['bytes']} bytes from {result['samples']} responses")
+    elif args.command == "compress":
+        await storage.recompress(SessionLocal, chunk_size=args.chunk_size)
+    elif args.command == "archive":
+        cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+        await storage.archive_experiments(SessionLocal, cutoff, chunk_size=args.chunk_size)
+    if args.vacuum:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM"))
+        logger.info("Vacuumed the database")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain stored response text")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train-dictionary", help="Train a compression dictionary on recent responses")
+    train.add_argument("--samples", type=int, default=5000, help="Most recent responses to train on")
+    compress = commands.add_parser("compress", help="Compress responses with the current dictionary")
+    compress.add_argument("--chunk-size", type=int, default=1000, help="Responses rewritten per commit")
+    archive = commands.add_parser("archive", help="Move old experiments' response text to an archive file")
+    archive.add_argument("--older-than-days", type=int, required=True, help="Archive experiments created before this many days ago")
+    archive.add_argument("--chunk-size", type=int, default=500, help="Experiments archived per commit")
+    for command in (train, compress, archive):
+        command.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,37 @@
+"""
+Shared test setup. The app reads its configuration from the environment,
+some of it at import, so a scratch database and the simulated provider are
+configured here before any test imports from app.
+"""
+
+import os
+import tempfile
+
+_scratch_dir = tempfile.mkdtemp(prefix="llm-eval-tests-")
+os.environ.update({
+    "DATABASE_FILE": os.path.join(_scratch_dir, "test.db"),
+    "RESPONSE_CACHE_ENABLED": "false",
+    "SIMULATED_PROVIDER_ENABLED": "true",
+    "SIMULATED_LATENCY_DISTRIBUTION": "fixed",
+    "SIMULATED_LATENCY_MS": "10",
+    "SIMULATED_TOKEN_INTERVAL_MS": "0",
+})
+
+import pytest
+from app.db import engine, init_db
+from app.services.llm_service import LLMService
+
+@pytest.fixture
+async def service():
+    """An LLMService built from the test environment"""
+    llm_service = LLMService()
+    yield llm_service
+    await llm_service.close()
+
+@pytest.fixture
+async def database():
+    """The scratch database, created and migrated"""
+    await init_db()
+    yield
+    # Connections belong to this test's event loop
+    await engine.dispose()
@@ -0,0 +1,175 @@
+"""Admission control: priorities, shedding, queue limits and timeouts (see app/core/admission.py)"""
+
+import asyncio
+import json
+import pytest
+from app.core.admission import AdmissionController, AdmissionMiddleware
+from app.core.exceptions import OverloadedError
+
+async def _wait_until(condition, timeout=1.0):
+    """Let the event loop run until `condition()` holds"""
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(poll(), timeout)
+
+class Requests:
+    """Runs requests through a controller, recording what happened to each"""
+    def __init__(self, controller):
+        self.controller = controller
+        self.outcomes = {}
+        self.admitted = []
+        self.tasks = {}
+        self.done = {}
+
+    async def _run(self, name, priority):
+        try:
+            await self.controller.acquire(priority)
+        except OverloadedError as e:
+            self.outcomes[name] = e
+            return
+        self.outcomes[name] = "admitted"
+        self.admitted.append(name)
+        try:
+            await self.done[name].wait()
+        finally:
+            self.controller.release(0.05)
+
+    async def start(self, name, priority):
+        """Send a request and wait until it's admitted, queued or rejected"""
+        queued = self.controller.stats["queued"]
+        self.done[name] = asyncio.Event()
+        self.tasks[name] = asyncio.create_task(self._run(name, priority))
+        await _wait_until(lambda: name in self.outcomes or self.controller.stats["queued"] > queued)
+
+    async def finish(self, name, then_admitted):
+        """End an admitted request and wait for the slot to go to `then_admitted`"""
+        self.done[name].set()
+        await _wait_until(lambda: then_admitted in self.admitted)
+
+    async def close(self):
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.wait_for(asyncio.gather(*self.tasks.values(), return_exceptions=True), 5.0)
+
+@pytest.fixture
+async def requests():
+    runner = Requests(AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1.0))
+    yield runner
+    await runner.close()
+
+async def test_interactive_requests_go_ahead_of_batch(requests):
+    await requests.start("running", "batch")
+    await requests.start("batch", "batch")
+    await requests.start("interactive", "interactive")
+    assert requests.controller.snapshot()["waiting"] == {"interactive": 1, "batch": 1}
+
+    await requests.finish("running", then_admitted="interactive")
+    assert requests.admitted == ["running", "interactive"]
+    await requests.finish("interactive", then_admitted="batch")
+    assert requests.admitted == ["running", "interactive", "batch"]
+
+async def test_full_queue_sheds_batch_for_interactive(requests):
+    await requests.start("running", "batch")
+    await requests.start("batch-1", "batch")
+    await requests.start("batch-2", "batch")
+    await requests.start("interactive", "interactive")
+    await _wait_until(lambda: "batch-2" in requests.outcomes)
+
+    # The most recent of the lowest class makes room
+    shed = requests.outcomes["batch-2"]
+    assert isinstance(shed, OverloadedError)
+    assert shed.status_code == 503
+    assert shed.detail == "Server overloaded: made room for a higher-priority request"
+    assert "batch-1" not in requests.outcomes
+    snapshot = requests.controller.snapshot()
+    assert snapshot["waiting"] == {"interactive": 1, "batch": 1}
+    assert snapshot["shed"] == 1
+
+    await requests.finish("running", then_admitted="interactive")
+    await requests.finish("interactive", then_admitted="batch-1")
+
+async def test_full_queue_rejects_requests_that_outrank_no_one(requests):
+    await requests.start("running", "interactive")
+    await requests.start("interactive-1", "interactive")
+    await requests.start("interactive-2", "interactive")
+    await requests.start("interactive-3", "interactive")
+    await requests.start("batch", "batch")
+
+    for name in ("interactive-3", "batch"):
+        rejected = requests.outcomes[name]
+        assert isinstance(rejected, OverloadedError)
+        assert rejected.detail == "Server overloaded: too many requests waiting"
+        assert int(rejected.headers["Retry-After"]) >= 1
+    snapshot = requests.controller.snapshot()
+    assert snapshot["queueFull"] == 2
+    assert snapshot["waiting"] == {"interactive": 2, "batch": 0}
+
+async def test_request_waiting_past_the_timeout_is_rejected():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=0.05)
+    await controller.acquire("interactive")
+
+    with pytest.raises(OverloadedError, match="no slot within"):
+        await controller.acquire("batch")
+    snapshot = controller.snapshot()
+    assert snapshot["timedOut"] == 1
+    assert snapshot["waiting"] == {"interactive": 0, "batch": 0}
+
+    # The slot it gave up on goes to the next request instead
+    controller.release()
+    await controller.acquire("batch")
+    assert controller.in_flight == 1
+
+async def test_cancelled_waiter_leaves_the_queue(requests):
+    await requests.start("running", "batch")
+    await requests.start("leaving", "batch")
+    await requests.start("staying", "batch")
+
+    requests.tasks["leaving"].cancel()
+    await _wait_until(lambda: requests.controller.snapshot()["waiting"]["batch"] == 1)
+    assert "leaving" not in requests.outcomes
+
+    await requests.finish("running", then_admitted="staying")
+    assert requests.admitted == ["running", "staying"]
+    assert requests.controller.in_flight == 1
+
+async def _call(app, method, path):
+    """Send one request through an ASGI app; returns the status and headers"""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+    await app(scope, receive, send)
+    start, body = sent[0], b"".join(message.get("body", b"") for message in sent[1:])
+    return start["status"], dict((k.decode(), v.decode()) for k, v in start["headers"]), body
+
+async def test_middleware_admits_listed_routes_and_rejects_with_503():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=1.0)
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/slow":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    middleware = AdmissionMiddleware(app, controller, {("POST", "/slow"): "interactive", ("POST", "/run"): "batch"})
+
+    slow = asyncio.create_task(_call(middleware, "POST", "/slow"))
+    try:
+        await _wait_until(lambda: controller.in_flight == 1)
+
+        status, headers, body = await _call(middleware, "POST", "/run")
+        assert status == 503
+        assert int(headers["retry-after"]) >= 1
+        assert json.loads(body) == {"detail": "Server overloaded: too many requests waiting"}
+
+        # Routes that aren't listed bypass admission
+        assert (await _call(middleware, "GET", "/run"))[0] == 200
+    finally:
+        release.set()
+    assert (await asyncio.wait_for(slow, 5.0))[0] == 200
+    assert controller.in_flight == 0
@@ -0,0 +1,88 @@
+"""Concurrent identical requests share one upstream call (see LLMService._fetch)"""
+
+import asyncio
+import pytest
+
+class GatedProvider:
+    """Stands in for the simulated provider: each call waits until opened"""
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.gate = asyncio.Event()
+
+    async def query(self, prompt, system_prompt, model, trace):
+        self.calls += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        trace.set_usage(3, 5)
+        return f"answer to {prompt}"
+
+@pytest.fixture
+def provider(service, monkeypatch):
+    gated = GatedProvider()
+    monkeypatch.setattr(service, "_query_simulated", gated.query)
+    return gated
+
+async def _start(service, count, prompt="Explain gravity"):
+    tasks = [asyncio.create_task(service.get_response(prompt, "", "simulated")) for _ in range(count)]
+    await asyncio.sleep(0.02)
+    return tasks
+
+async def test_identical_requests_share_one_call(service, provider):
+    tasks = await _start(service, 3)
+    call, = service._inflight.values()
+    assert call.waiters == 3
+    assert provider.calls == 1
+
+    provider.gate.set()
+    assert await asyncio.gather(*tasks) == ["answer to Explain gravity"] * 3
+    assert provider.calls == 1
+    assert service._inflight == {}
+
+async def test_call_survives_one_waiter_leaving(service, provider):
+    tasks = await _start(service, 3)
+    call, = service._inflight.values()
+
+    tasks[0].cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await tasks[0]
+    assert call.waiters == 2
+    assert not call.task.done()
+    assert provider.cancelled == 0
+
+    provider.gate.set()
+    assert await asyncio.gather(*tasks[1:]) == ["answer to Explain gravity"] * 2
+    assert provider.calls == 1
+    assert service._inflight == {}
+
+async def test_call_cancelled_once_every_waiter_leaves(service, provider):
+    tasks = await _start(service, 2)
+    call, = service._inflight.values()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert call.task.cancelled()
+    assert provider.cancelled == 1
+    assert service._inflight == {}
+
+    # The next identical request makes a fresh call rather than joining the dead one
+    provider.gate.set()
+    assert await service.get_response("Explain gravity", "", "simulated") == "answer to Explain gravity"
+    assert provider.calls == 2
+
+async def test_waiter_past_its_deadline_leaves_the_call_to_others(service, provider):
+    patient = asyncio.create_task(service.get_response("Explain gravity", "", "simulated"))
+    await asyncio.sleep(0.01)
+    impatient = await service.evaluate_model("Explain gravity", "", "simulated", deadline=service.deadline_after(20))
+    assert impatient["timedOut"] and impatient["error"]
+
+    call, = service._inflight.values()
+    assert call.waiters == 1
+    provider.gate.set()
+    assert await patient == "answer to Explain gravity"
+    assert provider.calls == 1
@@ -0,0 +1,145 @@
+"""Experiment deadlines and hedged model calls (see LLMService.run_experiment and _hedged)"""
+
+import asyncio
+import time
+import pytest
+from prometheus_client import REGISTRY
+from app.services.llm_service import LLMService
+from app.services.telemetry import CallTrace
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, {"provider": "simulated", **labels}) or 0
+
+class Counts:
+    """Metric deltas for one model since this was created"""
+    def __init__(self, model):
+        self.model = model
+        self.before = self._read()
+
+    def _read(self):
+        return {
+            **{status: _sample("llm_requests_total", model=self.model, status=status)
+               for status in ("ok", "error", "cancelled")},
+            "promptTokens": _sample("llm_tokens_total", model=self.model, kind="prompt"),
+            "hedgesSent": _sample("llm_hedged_requests_total", model=self.model, outcome="sent"),
+            "hedgesWon": _sample("llm_hedged_requests_total", model=self.model, outcome="won"),
+        }
+
+    def delta(self):
+        return {key: value - self.before[key] for key, value in self._read().items()}
+
+class ScriptedProvider:
+    """Stands in for the simulated provider; each call takes the next scripted delay"""
+    def __init__(self, delays=(), default=0.01):
+        self.delays = list(delays)
+        self.default = default
+        self.cancelled = 0
+
+    async def query(self, prompt, system_prompt, model, trace):
+        delay = self.delays.pop(0) if self.delays else self.default
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        trace.set_usage(3, 7)
+        return f"answer after {delay}s"
+
+@pytest.fixture
+async def hedging_service(monkeypatch):
+    """A service that hedges every simulated call still sending after 50ms"""
+    monkeypatch.setenv("HEDGE_REQUESTS_ENABLED", "true")
+    llm_service = LLMService()
+    monkeypatch.setattr(llm_service.hedging, "delay", lambda model: 0.05)
+    monkeypatch.setattr(llm_service.hedging, "allow", lambda model: True)
+    yield llm_service
+    await llm_service.close()
+
+async def test_deadline_keeps_finished_models_and_times_out_the_rest(service, monkeypatch):
+    service.models["simulated-slow"] = {"provider": "simulated", "model": "simulated-slow"}
+    cancelled = []
+
+    async def query(prompt, system_prompt, model, trace):
+        try:
+            await asyncio.sleep(5 if model == "simulated-slow" else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        return f"{model} answered"
+    monkeypatch.setattr(service, "_query_simulated", query)
+    slow = Counts("simulated-slow")
+
+    started = time.perf_counter()
+    fast_entry, slow_entry = await service.run_experiment(
+        "Explain gravity", "", ["simulated", "simulated-slow"], use_cache=False, deadline_ms=100
+    )
+    assert time.perf_counter() - started < 1
+
+    assert fast_entry["response"] == "simulated-v1 answered"
+    assert "error" not in fast_entry and "timedOut" not in fast_entry
+    assert slow_entry["model"] == "simulated-slow"
+    assert slow_entry["error"] and slow_entry["timedOut"]
+
+    # The late call is cancelled, not left running
+    await asyncio.sleep(0.01)
+    assert cancelled == ["simulated-slow"]
+    assert slow.delta()["cancelled"] == 1
+    assert service._inflight == {}
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+async def test_hedge_that_wins_is_counted_once(hedging_service, monkeypatch):
+    provider = ScriptedProvider([0.5, 0.01])
+    monkeypatch.setattr(hedging_service, "_query_simulated", provider.query)
+    counts = Counts("simulated")
+
+    entry = await hedging_service.evaluate_model("Explain gravity", "", "simulated", use_cache=False)
+
+    assert entry["response"] == "answer after 0.01s"
+    assert entry["metrics"]["hedged"] == "hedge"
+    assert entry["metrics"]["usage"]["promptTokens"] == 3
+    assert provider.cancelled == 1
+    assert counts.delta() == {
+        "ok": 1, "error": 0, "cancelled": 1, "promptTokens": 3, "hedgesSent": 1, "hedgesWon": 1
+    }
+
+async def test_primary_that_wins_cancels_the_hedge(hedging_service, monkeypatch):
+    provider = ScriptedProvider([0.1, 0.5])
+    monkeypatch.setattr(hedging_service, "_query_simulated", provider.query)
+    counts = Counts("simulated")
+
+    entry = await hedging_service.evaluate_model("Explain gravity", "", "simulated", use_cache=False)
+
+    assert entry["response"] == "answer after 0.1s"
+    assert entry["metrics"]["hedged"] == "primary"
+    assert provider.cancelled == 1
+    assert counts.delta() == {
+        "ok": 1, "error": 0, "cancelled": 1, "promptTokens": 3, "hedgesSent": 1, "hedgesWon": 0
+    }
+
+async def test_fast_call_is_not_hedged(hedging_service, monkeypatch):
+    monkeypatch.setattr(hedging_service, "_query_simulated", ScriptedProvider().query)
+    counts = Counts("simulated")
+
+    entry = await hedging_service.evaluate_model("Explain gravity", "", "simulated", use_cache=False)
+
+    assert "hedged" not in entry["metrics"]
+    assert counts.delta()["hedgesSent"] == 0
+
+async def test_call_waiting_for_a_provider_slot_is_not_hedged(hedging_service, monkeypatch):
+    # One slot, held by another call for longer than the hedge delay
+    provider = ScriptedProvider([0.3, 0.01])
+    monkeypatch.setattr(hedging_service, "_query_simulated", provider.query)
+    hedging_service._semaphores["simulated"] = asyncio.Semaphore(1)
+    holder = asyncio.create_task(
+        hedging_service._attempt("Other prompt", "", "simulated", CallTrace("simulated", "simulated"))
+    )
+    await asyncio.sleep(0.01)
+    counts = Counts("simulated")
+
+    entry = await hedging_service.evaluate_model("Explain gravity", "", "simulated", use_cache=False)
+    await holder
+
+    assert entry["response"] == "answer after 0.01s"
+    assert "hedged" not in entry["metrics"]
+    assert entry["metrics"]["phases"]["slotWait"] > 200
+    assert counts.delta()["hedgesSent"] == 0
@@ -0,0 +1,168 @@
+"""Job leases, heartbeats and resuming after a worker dies (see app/services/jobs.py)"""
+
+from datetime import timedelta
+import asyncio
+import pytest
+from sqlalchemy import delete, update
+from app.db import crud
+from app.db.database import SessionLocal
+from app.db.models import EvaluationJob
+from app.services import jobs
+from app.services.jobs import JobQueue
+
+def _queue(service, workers=0, lease_seconds=30.0, max_attempts=3):
+    return JobQueue(
+        service,
+        SessionLocal,
+        workers=workers,
+        poll_interval=0.05,
+        lease_seconds=lease_seconds,
+        max_attempts=max_attempts
+    )
+
+async def _job(job_id):
+    async with SessionLocal() as db:
+        return await jobs.get_job(db, job_id)
+
+async def _set(job_id, **values):
+    async with SessionLocal() as db:
+        await db.execute(update(EvaluationJob).where(EvaluationJob.id == job_id).values(**values))
+        await db.commit()
+
+async def _wait_for(job_id, status, timeout=5.0):
+    async def poll():
+        while (job := await _job(job_id)).status != status:
+            await asyncio.sleep(0.02)
+        return job
+    return await asyncio.wait_for(poll(), timeout)
+
+@pytest.fixture(autouse=True)
+async def empty_queue(database):
+    async with SessionLocal() as db:
+        await db.execute(delete(EvaluationJob))
+        await db.commit()
+
+@pytest.fixture
+def calls(service, monkeypatch):
+    """Models called through the simulated provider, which gains a second model"""
+    service.models["simulated-b"] = {"provider": "simulated", "model": "simulated-b"}
+    made = []
+
+    async def query(prompt, system_prompt, model, trace):
+        made.append(model)
+        return f"{model} says hi"
+    monkeypatch.setattr(service, "_query_simulated", query)
+    return made
+
+async def test_each_job_is_claimed_by_one_worker(service):
+    first, second = _queue(service), _queue(service)
+    submitted = {(await first.submit("p1", "", ["simulated"])).id, (await first.submit("p2", "", ["simulated"])).id}
+
+    claimed = [await first._claim(), await second._claim()]
+    assert {job.id for job in claimed} == submitted
+    assert [job.worker_id for job in claimed] == [first.worker_id, second.worker_id]
+    assert all(job.status == "running" and job.attempts == 1 for job in claimed)
+    assert await first._claim() is None
+    assert await second._claim() is None
+
+async def test_expired_lease_is_claimed_again(service):
+    crashed, survivor = _queue(service), _queue(service)
+    job = await crashed.submit("p", "", ["simulated"])
+    await crashed._claim()
+    assert await survivor._claim() is None
+
+    await _set(job.id, lease_expires_at=jobs._now() - timedelta(seconds=1))
+    reclaimed = await survivor._claim()
+    assert reclaimed.id == job.id
+    assert reclaimed.worker_id == survivor.worker_id
+    assert reclaimed.attempts == 2
+
+    # The old holder can no longer write to it
+    with pytest.raises(jobs.LeaseLostError):
+        await crashed._update(job.id, results={})
+
+async def test_heartbeat_renews_the_lease(service):
+    queue = _queue(service, lease_seconds=0.3)
+    job = await queue.submit("p", "", ["simulated"])
+    claimed = await queue._claim()
+    runner = asyncio.create_task(asyncio.sleep(10))
+    lost = asyncio.Event()
+    heartbeat = asyncio.create_task(queue._heartbeat(job.id, runner, lost))
+    try:
+        await asyncio.sleep(0.25)
+        renewed = (await _job(job.id)).lease_expires_at
+        assert renewed > claimed.lease_expires_at
+        assert not lost.is_set()
+    finally:
+        heartbeat.cancel()
+        runner.cancel()
+
+async def test_heartbeat_cancels_the_run_when_the_lease_is_lost(service):
+    queue = _queue(service, lease_seconds=0.15)
+    job = await queue.submit("p", "", ["simulated"])
+    await queue._claim()
+    runner = asyncio.create_task(asyncio.sleep(10))
+    lost = asyncio.Event()
+    heartbeat = asyncio.create_task(queue._heartbeat(job.id, runner, lost))
+
+    await _set(job.id, worker_id="someone-else")
+    await asyncio.wait_for(heartbeat, 1.0)
+    assert lost.is_set()
+    with pytest.raises(asyncio.CancelledError):
+        await runner
+
+async def test_resumed_job_only_calls_models_without_a_checkpoint(service, calls):
+    crashed = _queue(service)
+    job = await crashed.submit("Explain gravity", "", ["simulated", "simulated-b"])
+    await crashed._claim()
+    done = await service.evaluate_model("Explain gravity", "", "simulated", use_cache=False)
+    await crashed._update(job.id, results={"simulated": done})
+    calls.clear()
+    # The worker dies without putting the job back
+    await _set(job.id, lease_expires_at=jobs._now() - timedelta(seconds=1))
+
+    survivor = _queue(service, workers=1)
+    survivor.start()
+    try:
+        finished = await _wait_for(job.id, "completed")
+    finally:
+        await survivor.stop()
+
+    assert calls == ["simulated-b"]
+    assert finished.attempts == 2
+    assert finished.worker_id is None
+    view = jobs.job_to_dict(finished)
+    assert view["completed"] == view["total"] == 2
+    assert [entry["response"] for entry in view["results"]] == [done["response"], "simulated-b says hi"]
+    async with SessionLocal() as db:
+        experiment = await crud.get_experiment_document(db, finished.experiment_id)
+    assert [entry["model"] for entry in experiment["responses"]] == ["simulated", "simulated-b"]
+
+async def test_stop_puts_running_jobs_back(service, monkeypatch):
+    started = asyncio.Event()
+
+    async def query(prompt, system_prompt, model, trace):
+        started.set()
+        await asyncio.sleep(10)
+    monkeypatch.setattr(service, "_query_simulated", query)
+
+    queue = _queue(service, workers=1)
+    job = await queue.submit("p", "", ["simulated"])
+    await asyncio.wait_for(started.wait(), 5.0)
+    await queue.stop()
+
+    requeued = await _job(job.id)
+    assert requeued.status == "queued"
+    assert requeued.worker_id is None
+    async with SessionLocal() as db:
+        assert await jobs.has_pending_jobs(db)
+
+async def test_job_fails_after_max_attempts(service):
+    queue = _queue(service, max_attempts=1)
+    job = await queue.submit("p", "", ["simulated"])
+    await _set(job.id, attempts=1)
+
+    assert await queue._claim() is None
+    failed = await _job(job.id)
+    assert failed.status == "failed"
+    assert "1 attempts" in failed.error
@@ -0,0 +1,46 @@
+"""
+Job Worker Entry Point
+Runs evaluation job workers without the API server, sharing its database:
+    python worker.py --workers 8
+Start as many as needed. Ctrl+C / SIGTERM puts unfinished jobs back in the
+queue before exiting.
+"""
+
+from dotenv import load_dotenv
+
+# Read .env before any app module reads its settings from the environment
+load_dotenv()
+
+import argparse
+import asyncio
+import logging
+import signal
+from app.api.dependencies import get_llm_service
+from app.db import SessionLocal, engine, init_db
+from app.services.jobs import JobQueue
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(workers: int) -> None:
+    await init_db()
+    llm_service = get_llm_service()
+    queue = JobQueue.from_env(llm_service, session_factory=SessionLocal, workers=workers)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    queue.start()
+    await stopping.wait()
+    logger.info("Stopping job workers")
+    await queue.stop()
+    await llm_service.close()
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run evaluation job workers")
+    parser.add_argument("--workers", type=int, default=4, help="Jobs run at once by this process")
+    asyncio.run(main(parser.parse_args().workers))
@@ -1,22 +1,39 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Container, Box, Typography, Alert, Snackbar } from '@mui/material';
-import { submitPrompt } from './services/api';
-import { Experiment, ModelPerformance } from './types/types';
+import { getModelMetrics, streamPrompt, subscribeToEvents } from './services/api';
+import { Experiment, LLMResponse, ModelPerformance } from './types/types';
 import PromptInput from './components/PromptInput';
 import ResponseComparison from './components/ResponseComparison';
 import MetricsDashboard from './components/MetricsDashboard';
 
 const App: React.FC = () => {
   const [experiments, setExperiments] = useState<Experiment[]>([]);
+  const [modelPerformance, setModelPerformance] = useState<ModelPerformance>({});
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
   const handleSubmit = async (data: { prompt: string; systemPrompt: string; models: string[] }) => {
       setLoading(true);
       setError(null);
+      // Show each model's output as it streams in, then swap in the saved experiment
+      const live: Experiment = {
+          id: 'pending',
+          prompt: data.prompt,
+          models: data.models,
+          responses: data.models.map(model => ({ model, response: '', metrics: { responseTime: 0 } })),
+      };
+      const update = (model: string, change: (response: LLMResponse) => LLMResponse) => {
+          live.responses = live.responses.map(r => (r.model === model ? change(r) : r));
+          setExperiments([{ ...live }]);
+      };
+      setExperiments([{ ...live }]);
       try {
-          const result = await submitPrompt(data);
-          setExperiments([result]);
+          await streamPrompt(data, {
+              onToken: (model, text) => update(model, r => ({ ...r, response: r.response + text })),
+              onModelDone: (done) => update(done.model, () => done),
+              onExperiment: (experiment) => setExperiments([experiment]),
+          });
+          await loadModelPerformance();
       } catch (error) {
           console.error('Error submitting prompt:', error);
           setError('Failed to evaluate prompt');
@@ -25,37 +42,44 @@ const App: React.FC = () => {
       }
   };
 
-  const calculateModelPerformance = (experiments: Experiment[]): ModelPerformance => {
-    if (experiments.length === 0) return {};
-    
-    const performance: ModelPerformance = {};
-    
-    experiments.forEach(exp => {
-      exp.models.forEach((model, idx) => {
-        if (!performance[model]) {
-          performance[model] = {
-            avgResponseTime: 0,
-            avgAccuracy: 0,
-            avgRelevancy: 0,
-            count: 0
-          };
-        }
-        
-        const response = exp.responses[idx];
-        if (response?.metrics) {
-          performance[model] = {
-            avgResponseTime: response.metrics.responseTime,
-            avgAccuracy: response.metrics.accuracy || 0,
-            avgRelevancy: response.metrics.relevancy || 0,
-            count: 1
-          };
-        }
+  // Historical per-model aggregates come from the server's rollups rather
+  // than being recomputed here from raw experiments
+  const loadModelPerformance = async () => {
+    try {
+      const series = await getModelMetrics({ bucket: 'all' });
+      const performance: ModelPerformance = {};
+      series.forEach(bucket => {
+        performance[bucket.model] = {
+          avgResponseTime: bucket.responseTime.mean ?? 0,
+          p95ResponseTime: bucket.responseTime.p95 ?? 0,
+          avgAccuracy: bucket.accuracy ?? 0,
+          avgRelevancy: bucket.relevancy ?? 0,
+          count: bucket.count
+        };
       });
-    });
-    
-    return performance;
+      setModelPerformance(performance);
+    } catch (error) {
+      console.error('Error loading model metrics:', error);
+    }
   };
 
+  // Refresh the aggregates when any client's experiments land, at most once
+  // per burst of events
+  useEffect(() => {
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    const unsubscribe = subscribeToEvents({
+      onEvent: (name) => {
+        if (name === 'model_finished') return;
+        clearTimeout(timer);
+        timer = setTimeout(loadModelPerformance, 500);
+      },
+    });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
+  }, []);
+
     return (
         <Container maxWidth="lg">
             <Box sx={{ my: 4 }}>
@@ -75,7 +99,7 @@ const App: React.FC = () => {
                         </Typography>
                         <ResponseComparison experiments={experiments} />
                         <Box sx={{ mt: 4 }}>
-                            <MetricsDashboard modelPerformance={calculateModelPerformance(experiments)} />
+                            <MetricsDashboard modelPerformance={modelPerformance} />
                         </Box>
                     </>
                 )}
@@ -11,6 +11,7 @@ const MetricsDashboard: React.FC<MetricsDashboardProps> = ({ modelPerformance })
   const chartData = Object.entries(modelPerformance).map(([model, metrics]) => ({
     name: model,
     responseTime: metrics.avgResponseTime,
+    p95ResponseTime: metrics.p95ResponseTime,
     accuracy: metrics.avgAccuracy,
     relevancy: metrics.avgRelevancy
   }));
@@ -41,6 +42,7 @@ const MetricsDashboard: React.FC<MetricsDashboardProps> = ({ modelPerformance })
           <Tooltip />
           <Legend />
           <Bar dataKey="responseTime" fill="#8884d8" name="Response Time (ms)" />
+          <Bar dataKey="p95ResponseTime" fill="#a4a1e6" name="p95 Response Time (ms)" />
           <Bar dataKey="accuracy" fill="#82ca9d" name="Accuracy Score" />
           <Bar dataKey="relevancy" fill="#ffc658" name="Relevancy Score" />
         </BarChart>
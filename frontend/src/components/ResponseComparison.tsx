@@ -28,6 +28,17 @@ const ResponseComparison: React.FC<Props> = ({ experiments }) => {
                     <Typography variant="subtitle2" color="text.secondary">
                       Relevancy Score: {response.metrics.relevancy || 0}
                     </Typography>
+                    {response.metrics.timeToFirstToken !== undefined && (
+                      <Typography variant="subtitle2" color="text.secondary">
+                        Time to First Token: {response.metrics.timeToFirstToken}ms
+                        {' · '}{response.metrics.tokensPerSecond} tokens/s
+                      </Typography>
+                    )}
+                    {response.metrics.shared && (
+                      <Typography variant="subtitle2" color="text.secondary">
+                        Shared with a concurrent identical request
+                      </Typography>
+                    )}
                   </>
                 )}
               </Box>
@@ -1,5 +1,15 @@
 import axios from 'axios';
-import { Experiment } from '../types/types';
+import {
+  EvaluationJob,
+  Experiment,
+  ExperimentPage,
+  ExperimentQuery,
+  ModelMetricsBucket,
+  ModelMetricsQuery,
+  ExperimentEventHandlers,
+  ExperimentEventName,
+  StreamHandlers,
+} from '../types/types';
 
 const BASE_URL = 'http://localhost:8000/api';
 console.log('API Base URL:', BASE_URL);
@@ -24,19 +34,101 @@ api.interceptors.response.use(
   }
 );
 
-export const submitPrompt = async (data: { prompt: string; systemPrompt: string; models: string[] }) => {
+const JOB_POLL_INTERVAL_MS = 1000;
+
+// Queues the experiment as a background job and polls until it finishes, so
+// slow providers never hold one HTTP request open. `onProgress` sees each poll.
+export const submitPrompt = async (
+  data: { prompt: string; systemPrompt: string; models: string[] },
+  onProgress?: (job: EvaluationJob) => void
+): Promise<Experiment> => {
   try {
-    const response = await api.post('/experiments', data);
-    return response.data;
+    const submitted = await api.post('/jobs', data);
+    if (submitted.status !== 202) {
+      throw new Error(submitted.data.detail || submitted.data.message || 'Failed to queue experiment');
+    }
+    let job: EvaluationJob = submitted.data;
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      job = (await api.get(`/jobs/${job.id}`)).data;
+      onProgress?.(job);
+    }
+    if (job.status === 'failed' || job.experiment_id === null) {
+      throw new Error(job.error || 'Experiment failed');
+    }
+    return getExperiment(job.experiment_id);
   } catch (error) {
     console.error('Error submitting prompt:', error);
     throw error;
   }
 };
 
-export const getExperiments = async (): Promise<Experiment[]> => {
+// Streams model output as Server-Sent Events. EventSource can't POST, so the
+// response body is read and split into events by hand.
+export const streamPrompt = async (
+  data: { prompt: string; systemPrompt: string; models: string[] },
+  handlers: StreamHandlers
+) => {
+  const response = await fetch(`${BASE_URL}/experiments/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(data),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Streaming request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const payload = block.match(/^data: (.*)$/m)?.[1];
+      if (!event || !payload) continue;
+      const parsed = JSON.parse(payload);
+
+      if (event === 'token') handlers.onToken(parsed.model, parsed.text);
+      else if (event === 'model_done') handlers.onModelDone(parsed);
+      else if (event === 'experiment') handlers.onExperiment(parsed);
+      else if (event === 'error') throw new Error(parsed.message);
+    }
+  }
+};
+
+const EXPERIMENT_EVENTS: ExperimentEventName[] = [
+  'model_finished',
+  'experiment_created',
+  'experiment_updated',
+  'metrics',
+  'resync',
+];
+
+// Live experiment activity instead of polling the experiment list. EventSource
+// reconnects by itself and sends Last-Event-ID, so the server can replay what
+// was missed (or send a resync). Returns a function that closes the feed.
+export const subscribeToEvents = (handlers: ExperimentEventHandlers): (() => void) => {
+  const source = new EventSource(`${BASE_URL}/events`);
+  EXPERIMENT_EVENTS.forEach((name) => {
+    source.addEventListener(name, (event) => {
+      handlers.onEvent(name, JSON.parse((event as MessageEvent).data));
+    });
+  });
+  return () => source.close();
+};
+
+export const getExperiments = async (query: ExperimentQuery = {}): Promise<ExperimentPage> => {
   try {
-    const response = await api.get('/experiments');
+    const response = await api.get('/experiments', { params: query });
     return response.data;
   } catch (error) {
     console.error('Error fetching experiments:', error);
@@ -44,4 +136,25 @@ export const getExperiments = async (): Promise<Experiment[]> => {
   }
 };
 
+export const getExperiment = async (id: number | string): Promise<Experiment> => {
+  try {
+    const response = await api.get(`/experiments/${id}`);
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching experiment:', error);
+    throw error;
+  }
+};
+
+// Per-model aggregates, computed server-side from incrementally updated rollups
+export const getModelMetrics = async (query: ModelMetricsQuery = {}): Promise<ModelMetricsBucket[]> => {
+  try {
+    const response = await api.get('/metrics/models', { params: query });
+    return response.data.series;
+  } catch (error) {
+    console.error('Error fetching model metrics:', error);
+    throw error;
+  }
+};
+
 export default api;
\ No newline at end of file
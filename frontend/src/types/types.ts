@@ -12,6 +12,44 @@ export interface Experiment {
     models: string[];
 }
 
+export interface ExperimentSummary {
+    id: number;
+    prompt: string;
+    models: string[];
+    metrics: { model: string; metrics: ModelMetrics }[];
+    created_at: string;
+    updated_at: string | null;
+}
+
+export interface ExperimentPage {
+    items: ExperimentSummary[];
+    nextCursor: string | null;
+}
+
+export interface ExperimentQuery {
+    limit?: number;
+    cursor?: string;
+    model?: string;
+    start?: string;
+    end?: string;
+}
+
+export interface EvaluationJob {
+    id: string;
+    status: 'queued' | 'running' | 'completed' | 'failed';
+    prompt: string;
+    models: string[];
+    completed: number;
+    total: number;
+    results: LLMResponse[];
+    experiment_id: number | null;
+    error: string | null;
+    attempts: number;
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+}
+
 export interface Metrics {
   avgResponseTime: number;
   avgAccuracy: number;
@@ -23,17 +61,84 @@ export interface ModelMetrics {
     responseTime: number;
     accuracy?: number;
     relevancy?: number;
+    timeToFirstToken?: number;
+    interTokenLatency?: number;
+    tokensPerSecond?: number;
+    scorerVersion?: string;
+    // True when the result came from a concurrent identical request's call
+    shared?: boolean;
+    phases?: CallPhases;
+    usage?: TokenUsage;
+}
+
+// Milliseconds spent in each phase of a model call
+export interface CallPhases {
+    slotWait?: number;
+    connectionWait?: number;
+    connect?: number;
+    timeToFirstByte?: number;
+    bodyRead?: number;
+    jsonDecode?: number;
+    scoring?: number;
+}
+
+export interface TokenUsage {
+    promptTokens: number;
+    completionTokens: number;
+    totalTokens: number;
+}
+
+export interface StreamHandlers {
+    onToken: (model: string, text: string) => void;
+    onModelDone: (response: LLMResponse) => void;
+    onExperiment: (experiment: Experiment) => void;
+}
+
+export type ExperimentEventName =
+    | 'model_finished'
+    | 'experiment_created'
+    | 'experiment_updated'
+    | 'metrics'
+    | 'resync';
+
+export interface ExperimentEventHandlers {
+    // `data` is the event's parsed JSON payload
+    onEvent: (name: ExperimentEventName, data: any) => void;
 }
 
 export interface ModelPerformance {
     [key: string]: {
         avgResponseTime: number;
+        p95ResponseTime: number;
         avgAccuracy: number;
         avgRelevancy: number;
         count: number;
     };
 }
 
+export interface ModelMetricsBucket {
+    model: string;
+    bucketStart: string | null;
+    count: number;
+    errorRate: number;
+    cacheHits: number;  // counted, but not in responseTime
+    responseTime: {
+        mean: number | null;
+        p50: number | null;
+        p95: number | null;
+        p99: number | null;
+    };
+    accuracy: number | null;
+    relevancy: number | null;
+}
+
+export interface ModelMetricsQuery {
+    bucket?: 'hour' | 'day' | 'week' | 'all';
+    start?: string;
+    end?: string;
+    model?: string;
+}
+
 export interface ChartDataPoint {
     model: string;
     responseTime: number;